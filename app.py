@@ -1,12 +1,24 @@
 # app.py — LIA-Staylo Backend (0.4.2) con categorías LT y reglas MX tipadas
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List
 from pathlib import Path
-import io, docx, re, os, json, difflib, subprocess, sys, uuid
+from contextlib import contextmanager
+import io, docx, re, os, json, difflib, subprocess, sys, uuid, shutil, threading, time, logging, asyncio
 import httpx
+from backend import compression, match_merge, metrics, profiling, textdiff
+from backend.bm25 import rrf_fuse
+from backend.chunk_store import chunk_text
+from backend.context_pack import pack_context, RAG_CTX_TOKENS
+from backend.encoders import CachedEncoder, load_model
+from backend.llm import LLMBackend
+from backend.suggest_cache import SuggestionCache, cache_key
+from backend.scheduler import PriorityLimiter
+from backend.index_registry import IndexRegistry, active_dir, set_active, LANG_SUFFIX
+from backend.shared_state import MtimeCache, atomic_write_text, file_lock
 import spacy
 from textstat import textstat
 import yaml
@@ -18,28 +30,50 @@ BASE_DIR = Path(__file__).parent.resolve()
 # si no existe, usa BASE_DIR/rules (modo dev)
 RULES_DIR = Path(os.environ.get("LIA_RULES_DIR", str(BASE_DIR / "rules")))
 
-# LanguageTool y LLM
+# LanguageTool y LLM (LLM_URLS: lista separada por comas; URLs completas o solo host:puerto)
 LT_URL   = os.environ.get("LT_URL",  "http://127.0.0.1:8081")
-LLM_URLS = [
+LLM_URLS = [u.strip() for u in os.environ.get("LLM_URLS", "").split(",") if u.strip()] or [
     os.environ.get("LLM_URL", "http://127.0.0.1:11434/v1/chat/completions"),
     "http://127.0.0.1:11434/api/chat",
 ]
 MODEL_NAME = os.environ.get("LLM_MODEL", "qwen2:1.5b-instruct")
+LLM = LLMBackend(LLM_URLS, MODEL_NAME)
+
+# Caché persistente de sugerencias (SUGGEST_CACHE=0 la desactiva).
+# Sube la versión de la plantilla cuando cambie el prompt correspondiente.
+PROMPT_VERSION = {"suggest": "suggest-v1", "refs": "refs-v1"}
+SUGGEST_CACHE_PATH = Path(os.environ.get("SUGGEST_CACHE_PATH", str(BASE_DIR / "data" / "cache" / "suggestions.sqlite")))
+_SUGGEST_CACHE = SuggestionCache(SUGGEST_CACHE_PATH) if os.environ.get("SUGGEST_CACHE", "1") != "0" else None
+
+# Lotes de sugerencias: capacidad LLM compartida por prioridad (LLM_BATCH_CONCURRENCY)
+LLM_SLOTS = PriorityLimiter()
+SUGGEST_BATCH_MAX = int(os.environ.get("SUGGEST_BATCH_MAX", "500"))
 
 # Embeddings / RAG
 EMB_MODEL        = os.environ.get("EMB_MODEL", "distiluse-base-multilingual-cased-v2")
-DS_DIR           = BASE_DIR / "data" / "ds"
-FAISS_INDEX_PATH = DS_DIR / "faiss.index"
-FAISS_META_PATH  = DS_DIR / "meta.json"
+DS_DIR           = BASE_DIR / "data" / "ds"   # faiss{_es_mx,_es_419,_en_us,}.index + bm25 + meta + chunks
+RAG_MODE         = os.environ.get("RAG_MODE", "dense")   # dense | bm25 | hybrid
+
+logger = logging.getLogger("lia-backend")
 
 # ─────────────────────────── App ───────────────────────────
 app = FastAPI(title="LIA-Staylo Backend", version="0.4.2")
+app.router.route_class = profiling.ProfiledRoute   # X-Lia-Profile (solo admin)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(compression.CompressionMiddleware)
+
+@app.on_event("shutdown")
+async def _close_llm_client():
+    await LLM.aclose()
+    if _SUGGEST_CACHE is not None:
+        _SUGGEST_CACHE.flush()   # last_used pendientes
 
 # ─────────────────────────── spaCy ───────────────────────────
 try:
@@ -47,8 +81,29 @@ try:
 except Exception:
     nlp = None
 
-# ───────────── Diccionario simple en memoria ─────────────
-DICT = set()  # palabras permitidas/propias (case-insensitive)
+# ───────────── Diccionario de usuario (compartido entre workers) ─────────────
+# Palabras permitidas/propias (case-insensitive) en un JSON; las escrituras van
+# bajo candado entre procesos y cada worker lo relee solo si cambió su mtime.
+DICT_PATH = Path(os.environ.get("LIA_DICT_PATH", str(BASE_DIR / "data" / "dictionary.json")))
+
+def _read_dict(path: Path) -> frozenset:
+    try:
+        words = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return frozenset()
+    return frozenset(str(w).lower() for w in words) if isinstance(words, list) else frozenset()
+
+_DICT = MtimeCache(DICT_PATH, _read_dict)
+
+def user_words() -> frozenset:
+    return _DICT.get()
+
+def _update_dict(change) -> None:
+    with file_lock(DICT_PATH):
+        words = set(_read_dict(DICT_PATH))
+        change(words)
+        atomic_write_text(DICT_PATH, json.dumps(sorted(words), ensure_ascii=False, indent=2))
+    _DICT.invalidate()
 
 # ───────────────────── Reglas ES-MX ─────────────────────
 ES_MX: dict = {}
@@ -168,7 +223,8 @@ def spacy_stats(text: str) -> dict:
         return {"warning": "spaCy no disponible. Ejecuta: python -m spacy download es_core_news_md"}
     text = _normalize_spaces(text)
 
-    doc = nlp(text)
+    with metrics.stage("spacy"):
+        doc = nlp(text)
     sentences = list(doc.sents)
     words_total = sum(len(s.text.split()) for s in sentences)
 
@@ -207,8 +263,9 @@ async def languagetool_check(text: str, lang: str = "es") -> dict:
     data = {"text": text}
     try:
         async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(url, params=params, data=data)
-            r.raise_for_status()
+            with metrics.stage("lt"):
+                r = await client.post(url, params=params, data=data)
+                r.raise_for_status()
             j = r.json()
             matches = []
             for m in j.get("matches", []):
@@ -226,13 +283,14 @@ async def languagetool_check(text: str, lang: str = "es") -> dict:
                 })
             return {"ok": True, "matches": matches}
     except Exception as e:
+        metrics.upstream_error("lt", e)
         return {"ok": False, "error": str(e), "matches": []}
 
 def filter_matches_by_dictionary(text: str, matches: List[dict]) -> List[dict]:
-    if not DICT or not matches:
+    allow = user_words()
+    if not allow or not matches:
         return matches
     text = _normalize_spaces(text)
-    allow = set(w.lower() for w in DICT)
     filtered: list[dict] = []
     for m in matches:
         try:
@@ -249,28 +307,8 @@ def filter_matches_by_dictionary(text: str, matches: List[dict]) -> List[dict]:
     return filtered
 
 async def call_llm(messages: List[dict], temperature=0.4, max_tokens=220) -> tuple[bool, str, str | None]:
-    payload_openai = {"model": MODEL_NAME, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
-    payload_ollama = {"model": MODEL_NAME, "messages": messages, "stream": False, "options": {"temperature": temperature}}
-
-    async with httpx.AsyncClient(timeout=120) as client:
-        try:
-            r = await client.post(LLM_URLS[0], json=payload_openai)
-            if r.status_code == 200:
-                j = r.json()
-                choice = (j.get("choices") or [{}])[0]
-                content = choice.get("message", {}).get("content") or choice.get("text") or ""
-                return True, content.strip(), None
-        except Exception:
-            pass
-        try:
-            r = await client.post(LLM_URLS[1], json=payload_ollama)
-            r.raise_for_status()
-            j = r.json()
-            msg = j.get("message") or {}
-            content = msg.get("content", "")
-            return True, content.strip(), None
-        except Exception as e:
-            return False, "", str(e)
+    with metrics.stage("llm"):
+        return await LLM.chat(messages, temperature=temperature, max_tokens=max_tokens)
 
 def readability_es(text: str) -> dict:
     text = _normalize_spaces(text)
@@ -304,10 +342,11 @@ def apply_safe(text: str) -> tuple[str, int]:
         applied += n
     return text, applied
 
-def apply_lt_replacements(text: str, matches: list, rule_filter: Optional[set] = None) -> tuple[str, int]:
+def apply_lt_replacements(text: str, matches: list, rule_filter: Optional[set] = None,
+                          edits_out: Optional[list] = None) -> tuple[str, int]:
     text = _normalize_spaces(text)
     mlist = [m for m in matches if (m.get("replacements") and (not rule_filter or m.get("rule") in rule_filter))]
-    allow = set(w.lower() for w in DICT)
+    allow = user_words()
     safe_list = []
     for m in mlist:
         off = int(m.get("offset", 0))
@@ -329,6 +368,8 @@ def apply_lt_replacements(text: str, matches: list, rule_filter: Optional[set] =
         if off < 0 or off + length > len(t):
             continue
         t = t[:off] + repl + t[off+length:]
+        if edits_out is not None:
+            edits_out.append({"offset": off - delta, "length": length, "replacement": repl})
         delta += len(repl) - length
         applied += 1
     return t, applied
@@ -339,54 +380,174 @@ def make_unified_diff(a: str, b: str) -> str:
     diff = difflib.unified_diff(da, db, fromfile="original", tofile="corregido", n=0)
     return "".join(diff)
 
+def make_changes(a: str, b: str, diff_mode: str = "words", edits: Optional[list] = None) -> list[dict]:
+    """Cambios por palabra/carácter; si ya se conocen los edits aplicados no se re-difea."""
+    if edits is not None:
+        return textdiff.changes_from_edits(a, edits)
+    return textdiff.diff_changes(a, b, granularity="char" if diff_mode == "chars" else "word")
+
 # ───────────────────── RAG: carga índice ─────────────────────
-_FAISS = None
-_META  = None
+# Un índice por idioma (o el general), cargado bajo demanda y memory-mapped.
+# /refresh_corpus construye en data/ds/builds/<id> y reemplaza esta referencia
+# de una sola vez; las consultas en curso terminan con el registro anterior,
+# que se cierra (mmap incluidos) cuando lo suelta la última.
+_INDEXES = IndexRegistry(active_dir(DS_DIR))
+_INDEXES_LOCK = threading.Lock()
 _EMB_MODEL = None
 
-def _ensure_index() -> bool:
-    global _FAISS, _META, _EMB_MODEL
-    if _FAISS is not None and _META is not None and _EMB_MODEL is not None:
-        return True
-    if not FAISS_INDEX_PATH.exists() or not FAISS_META_PATH.exists():
-        return False
-    import faiss
-    from sentence_transformers import SentenceTransformer
-    _FAISS = faiss.read_index(str(FAISS_INDEX_PATH))
-    _META = json.loads(FAISS_META_PATH.read_text(encoding="utf-8"))
-    _EMB_MODEL = SentenceTransformer(EMB_MODEL)
-    return True
-
-def retrieve(query: str, k: int = 4) -> list[dict]:
-    if not _ensure_index():
+def _swap_indexes(new: IndexRegistry) -> None:
+    global _INDEXES
+    old, _INDEXES = _INDEXES, new
+    _SOURCE_CHUNKS.clear()
+    if old is not new:
+        old.retire()
+
+def _current_indexes() -> IndexRegistry:
+    """Con varios workers, otro proceso pudo mover el puntero CURRENT: seguirlo."""
+    with _INDEXES_LOCK:
+        ds = active_dir(DS_DIR)
+        if ds != _INDEXES.ds_dir:
+            logger.info("Índice activo cambiado por otro worker: %s", ds)
+            _swap_indexes(IndexRegistry(ds))
+        return _INDEXES
+
+@contextmanager
+def _indexes():
+    """Registro vigente (o None) reservado durante la consulta."""
+    reg = None
+    for _ in range(3):   # uno retirado entre _current_indexes() y acquire(): pedir el nuevo
+        cand = _current_indexes()
+        if cand.acquire():
+            reg = cand
+            break
+    try:
+        yield reg
+    finally:
+        if reg is not None:
+            reg.release()
+_SOURCE_CHUNKS: dict[tuple, list[str]] = {}   # respaldo si el índice es anterior al almacén
+_CORPUS_DIRS = {"": "corpus_txt", "_es_mx": "corpus_txt_es_mx", "_es_419": "corpus_txt_es_419", "_en_us": "corpus_txt_en_us"}
+
+metrics.REGISTRY.register_cache("suggestions", lambda: _SUGGEST_CACHE.stats() if _SUGGEST_CACHE is not None else None)
+metrics.REGISTRY.register_cache("query_embeddings", lambda: _EMB_MODEL.stats() if _EMB_MODEL is not None else None)
+
+def _ensure_encoder() -> CachedEncoder:
+    """Codificador de consultas (backend EMB_BACKEND) con caché LRU."""
+    global _EMB_MODEL
+    if _EMB_MODEL is None:
+        model, backend = load_model(EMB_MODEL)
+        _EMB_MODEL = CachedEncoder(model, backend=backend)
+    return _EMB_MODEL
+
+def _chunk_text_at(li, idx: int, m: dict) -> str:
+    """Texto exacto del fragmento: almacén mmap (O(1)) o, si falta, troceo de la fuente una sola vez."""
+    if li.chunks is not None:
+        return li.chunks.get(idx)
+    key = (li.suffix, m["source"])
+    if key not in _SOURCE_CHUNKS:
+        fp = BASE_DIR / "data" / _CORPUS_DIRS.get(li.suffix, "corpus_txt") / m["source"]
+        _SOURCE_CHUNKS[key] = chunk_text(fp.read_text(encoding="utf-8", errors="ignore")) if fp.exists() else []
+    chunks = _SOURCE_CHUNKS[key]
+    cid = int(m["chunk_id"])
+    return chunks[cid] if 0 <= cid < len(chunks) else ""
+
+def _dense_hits(li, queries: list[str], k: int) -> list[list[tuple[int, float]]]:
+    """Una sola pasada del codificador y una búsqueda FAISS para todas las consultas."""
+    qv = _ensure_encoder().encode_queries(queries)
+    D, I = li.index.search(qv, k)
+    return [[(int(i), float(d)) for i, d in zip(I[r], D[r]) if i != -1] for r in range(len(queries))]
+
+def retrieve_batch(queries: list[str], k: int = 4, lang: Optional[str] = None,
+                   mode: Optional[str] = None) -> list[list[dict]]:
+    """
+    Recupera para varios párrafos a la vez.
+    mode: 'dense' (FAISS + embeddings), 'bm25' (léxico, sin modelo) o 'hybrid' (fusión RRF).
+    """
+    if not queries:
         return []
-    qv = _EMB_MODEL.encode([query], convert_to_numpy=True, normalize_embeddings=True)
-    D, I = _FAISS.search(qv, k)
+    with metrics.stage("retrieval"), _indexes() as reg:
+        if reg is None:
+            return [[] for _ in queries]
+        return _retrieve_batch(reg, queries, k, lang, mode)
+
+def _retrieve_batch(reg: IndexRegistry, queries: list[str], k: int, lang: Optional[str],
+                    mode: Optional[str]) -> list[list[dict]]:
+    mode = (mode or RAG_MODE).lower()
+    if mode not in ("dense", "bm25", "hybrid"):
+        mode = "dense"
+    li = reg.get(lang, dense=mode != "bm25", lexical=mode != "dense")
+    if li is None and mode == "hybrid":   # índice sin BM25 todavía
+        mode = "dense"
+        li = reg.get(lang)
+    if li is None or (mode != "dense" and li.bm25 is None):
+        return [[] for _ in queries]
+
+    if mode == "dense":
+        ranked = _dense_hits(li, queries, k)
+    elif mode == "bm25":
+        ranked = [li.bm25.search(q, k) for q in queries]
+    else:
+        dense = _dense_hits(li, queries, 2 * k)
+        ranked = [
+            rrf_fuse([[d for d, _ in dh], [d for d, _ in li.bm25.search(q, 2 * k)]], k=k)
+            for q, dh in zip(queries, dense)
+        ]
+
     out = []
-    txt_dir = BASE_DIR / "data" / "corpus_txt"
-    cache: dict[str, str] = {}
-    metas = _META
-    for idx in I[0]:
-        if idx == -1:
-            continue
-        m = metas[idx]
-        src = m["source"]
-        if src not in cache:
-            fp = txt_dir / src
-            cache[src] = fp.read_text(encoding="utf-8", errors="ignore")
-        text = cache[src]
-        out.append({"source": src, "chunk_id": m["chunk_id"], "text": text})
-    return out[:k]
+    for hits in ranked:
+        rows = []
+        for idx, score in hits[:k]:
+            m = li.meta[idx]
+            rows.append({"source": m["source"], "chunk_id": m["chunk_id"],
+                         "text": _chunk_text_at(li, idx, m), "score": round(float(score), 6)})
+        out.append(rows)
+    return out
+
+def retrieve(query: str, k: int = 4, lang: Optional[str] = None, mode: Optional[str] = None) -> list[dict]:
+    return retrieve_batch([query], k=k, lang=lang, mode=mode)[0]
+
+def format_refs(excerpts: list[dict]) -> str:
+    return "\n\n".join(
+        f"[{i+1}] {e['source']} (fragmento {'-'.join(map(str, e['chunk_ids']))}):\n{e['text']}"
+        for i, e in enumerate(excerpts)
+    )
 
 # ───────────────────── Schemas ─────────────────────
 class TextIn(BaseModel):
     text: str
     lang: Optional[str] = "es"   # permite 'en', 'es-419', etc.
+    retrieval: Optional[str] = None   # /suggest_with_refs: "dense" | "bm25" | "hybrid" (def. RAG_MODE)
+    regenerate: bool = False          # /suggest*: ignora la caché y genera de nuevo
+
+class RetrieveBatchIn(BaseModel):
+    texts: List[str]
+    lang: Optional[str] = "es"
+    k: int = 4
+    retrieval: Optional[str] = None
+    pack: bool = False                  # además, contexto empaquetado por párrafo
+    budget_tokens: int = RAG_CTX_TOKENS
+
+class BatchParagraph(BaseModel):
+    id: Optional[str] = None      # def.: posición en la lista
+    text: str
+    visible: bool = False         # en pantalla: se atiende antes
+    priority: int = 0             # menor = antes (tras 'visible')
+
+class SuggestBatchIn(BaseModel):
+    paragraphs: List[BatchParagraph]
+    lang: Optional[str] = "es"
+    with_refs: bool = False
+    retrieval: Optional[str] = None
+    concurrency: Optional[int] = None   # tope propio del lote (≤ LLM_BATCH_CONCURRENCY)
+    stream: bool = True                 # NDJSON: un resultado por línea según terminan
+    regenerate: bool = False
 
 class ApplyIn(BaseModel):
     text: str
     mode: str = "safe"           # "safe" | "all" | "rules"
     rules: Optional[List[str]] = None
+    diff_mode: str = "words"     # "words" | "chars" | "unified" | "none"
+    stream: bool = False         # NDJSON: cabecera + un cambio por línea
 
 # ───────────────────── Endpoints básicos ─────────────────────
 @app.get("/health")
@@ -403,8 +564,15 @@ async def health():
         "rules_loaded": bool(ES_MX),
         "lt_error": lt.get("error"),
         "llm_error": err_llm,
+        "llm_endpoints": LLM.status(),
+        "suggest_cache": _SUGGEST_CACHE.stats() if _SUGGEST_CACHE is not None else None,
+        "llm_slots": LLM_SLOTS.status(),
     }
 
+@app.get("/metrics")
+async def metrics_ep():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/analyze_text")
 async def analyze_text_ep(data: TextIn):
     text = _normalize_spaces(data.text)
@@ -415,10 +583,14 @@ async def analyze_text_ep(data: TextIn):
 
     # Reglas locales (solo para español)
     if lang.lower().startswith("es"):
-        matches += apply_es_mx(text)
+        with metrics.stage("custom_rules"):
+            matches += apply_es_mx(text)
+        with metrics.stage("merge"):
+            matches = match_merge.merge(matches)
 
     stats = spacy_stats(text)
-    readab = readability_es(text)
+    with metrics.stage("stats"):
+        readab = readability_es(text)
     return {
         "languageTool": {"ok": lt.get("ok"), "matches": matches},
         "stats": stats,
@@ -430,15 +602,20 @@ async def analyze_text_ep(data: TextIn):
 @app.post("/analyze_file")
 async def analyze_file_ep(file: UploadFile = File(...), lang: str = "es"):
     content = await file.read()
-    text = _normalize_spaces(read_any(content, file.filename))
+    with metrics.stage("upload_parse"):
+        text = _normalize_spaces(read_any(content, file.filename))
 
     lt = await languagetool_check(text, lang=lang)
     matches = filter_matches_by_dictionary(text, lt.get("matches") or [])
     if lang.lower().startswith("es"):
-        matches += apply_es_mx(text)
+        with metrics.stage("custom_rules"):
+            matches += apply_es_mx(text)
+        with metrics.stage("merge"):
+            matches = match_merge.merge(matches)
 
     stats = spacy_stats(text)
-    readab = readability_es(text)
+    with metrics.stage("stats"):
+        readab = readability_es(text)
     return {
         "filename": file.filename,
         "languageTool": {"ok": lt.get("ok"), "matches": matches},
@@ -448,49 +625,257 @@ async def analyze_file_ep(file: UploadFile = File(...), lang: str = "es"):
         "lang": lang,
     }
 
-@app.post("/suggest")
-async def suggest_ep(data: TextIn):
-    msgs = [
+def suggest_messages(text: str) -> list[dict]:
+    return [
         {"role": "system",
          "content": "Eres un editor de estilo literario en español (México). Mejora claridad, ritmo y concisión SIN cambiar el significado ni la voz."},
-        {"role": "user", "content": f"Reescribe el siguiente párrafo manteniendo el tono:\n\n{data.text}"},
+        {"role": "user", "content": f"Reescribe el siguiente párrafo manteniendo el tono:\n\n{text}"},
     ]
-    ok, content, err = await call_llm(msgs, temperature=0.4, max_tokens=220)
-    return {"ok": ok, "suggestion": content, "error": err}
 
-@app.post("/suggest_with_refs")
-async def suggest_with_refs(data: TextIn):
-    ctxs = retrieve(data.text, k=4)
-    ctx_text = "\n\n".join([
-        f"[{i+1}] {c['source']} (fragmento {c['chunk_id']}):\n{c['text'][:1200]}"
-        for i, c in enumerate(ctxs)
-    ])
+def refs_messages(text: str, ctx_text: str) -> list[dict]:
     prompt = (
         "Eres un editor de estilo literario en español (México). Mejora el párrafo manteniendo el tono.\n"
         "Usa la guía y ejemplos de referencia (si son relevantes) solo como orientación estilística, no copies literalmente.\n\n"
         f"REFERENCIAS:\n{ctx_text}\n\n"
-        f"TEXTO:\n{data.text}\n\n"
+        f"TEXTO:\n{text}\n\n"
         "Responde con una propuesta clara y pulida."
     )
-    msgs = [
+    return [
         {"role": "system", "content": "Editor de estilo para español de México."},
         {"role": "user", "content": prompt},
     ]
-    ok, content, err = await call_llm(msgs, temperature=0.4, max_tokens=260)
-    return {"ok": ok, "suggestion": content, "error": err, "citations": ctxs}
+
+def _suggest_key(kind: str, text: str, temperature: float, ctxs: list[dict] = ()) -> Optional[str]:
+    if _SUGGEST_CACHE is None:
+        return None
+    ids = [f"{c['source']}#{c['chunk_id']}" for c in ctxs]
+    return cache_key(text, PROMPT_VERSION[kind], MODEL_NAME, temperature, ids)
+
+async def cache_get(key: str) -> Optional[str]:
+    """SQLite es bloqueante: fuera del bucle de eventos."""
+    return await run_in_threadpool(_SUGGEST_CACHE.get, key)
+
+async def cache_put(key: str, value: str) -> None:
+    await run_in_threadpool(_SUGGEST_CACHE.put, key, value)
+
+async def cached_llm(key: Optional[str], msgs: list[dict], temperature: float, max_tokens: int,
+                     regenerate: bool = False) -> tuple[bool, str, Optional[str], bool]:
+    """call_llm con caché persistente: (ok, contenido, error, desde_caché)."""
+    if key is not None and not regenerate:
+        hit = await cache_get(key)
+        if hit is not None:
+            return True, hit, None, True
+    ok, content, err = await call_llm(msgs, temperature=temperature, max_tokens=max_tokens)
+    if ok and content and key is not None:
+        await cache_put(key, content)
+    return ok, content, err, False
+
+# is_disconnected() pasa por receive() con un cancel scope: tras cada token encarece todo el stream
+_SSE_DISCONNECT_CHECK_S = float(os.environ.get("SSE_DISCONNECT_CHECK_S", "0.25"))
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _sse_suggestion(request: Request, msgs: list[dict], max_tokens: int, meta: Optional[dict] = None,
+                          key: Optional[str] = None, regenerate: bool = False):
+    """
+    Reenvía los tokens del LLM como server-sent events: meta? → token* → done | error.
+    Si el cliente se desconecta se deja de iterar y el stream upstream se cierra
+    (se comprueba cada _SSE_DISCONNECT_CHECK_S, no tras cada token).
+    """
+    t0 = time.perf_counter()
+    ttft = None
+    n = 0
+    next_check = t0 + _SSE_DISCONNECT_CHECK_S
+    if meta is not None:
+        yield _sse("meta", meta)
+    if key is not None and not regenerate:
+        hit = await cache_get(key)
+        if hit is not None:
+            yield _sse("token", {"text": hit})
+            yield _sse("done", {"ttft_ms": round((time.perf_counter() - t0) * 1000, 1),
+                                "total_ms": round((time.perf_counter() - t0) * 1000, 1), "tokens": 1, "cached": True})
+            return
+    parts: list[str] = []
+    gen = LLM.stream_chat(msgs, temperature=0.4, max_tokens=max_tokens)
+    try:
+        async for delta in gen:
+            if ttft is None:
+                ttft = (time.perf_counter() - t0) * 1000
+                metrics.STAGE_SECONDS.observe(ttft / 1000, "llm_ttft")
+            n += 1
+            parts.append(delta)
+            yield _sse("token", {"text": delta})
+            now = time.perf_counter()
+            if now >= next_check:
+                next_check = now + _SSE_DISCONNECT_CHECK_S
+                if await request.is_disconnected():
+                    logger.info("SSE: cliente desconectado tras %d tokens; cancelando LLM", n)
+                    return
+        total = (time.perf_counter() - t0) * 1000
+        metrics.STAGE_SECONDS.observe(total / 1000, "llm_stream")
+        logger.info("SSE: ttft=%.0fms total=%.0fms tokens=%d", ttft or -1, total, n)
+        content = "".join(parts).strip()
+        if key is not None and content:
+            await cache_put(key, content)
+        yield _sse("done", {"ttft_ms": round(ttft, 1) if ttft is not None else None,
+                            "total_ms": round(total, 1), "tokens": n, "cached": False})
+    except Exception as e:
+        yield _sse("error", {"error": str(e), "tokens": n})
+    finally:
+        await gen.aclose()
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.post("/suggest")
+async def suggest_ep(data: TextIn):
+    key = _suggest_key("suggest", data.text, 0.4)
+    ok, content, err, cached = await cached_llm(key, suggest_messages(data.text), 0.4, 220, data.regenerate)
+    return {"ok": ok, "suggestion": content, "error": err, "cached": cached}
+
+@app.post("/suggest/stream")
+async def suggest_stream_ep(data: TextIn, request: Request):
+    key = _suggest_key("suggest", data.text, 0.4)
+    return StreamingResponse(_sse_suggestion(request, suggest_messages(data.text), 220,
+                                             key=key, regenerate=data.regenerate),
+                             media_type="text/event-stream", headers=_SSE_HEADERS)
+
+async def _refs_context(data: TextIn) -> tuple[list[dict], str]:
+    ctxs = await run_in_threadpool(retrieve, data.text, 4, data.lang, data.retrieval)
+    return ctxs, format_refs(pack_context(ctxs, RAG_CTX_TOKENS))
+
+@app.post("/suggest_with_refs")
+async def suggest_with_refs(data: TextIn):
+    ctxs, ctx_text = await _refs_context(data)
+    key = _suggest_key("refs", data.text, 0.4, ctxs)
+    ok, content, err, cached = await cached_llm(key, refs_messages(data.text, ctx_text), 0.4, 260, data.regenerate)
+    return {"ok": ok, "suggestion": content, "error": err, "citations": ctxs, "cached": cached}
+
+@app.post("/suggest_with_refs/stream")
+async def suggest_with_refs_stream(data: TextIn, request: Request):
+    ctxs, ctx_text = await _refs_context(data)
+    key = _suggest_key("refs", data.text, 0.4, ctxs)
+    return StreamingResponse(_sse_suggestion(request, refs_messages(data.text, ctx_text), 260, meta={"citations": ctxs},
+                                             key=key, regenerate=data.regenerate),
+                             media_type="text/event-stream", headers=_SSE_HEADERS)
+
+async def _batch_contexts(data: SuggestBatchIn, texts: list[str]) -> list[list[dict]]:
+    if not data.with_refs:
+        return [[] for _ in texts]
+    return await run_in_threadpool(retrieve_batch, texts, 4, data.lang, data.retrieval)
+
+async def _batch_one(i: int, p: BatchParagraph, ctxs: list[dict], data: SuggestBatchIn,
+                     own: asyncio.Semaphore) -> dict:
+    pid = p.id if p.id is not None else str(i)
+    if not p.text.strip():
+        return {"id": pid, "index": i, "ok": True, "suggestion": "", "error": None, "cached": False, "skipped": True}
+    kind = "refs" if data.with_refs else "suggest"
+    key = _suggest_key(kind, p.text, 0.4, ctxs)
+    if key is not None and not data.regenerate:
+        hit = await cache_get(key)
+        if hit is not None:   # los aciertos de caché no consumen hueco del LLM
+            return {"id": pid, "index": i, "ok": True, "suggestion": hit, "error": None, "cached": True}
+    if data.with_refs:
+        msgs, max_tokens = refs_messages(p.text, format_refs(pack_context(ctxs, RAG_CTX_TOKENS))), 260
+    else:
+        msgs, max_tokens = suggest_messages(p.text), 220
+    async with own, LLM_SLOTS.slot((0 if p.visible else 1, p.priority)):
+        ok, content, err, _ = await cached_llm(key, msgs, 0.4, max_tokens, regenerate=True)
+    row = {"id": pid, "index": i, "ok": ok, "suggestion": content, "error": err, "cached": False}
+    if data.with_refs:
+        row["citations"] = ctxs
+    return row
+
+@app.post("/suggest_batch")
+async def suggest_batch(data: SuggestBatchIn, request: Request):
+    """
+    Sugerencias para muchos párrafos (p. ej. un capítulo). Los visibles se
+    atienden primero y la concurrencia hacia el LLM está acotada; con
+    stream=true cada resultado se envía (NDJSON) en cuanto termina.
+    """
+    if len(data.paragraphs) > SUGGEST_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo {SUGGEST_BATCH_MAX} párrafos por lote")
+    texts = [p.text for p in data.paragraphs]
+    contexts = await _batch_contexts(data, texts)
+    own = asyncio.Semaphore(max(1, min(int(data.concurrency or LLM_SLOTS.limit), LLM_SLOTS.limit)))
+    # creadas por prioridad: el semáforo del lote despierta en orden de llegada
+    order = sorted(range(len(texts)), key=lambda i: (not data.paragraphs[i].visible, data.paragraphs[i].priority, i))
+    tasks = [asyncio.create_task(_batch_one(i, data.paragraphs[i], contexts[i], data, own)) for i in order]
+    t0 = time.perf_counter()
+
+    if not data.stream:
+        try:
+            results = sorted(await asyncio.gather(*tasks), key=lambda r: r["index"])
+        finally:
+            for t in tasks:
+                t.cancel()
+        return {"ok": all(r["ok"] for r in results), "results": results,
+                "total_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+    async def _ndjson():
+        done = failed = cached = 0
+        try:
+            for fut in asyncio.as_completed(tasks):
+                row = await fut
+                done += 1
+                failed += not row["ok"]
+                cached += row["cached"]
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+                if await request.is_disconnected():
+                    logger.info("Lote: cliente desconectado tras %d/%d párrafos", done, len(tasks))
+                    return
+            yield json.dumps({"done": True, "count": done, "failed": failed, "cached": cached,
+                              "total_ms": round((time.perf_counter() - t0) * 1000, 1)}) + "\n"
+        finally:
+            for t in tasks:   # desconexión: los pendientes liberan su turno en la cola
+                t.cancel()
+
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
+
+@app.post("/retrieve_batch")
+async def retrieve_batch_ep(data: RetrieveBatchIn):
+    k = max(1, min(int(data.k or 4), 20))
+    results = await run_in_threadpool(retrieve_batch, data.texts, k, data.lang, data.retrieval)
+    if not data.pack:
+        return {"ok": True, "results": results}
+    return {"ok": True, "results": results,
+            "contexts": [pack_context(r, data.budget_tokens) for r in results]}
 
 @app.post("/apply_lt")
 async def apply_lt(ep: ApplyIn):
     original = _normalize_spaces(ep.text)
+    edits: Optional[list] = None
     if ep.mode == "safe":
         new_text, applied = apply_safe(original)
     else:
         lt = await languagetool_check(original)
         matches = filter_matches_by_dictionary(original, lt.get("matches") or [])
         rule_filter = set(ep.rules or []) if ep.mode == "rules" else None
-        new_text, applied = apply_lt_replacements(original, matches, rule_filter=rule_filter)
-    diff = make_unified_diff(original, new_text)
-    return {"applied": int(applied), "new_text": new_text, "diff": diff}
+        edits = []
+        new_text, applied = apply_lt_replacements(original, matches, rule_filter=rule_filter, edits_out=edits)
+
+    if ep.diff_mode == "unified":
+        return {"applied": int(applied), "new_text": new_text, "diff": make_unified_diff(original, new_text)}
+    if ep.diff_mode == "none":
+        return {"applied": int(applied), "new_text": new_text, "diff": ""}
+
+    if ep.stream:
+        if edits is not None:
+            changes = iter(textdiff.changes_from_edits(original, edits))
+        else:
+            changes = textdiff.iter_changes(original, new_text,
+                                            granularity="char" if ep.diff_mode == "chars" else "word")
+
+        def _ndjson():
+            yield json.dumps({"applied": int(applied), "new_text": new_text}, ensure_ascii=False) + "\n"
+            for c in changes:
+                yield json.dumps(c, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
+
+    changes = make_changes(original, new_text, ep.diff_mode, edits=edits)
+    diff = textdiff.render_word_diff(changes, original)
+    return {"applied": int(applied), "new_text": new_text, "diff": diff, "changes": changes}
 
 # ───────────── Alias de compatibilidad ─────────────
 @app.post("/analyze/text")
@@ -518,7 +903,7 @@ async def apply_all_alias(data: _ApplyAllIn):
 # ───────────── Diccionario endpoints ─────────────
 @app.get("/dictionary/list")
 def dictionary_list(lang: str = "es"):
-    return {"words": sorted(list(DICT))}
+    return {"words": sorted(user_words())}
 
 class _DictIn(BaseModel):
     token: str
@@ -529,7 +914,7 @@ def dictionary_add(item: _DictIn):
     token = (item.token or "").strip()
     if not token:
         raise HTTPException(status_code=400, detail="token vacío")
-    DICT.add(token.lower())
+    _update_dict(lambda words: words.add(token.lower()))
     return {"ok": True}
 
 @app.post("/dictionary/remove")
@@ -537,21 +922,126 @@ def dictionary_remove(item: _DictIn):
     token = (item.token or "").strip()
     if not token:
         raise HTTPException(status_code=400, detail="token vacío")
-    DICT.discard(token.lower())
+    _update_dict(lambda words: words.discard(token.lower()))
     return {"ok": True}
 
 # ───────────── Utilidades de mantenimiento ─────────────
-@app.post("/refresh_corpus")
-async def refresh_corpus():
+# El trabajo vive en data/ds/refresh.json (bajo candado entre procesos): cualquier
+# worker ve su avance y no arranca otro mientras siga vivo. Quien lo ejecuta
+# reescribe el archivo a menudo; sin latido en REFRESH_STALE_S se da por muerto.
+_REFRESH_STATUS = DS_DIR / "refresh.json"
+_REFRESH_STALE_S = float(os.environ.get("REFRESH_STALE_S", "900"))
+_REFRESH_BEAT_S = 2.0
+_REFRESH_LOG_LINES = 200
+_KEEP_BUILDS = 2
+
+def _read_job() -> dict:
+    try:
+        job = json.loads(_REFRESH_STATUS.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return job if isinstance(job, dict) else {}
+
+def _save_job(job: dict, force: bool = True) -> None:
+    now = time.time()
+    if force or now - job.get("updated", 0) >= _REFRESH_BEAT_S:
+        job["updated"] = now
+        atomic_write_text(_REFRESH_STATUS, json.dumps(job, ensure_ascii=False))
+
+def _job_running(job: dict) -> bool:
+    return bool(job) and job.get("finished") is None and time.time() - job.get("updated", 0) < _REFRESH_STALE_S
+
+def _job_log(job: dict, line: str) -> None:
+    job["log"].append(line.rstrip())
+    del job["log"][:-_REFRESH_LOG_LINES]
+    _save_job(job, force=False)
+
+def _run_step(job: dict, step: str, args: list[str]) -> None:
+    job["state"] = step
+    _save_job(job)
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, encoding="utf-8", errors="replace")
+    for line in proc.stdout:
+        _job_log(job, line)
+    if proc.wait() != 0:
+        raise RuntimeError(f"{step} terminó con código {proc.returncode}")
+
+def _seed_build(src: Path, dst: Path) -> None:
+    """Copia los índices del build activo al staging para que build_index.py sea incremental.
+    Sin data/ds/CURRENT el activo es data/ds mismo: el puntero, el trabajo y sus candados no se copian."""
+    skip = {"CURRENT", _REFRESH_STATUS.name}
+    dst.mkdir(parents=True, exist_ok=True)
+    for f in src.iterdir():
+        if f.is_file() and f.name not in skip and not f.name.endswith((".tmp", ".lock")):
+            shutil.copy2(f, dst / f.name)
+
+def _prune_builds(keep: Path) -> None:
+    builds = sorted((p for p in (DS_DIR / "builds").iterdir() if p.is_dir() and p != keep),
+                    key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in builds[_KEEP_BUILDS - 1:]:
+        shutil.rmtree(old, ignore_errors=True)   # en Windows puede seguir abierto: se reintenta luego
+
+def _refresh_worker(job: dict) -> None:
     py = sys.executable
+    staging = DS_DIR / "builds" / job["id"]
+    fresh = None
     try:
-        r1 = subprocess.run([py, str(BASE_DIR / "tools" / "pdf_to_txt.py")], capture_output=True, text=True)
-        r2 = subprocess.run([py, str(BASE_DIR / "tools" / "build_index.py")], capture_output=True, text=True)
-        global _FAISS, _META, _EMB_MODEL
-        _FAISS = _META = _EMB_MODEL = None
-        return {"ok": True, "pdf_to_txt": r1.stdout + r1.stderr, "build_index": r2.stdout + r2.stderr}
+        _seed_build(_current_indexes().ds_dir, staging)
+        _run_step(job, "pdf_to_txt", [py, str(BASE_DIR / "tools" / "pdf_to_txt.py")])
+        _run_step(job, "build_index", [py, str(BASE_DIR / "tools" / "build_index.py"), "--out", str(staging)])
+
+        # calentar: abrir todos los índices del staging y una consulta de prueba
+        job["state"] = "warming"
+        _save_job(job)
+        fresh = IndexRegistry(staging)
+        for lang in LANG_SUFFIX:
+            li = fresh.get(lang, dense=True, lexical=True) or fresh.get(lang)
+            if li is not None and li.index is not None:
+                li.index.search(_ensure_encoder().encode_queries(["calentamiento"]), 1)
+
+        job["state"] = "swapping"
+        _save_job(job)
+        with _INDEXES_LOCK:
+            set_active(DS_DIR, staging)
+            _swap_indexes(fresh)   # el anterior se cierra al terminar sus consultas
+        _prune_builds(keep=staging)
+        job["state"] = "done"
+        job["ds_dir"] = str(staging)
     except Exception as e:
-        return {"ok": False, "error": str(e)}
+        job["state"] = "error"
+        job["error"] = str(e)
+        if fresh is not None and fresh is not _INDEXES:
+            fresh.close()   # sus mmap impedirían borrar el staging en Windows
+        shutil.rmtree(staging, ignore_errors=True)
+    finally:
+        job["finished"] = time.time()
+        _save_job(job)
+
+def _job_view(job: dict) -> dict:
+    return dict(job, log=(job.get("log") or [])[-20:])
+
+@app.post("/refresh_corpus")
+def refresh_corpus():
+    """Lanza la reconstrucción en segundo plano; consulta el avance en /refresh_corpus/status."""
+    with file_lock(_REFRESH_STATUS):
+        current = _read_job()
+        if _job_running(current):
+            return {"ok": True, "running": True, "job": _job_view(current)}
+        job = {"id": time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6], "state": "queued",
+               "started": time.time(), "finished": None, "error": None, "log": [], "pid": os.getpid()}
+        _save_job(job)
+    threading.Thread(target=_refresh_worker, args=(job,), name="refresh-corpus", daemon=True).start()
+    return {"ok": True, "running": True, "job": _job_view(job)}
+
+@app.get("/refresh_corpus/status")
+def refresh_corpus_status():
+    job = _read_job()
+    if not job:
+        return {"ok": True, "running": False, "job": None, "indexes": _current_indexes().status()}
+    if job.get("finished") is None and not _job_running(job):
+        job["state"], job["error"] = "error", "el worker que lo ejecutaba dejó de responder"
+    return {"ok": True, "running": _job_running(job),
+            "job": _job_view(job), "indexes": _current_indexes().status()}
 
 @app.post("/reload_rules")
 async def reload_rules():
@@ -559,7 +1049,53 @@ async def reload_rules():
     return {"ok": True, "rules_loaded": bool(ES_MX)}
 
 # ───── DOCX preservando formato (análisis + aplicación) ─────
-_DOCX_SESSIONS: dict[str, dict] = {}
+# Sesiones en disco (data/docx_sessions/<id>.docx + <id>.json): la aplicación
+# puede caer en otro worker que el análisis. Caducan tras DOCX_SESSION_TTL_S.
+DOCX_SESSIONS_DIR = Path(os.environ.get("DOCX_SESSIONS_DIR", str(BASE_DIR / "data" / "docx_sessions")))
+DOCX_SESSION_TTL_S = float(os.environ.get("DOCX_SESSION_TTL_S", str(6 * 3600)))
+
+def _docx_session_paths(session_id: str) -> Optional[tuple[Path, Path]]:
+    try:
+        sid = str(uuid.UUID(session_id))
+    except (ValueError, TypeError):
+        return None
+    return DOCX_SESSIONS_DIR / f"{sid}.docx", DOCX_SESSIONS_DIR / f"{sid}.json"
+
+def _save_docx_session(content: bytes, mapping: list, full_text: str, filename: str) -> str:
+    session_id = str(uuid.uuid4())
+    doc_path, meta_path = _docx_session_paths(session_id)
+    DOCX_SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = doc_path.with_name(doc_path.name + ".tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, doc_path)
+    # el JSON va al final: si existe, la sesión está completa
+    atomic_write_text(meta_path, json.dumps({"mapping": mapping, "full_text": full_text, "filename": filename},
+                                            ensure_ascii=False))
+    _sweep_docx_sessions()
+    return session_id
+
+def _load_docx_session(session_id: str) -> Optional[dict]:
+    paths = _docx_session_paths(session_id)
+    if paths is None:
+        return None
+    doc_path, meta_path = paths
+    try:
+        if time.time() - meta_path.stat().st_mtime > DOCX_SESSION_TTL_S:
+            return None
+        sess = json.loads(meta_path.read_text(encoding="utf-8"))
+        sess["doc_bytes"] = doc_path.read_bytes()
+    except (OSError, ValueError):
+        return None
+    return sess
+
+def _sweep_docx_sessions() -> None:
+    now = time.time()
+    for p in DOCX_SESSIONS_DIR.iterdir():
+        try:
+            if now - p.stat().st_mtime > DOCX_SESSION_TTL_S:
+                p.unlink()
+        except OSError:
+            pass
 
 def docx_to_text_and_map(doc) -> tuple[str, list]:
     text_parts: list[str] = []
@@ -607,7 +1143,7 @@ def build_edits_from_matches(matches, mode="lt_all", base_text: Optional[str] =
     if mode == "safe":
         return []
     edits = []
-    allow = set(w.lower() for w in DICT)
+    allow = user_words()
     for m in matches:
         reps = m.get("replacements") or []
         if not reps:
@@ -635,13 +1171,7 @@ async def analyze_docx_preserving(file: UploadFile = File(...)):
     matches = filter_matches_by_dictionary(full_text_norm, lt.get("matches") or [])
     matches += apply_es_mx(full_text_norm)
 
-    session_id = str(uuid.uuid4())
-    _DOCX_SESSIONS[session_id] = {
-        "doc_bytes": content,
-        "mapping": mapping,
-        "full_text": full_text,
-        "filename": file.filename,
-    }
+    session_id = await run_in_threadpool(_save_docx_session, content, mapping, full_text, file.filename)
 
     return {
         "session_id": session_id,
@@ -656,7 +1186,7 @@ class ApplyDocxIn(BaseModel):
 
 @app.post("/apply_docx_preserving")
 async def apply_docx_preserving(data: ApplyDocxIn):
-    sess = _DOCX_SESSIONS.get(data.session_id)
+    sess = await run_in_threadpool(_load_docx_session, data.session_id)
     if not sess:
         raise HTTPException(status_code=404, detail="session_id no válido o expirado")
 
@@ -0,0 +1,181 @@
+# backend/admission.py — control de admisión y prioridad hacia LanguageTool
+# - Clases de prioridad: interactive (párrafos mientras se escribe) antes que bulk
+#   (archivos completos, partidos en fragmentos)
+# - LT_CONCURRENCY huecos hacia LT; cada fragmento bulk pide hueco por separado,
+#   así un párrafo interactivo se cuela entre dos fragmentos de un manuscrito
+# - Límite de peticiones en curso por cliente y clase, y de cola por clase:
+#   al superarlos se lanza Overloaded con un Retry-After estimado (-> 429)
+# - El cliente es la cabecera X-Client-Id o, sin ella, la IP: detrás de un proxy
+#   o NAT todos comparten límite, así que quien reparta a varios usuarios debe
+#   mandar un X-Client-Id por usuario. ADMIT_PER_CLIENT_*=0 desactiva el límite
+# Síncrono (threading): los endpoints de backend/main.py corren en el threadpool
+# de anyio y quien espera hueco retiene su hilo. Por eso las peticiones admitidas
+# por clase se acotan (ADMIT_MAX_INFLIGHT_*) y entre las dos clases quedan por
+# debajo de LIA_THREADPOOL_SIZE, que se fija al arrancar (size_threadpool): si
+# los bulk ocuparan todos los hilos, los interactive esperarían un hilo en FIFO
+# sin llegar nunca al montículo de prioridad.
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITY = {INTERACTIVE: 0, BULK: 1}
+
+logger = logging.getLogger("lia-backend")
+
+LT_CONCURRENCY = int(os.environ.get("LT_CONCURRENCY", "4"))
+THREADPOOL_SIZE = int(os.environ.get("LIA_THREADPOOL_SIZE", "40"))
+ADMIT_PER_CLIENT = {INTERACTIVE: int(os.environ.get("ADMIT_PER_CLIENT_INTERACTIVE", "4")),
+                    BULK: int(os.environ.get("ADMIT_PER_CLIENT_BULK", "1"))}
+# por defecto: mitad de los hilos para interactive, un cuarto para bulk y el
+# resto libre para los demás endpoints (diccionario, health, ...)
+ADMIT_MAX_INFLIGHT = {INTERACTIVE: int(os.environ.get("ADMIT_MAX_INFLIGHT_INTERACTIVE", str(max(1, THREADPOOL_SIZE // 2)))),
+                      BULK: int(os.environ.get("ADMIT_MAX_INFLIGHT_BULK", str(max(1, THREADPOOL_SIZE // 4))))}
+ADMIT_MAX_QUEUE = {INTERACTIVE: int(os.environ.get("ADMIT_MAX_QUEUE_INTERACTIVE", str(ADMIT_MAX_INFLIGHT[INTERACTIVE]))),
+                   BULK: int(os.environ.get("ADMIT_MAX_QUEUE_BULK", str(ADMIT_MAX_INFLIGHT[BULK])))}
+ADMIT_MAX_WAIT_S = {INTERACTIVE: float(os.environ.get("ADMIT_MAX_WAIT_INTERACTIVE_S", "20")),
+                    BULK: float(os.environ.get("ADMIT_MAX_WAIT_BULK_S", "600"))}
+ADMIT_BULK_CHARS = int(os.environ.get("ADMIT_BULK_CHARS", "20000"))   # más largo => bulk
+LT_SHARD_CHARS = int(os.environ.get("LT_SHARD_CHARS", "20000"))
+
+
+class Overloaded(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after))
+
+
+def size_threadpool(total: int = THREADPOOL_SIZE) -> None:
+    """Fija los hilos del threadpool de anyio (desde el event loop, al arrancar)."""
+    import anyio.to_thread
+    anyio.to_thread.current_default_thread_limiter().total_tokens = max(1, total)
+    if sum(ADMIT_MAX_INFLIGHT.values()) >= total:
+        logger.warning("ADMIT_MAX_INFLIGHT_* (%s) no deja hilos libres en un threadpool de %d",
+                       ADMIT_MAX_INFLIGHT, total)
+
+
+def classify(text_len: int, requested: str = "") -> str:
+    """El cliente puede pedir bulk; interactive solo se concede a textos cortos."""
+    if requested == BULK or text_len > ADMIT_BULK_CHARS:
+        return BULK
+    return INTERACTIVE
+
+
+def shard_text(text: str, max_chars: int = LT_SHARD_CHARS) -> List[Tuple[int, str]]:
+    """[(offset, fragmento)] cortando en saltos de párrafo (o de línea / espacio) cerca del límite."""
+    if len(text) <= max_chars:
+        return [(0, text)]
+    out = []
+    start = 0
+    n = len(text)
+    while start < n:
+        end = min(n, start + max_chars)
+        if end < n:
+            window = text[start + max_chars // 2:end]
+            for sep in ("\n\n", "\n", ". ", " "):
+                cut = window.rfind(sep)
+                if cut != -1:
+                    end = start + max_chars // 2 + cut + len(sep)
+                    break
+        out.append((start, text[start:end]))
+        start = end
+    return out
+
+
+class AdmissionController:
+    def __init__(self, slots: int = LT_CONCURRENCY):
+        self.slots = max(1, slots)
+        self.active = 0
+        self._cv = threading.Condition()
+        self._heap: List[tuple] = []          # (prioridad, seq)
+        self._seq = itertools.count()
+        self._waiting: Dict[str, int] = {c: 0 for c in PRIORITY}
+        self._clients: Dict[Tuple[str, str], int] = {}
+        self._inflight: Dict[str, int] = {c: 0 for c in PRIORITY}
+        self._service_s = 0.5                 # media móvil del tiempo por hueco
+        self.rejected: Dict[str, int] = {c: 0 for c in PRIORITY}
+
+    # ---- nivel petición: límite por clase (hilos) y por cliente ----
+    @contextmanager
+    def admit(self, client: str, cls: str):
+        key = (client, cls)
+        with self._cv:
+            if self._inflight[cls] >= ADMIT_MAX_INFLIGHT[cls]:
+                self.rejected[cls] += 1
+                raise Overloaded(f"Demasiadas peticiones {cls} en curso", self._retry_after(cls))
+            limit = ADMIT_PER_CLIENT[cls]
+            if limit > 0 and self._clients.get(key, 0) >= limit:
+                self.rejected[cls] += 1
+                raise Overloaded(f"Demasiadas peticiones {cls} en curso para este cliente", self._retry_after(cls))
+            self._clients[key] = self._clients.get(key, 0) + 1
+            self._inflight[cls] += 1
+        try:
+            yield
+        finally:
+            with self._cv:
+                self._inflight[cls] -= 1
+                left = self._clients[key] - 1
+                if left:
+                    self._clients[key] = left
+                else:
+                    del self._clients[key]
+
+    # ---- nivel llamada a LT: hueco por prioridad ----
+    @contextmanager
+    def slot(self, cls: str):
+        self._acquire(cls)
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            dt = time.monotonic() - t0
+            with self._cv:
+                self._service_s = 0.8 * self._service_s + 0.2 * dt
+                self.active -= 1
+                self._cv.notify_all()
+
+    def _acquire(self, cls: str) -> None:
+        entry = (PRIORITY[cls], next(self._seq))
+        deadline = time.monotonic() + ADMIT_MAX_WAIT_S[cls]
+        with self._cv:
+            if self._waiting[cls] >= ADMIT_MAX_QUEUE[cls]:
+                self.rejected[cls] += 1
+                raise Overloaded(f"Cola {cls} llena", self._retry_after(cls))
+            heapq.heappush(self._heap, entry)
+            self._waiting[cls] += 1
+            try:
+                while not (self.active < self.slots and self._heap[0] == entry):
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        self.rejected[cls] += 1
+                        raise Overloaded(f"Sin capacidad de LT tras {ADMIT_MAX_WAIT_S[cls]:.0f} s", self._retry_after(cls))
+                    self._cv.wait(left)
+                heapq.heappop(self._heap)
+                self.active += 1
+            except BaseException:
+                if entry in self._heap:
+                    self._heap.remove(entry)
+                    heapq.heapify(self._heap)
+                raise
+            finally:
+                self._waiting[cls] -= 1
+                self._cv.notify_all()   # el siguiente en la cola puede ser otro
+
+    def _retry_after(self, cls: str) -> int:
+        ahead = sum(1 for p, _ in self._heap if p <= PRIORITY[cls]) + self.active
+        return int(ahead * self._service_s / self.slots) + 1
+
+    def status(self) -> dict:
+        with self._cv:
+            return {"slots": self.slots, "active": self.active, "waiting": dict(self._waiting),
+                    "inflight": dict(self._inflight),
+                    "clients": len(self._clients), "rejected": dict(self.rejected),
+                    "avg_slot_s": round(self._service_s, 3)}
@@ -0,0 +1,210 @@
+# backend/bm25.py — recuperación léxica BM25 sobre los fragmentos del corpus
+# - Índice invertido persistido en data/ds/bm25{sfx}.bin (postings compactos)
+#     cabecera | offsets de términos (u32) | inicio y df por término (u32) |
+#     términos utf-8 ordenados | longitudes de doc (u32) | docids (u32) | tf (u16)
+# - Lectura con mmap, vocabulario incluido (búsqueda binaria sobre los términos):
+#   abrir no decodifica nada y los workers comparten las páginas; no requiere
+#   sentence_transformers ni FAISS
+# - rrf_fuse(): fusión por rango recíproco con los resultados densos
+from __future__ import annotations
+
+import heapq
+import math
+import mmap
+import os
+import re
+import struct
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+_MAGIC = b"LIABM252"
+# magic, n_docs, n_postings, n_términos, bytes de términos, avgdl
+_HEADER = struct.Struct("<8sIIIId")
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset("""
+a al algo ante antes como con contra cual cuando de del desde donde durante e el ella ellas ellos
+en entre era es esa ese eso esta este esto fue ha han hasta la las le les lo los mas me mi mientras
+muy ni no nos o os para pero poco por porque que quien se sea ser si sin sobre son su sus tambien
+te tiene todo tu un una uno unos unas y ya
+an and are as at be by for from has have in is it its of on or that the this to was were which with
+""".split())
+
+K1 = 1.5
+B = 0.75
+
+
+def _fold(s: str) -> str:
+    s = unicodedata.normalize("NFKD", s.lower())
+    return "".join(c for c in s if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas sin acentos, sin palabras vacías ni tokens de un carácter."""
+    return [t for t in _TOKEN.findall(_fold(text)) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def _pad4(n: int) -> int:
+    return (4 - n % 4) % 4
+
+
+def write_index(path: Path, chunks: Iterable[str]) -> int:
+    """Construye y guarda el índice (tmp + os.replace). Devuelve el número de documentos."""
+    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    doclens = array("I")
+    for doc_id, ch in enumerate(chunks):
+        toks = tokenize(ch)
+        doclens.append(len(toks))
+        for term, tf in Counter(toks).items():
+            postings[term].append((doc_id, min(tf, 0xFFFF)))
+    n_docs = len(doclens)
+    avgdl = (sum(doclens) / n_docs) if n_docs else 0.0
+    # orden por bytes utf-8 = orden por code point: el mismo que usa la búsqueda binaria
+    terms = sorted(postings)
+    term_offs = array("I", [0])
+    starts = array("I")
+    dfs = array("I")
+    blob = bytearray()
+    docids = array("I")
+    tfs = array("H")
+    for term in terms:
+        plist = postings[term]
+        blob += term.encode("utf-8")
+        term_offs.append(len(blob))
+        starts.append(len(docids))
+        dfs.append(len(plist))
+        for d, tf in plist:
+            docids.append(d)
+            tfs.append(tf)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, n_docs, len(docids), len(terms), len(blob), avgdl))
+        for arr in (term_offs, starts, dfs):
+            f.write(arr.tobytes())
+        f.write(bytes(blob))
+        f.write(b"\x00" * _pad4(len(blob)))
+        f.write(doclens.tobytes())
+        f.write(docids.tobytes())
+        f.write(tfs.tobytes())
+    os.replace(tmp, path)
+    return n_docs
+
+
+def is_current(path: Path) -> bool:
+    """True si el archivo existe y tiene el formato actual (para saber si hay que reconstruir)."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(_MAGIC)) == _MAGIC
+    except OSError:
+        return False
+
+
+class BM25Index:
+    def __init__(self, path: Path):
+        self._f = self._mm = None
+        self._views: List[memoryview] = []
+        try:
+            self._f = open(path, "rb")
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)   # vacío: ValueError
+            magic, n_docs, n_post, n_terms, tbytes, avgdl = _HEADER.unpack_from(self._mm, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"Índice BM25 inválido o de formato anterior (reconstruye): {path}")
+            self.n_docs = int(n_docs)
+            self.n_terms = int(n_terms)
+            self.avgdl = float(avgdl) or 1.0
+            view = memoryview(self._mm)
+            self._views.append(view)
+            pos = _HEADER.size
+
+            def take(nbytes: int, fmt: Optional[str]) -> memoryview:
+                nonlocal pos
+                if pos + nbytes > len(self._mm):
+                    raise ValueError(f"Índice BM25 truncado: {path}")
+                v = view[pos:pos + nbytes]
+                pos += nbytes
+                self._views.append(v)
+                if fmt:
+                    v = v.cast(fmt)
+                    self._views.append(v)
+                return v
+
+            self._term_offs = take(4 * (self.n_terms + 1), "I")
+            self._starts = take(4 * self.n_terms, "I")
+            self._dfs = take(4 * self.n_terms, "I")
+            self._terms = take(int(tbytes), None)
+            pos += _pad4(int(tbytes))
+            self._doclens = take(4 * self.n_docs, "I")
+            self._docids = take(4 * n_post, "I")
+            self._tfs = take(2 * n_post, "H")
+        except BaseException:
+            self.close()   # no dejar archivo ni mapa abiertos (en Windows bloquean el reemplazo)
+            raise
+
+    def close(self) -> None:
+        for v in reversed(self._views):
+            v.release()
+        self._views = []
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def _term(self, i: int) -> bytes:
+        return bytes(self._terms[self._term_offs[i]:self._term_offs[i + 1]])
+
+    def lookup(self, term: str) -> Optional[Tuple[int, int]]:
+        """(inicio en los postings, df) del término, o None."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and self._term(lo) == key:
+            return self._starts[lo], self._dfs[lo]
+        return None
+
+    @classmethod
+    def open(cls, path: Path) -> Optional["BM25Index"]:
+        if not path.exists():
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """[(doc_id, score)] ordenado por score descendente."""
+        scores: Dict[int, float] = defaultdict(float)
+        n = self.n_docs
+        for term in set(tokenize(query)):
+            entry = self.lookup(term)
+            if not entry:
+                continue
+            start, df = entry
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            for j in range(start, start + df):
+                d = self._docids[j]
+                tf = self._tfs[j]
+                norm = K1 * (1.0 - B + B * self._doclens[d] / self.avgdl)
+                scores[d] += idf * tf * (K1 + 1.0) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+
+
+def rrf_fuse(rankings: Sequence[Sequence[int]], k: int = 4, c: int = 60) -> List[Tuple[int, float]]:
+    """Reciprocal Rank Fusion de varias listas de doc_ids ya ordenadas."""
+    fused: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, d in enumerate(ranking):
+            fused[d] += 1.0 / (c + rank + 1)
+    return heapq.nlargest(k, fused.items(), key=lambda kv: kv[1])
@@ -0,0 +1,97 @@
+# backend/chunk_store.py — almacén compacto de fragmentos para RAG
+# - <nombre>.bin : textos UTF-8 concatenados (blob)
+# - <nombre>.idx : cabecera + offsets uint64 (n+1, orden nativo) dentro del blob
+# Lectura con mmap: get(i) es O(1) y no lee archivos por consulta.
+from __future__ import annotations
+
+import mmap
+import os
+import re
+import struct
+from array import array
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+_MAGIC = b"LIACHK1\x00"
+_HEADER = struct.Struct("<8sQ")  # magic, número de fragmentos
+
+
+def chunk_text(t: str, max_chars: int = 800) -> List[str]:
+    """Troceo usado por build_index.py (espacios colapsados, bloques fijos)."""
+    t = re.sub(r"\s+", " ", t)
+    return [t[i:i + max_chars] for i in range(0, len(t), max_chars)]
+
+
+def store_paths(base: Path) -> tuple[Path, Path]:
+    """base = DS/'chunks_es_mx' → (chunks_es_mx.bin, chunks_es_mx.idx)."""
+    return base.with_suffix(".bin"), base.with_suffix(".idx")
+
+
+def write_store(base: Path, chunks: Iterable[str]) -> int:
+    """Escribe blob + offsets (vía archivos temporales y os.replace)."""
+    bin_path, idx_path = store_paths(base)
+    bin_tmp = bin_path.with_name(bin_path.name + ".tmp")
+    idx_tmp = idx_path.with_name(idx_path.name + ".tmp")
+    offsets = array("Q", [0])
+    with open(bin_tmp, "wb") as fb:
+        for ch in chunks:
+            data = ch.encode("utf-8")
+            fb.write(data)
+            offsets.append(offsets[-1] + len(data))
+    with open(idx_tmp, "wb") as fi:
+        fi.write(_HEADER.pack(_MAGIC, len(offsets) - 1))
+        fi.write(offsets.tobytes())
+    os.replace(bin_tmp, bin_path)
+    os.replace(idx_tmp, idx_path)
+    return len(offsets) - 1
+
+
+class ChunkStore:
+    """Vista de solo lectura sobre un almacén; mantiene ambos archivos mapeados."""
+
+    def __init__(self, base: Path):
+        bin_path, idx_path = store_paths(base)
+        self._fb = self._fi = self._idx = self._offs = None
+        self._blob = b""
+        try:
+            self._fb = open(bin_path, "rb")
+            self._fi = open(idx_path, "rb")
+            size = os.fstat(self._fb.fileno()).st_size
+            self._blob = mmap.mmap(self._fb.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            self._idx = mmap.mmap(self._fi.fileno(), 0, access=mmap.ACCESS_READ)   # .idx vacío: ValueError
+            magic, count = _HEADER.unpack_from(self._idx, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"Almacén de fragmentos inválido: {idx_path}")
+            self._count = int(count)
+            self._offs = memoryview(self._idx)[_HEADER.size:_HEADER.size + 8 * (self._count + 1)].cast("Q")
+        except BaseException:
+            self.close()   # no dejar archivos ni mapas abiertos (en Windows bloquean el reemplazo)
+            raise
+
+    @classmethod
+    def open(cls, base: Path) -> Optional["ChunkStore"]:
+        bin_path, idx_path = store_paths(base)
+        if not bin_path.exists() or not idx_path.exists():
+            return None
+        try:
+            return cls(base)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, i: int) -> str:
+        if i < 0 or i >= self._count:
+            raise IndexError(i)
+        return bytes(self._blob[self._offs[i]:self._offs[i + 1]]).decode("utf-8", errors="ignore")
+
+    def close(self) -> None:
+        if getattr(self, "_offs", None) is not None:
+            self._offs.release()
+            self._offs = None
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        for h in (self._idx, self._fb, self._fi):
+            if h is not None:
+                h.close()
@@ -0,0 +1,92 @@
+# backend/compact.py — respuestas de análisis compactas (opt-in)
+# - Selección de campos de primer nivel (text, stats, readability, ...)
+# - Por match se omiten context/sentence (y lo que se pida) y las sugerencias
+#   se mandan como lista de strings
+# - Metadatos de regla internados: "rules" se envía una vez y cada match
+#   lleva en "rule" el índice en esa tabla
+# - Sugerencias: como mucho max_replacements por match (MAX_REPLACEMENTS por
+#   defecto, 0 = todas); el límite usado viaja en "maxReplacements"
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+FORMAT = "compact-v1"
+DEFAULT_OMIT = ("context", "sentence")
+MAX_REPLACEMENTS = 5
+_RULE_KEYS = ("id", "subId", "description", "issueType", "category")
+
+
+def _rule_entry(rule: dict) -> dict:
+    out = {k: rule[k] for k in _RULE_KEYS if k in rule and rule[k] is not None}
+    cat = out.get("category")
+    if isinstance(cat, dict):
+        out["category"] = {k: cat[k] for k in ("id", "name") if k in cat}
+    return out
+
+
+def _rule_key(rule: dict) -> Tuple:
+    cat = rule.get("category") or {}
+    return (rule.get("id"), rule.get("subId"), rule.get("description"), rule.get("issueType"),
+            cat.get("id") if isinstance(cat, dict) else cat)
+
+
+def compact_matches(matches: Iterable[dict], omit: Sequence[str] = DEFAULT_OMIT,
+                    max_replacements: int = MAX_REPLACEMENTS) -> Tuple[List[dict], List[dict]]:
+    """(matches compactos, tabla de reglas). Una pasada; O(1) por match para internar."""
+    omit_set = set(omit)
+    omit_set.add("lt_clientClass")   # duplicado de clientClass
+    table: List[dict] = []
+    index: Dict[Tuple, int] = {}
+    out: List[dict] = []
+    for m in matches:
+        c = {k: v for k, v in m.items() if k not in omit_set and k not in ("rule", "replacements")}
+        rule = m.get("rule")
+        if isinstance(rule, dict):
+            key = _rule_key(rule)
+            ri = index.get(key)
+            if ri is None:
+                ri = index[key] = len(table)
+                table.append(_rule_entry(rule))
+            c["rule"] = ri
+        reps = m.get("replacements") or []
+        if "replacements" not in omit_set:
+            if max_replacements > 0:
+                reps = reps[:max_replacements]
+            c["replacements"] = [r.get("value", "") if isinstance(r, dict) else str(r) for r in reps]
+        out.append(c)
+    return out, table
+
+
+def parse_list(raw) -> Optional[List[str]]:
+    """'a,b' | ['a', 'b'] | None -> lista sin vacíos (None si no se indicó)."""
+    if raw is None:
+        return None
+    items = raw.split(",") if isinstance(raw, str) else list(raw)
+    return [str(x).strip() for x in items if str(x).strip()]
+
+
+def shape_analysis(resp: dict, fields: Optional[Sequence[str]] = None,
+                   omit: Optional[Sequence[str]] = None, compact: bool = False,
+                   max_replacements: Optional[int] = None) -> dict:
+    """
+    fields: claves de primer nivel a conservar ('ok', 'language', 'languageTool',
+            'analysisId' y 'counts' siempre van: sin ellos un análisis guardado no sirve).
+    omit:   claves a quitar de cada match (en modo compacto, por defecto context/sentence).
+    max_replacements: sugerencias por match en modo compacto (None = MAX_REPLACEMENTS, 0 = todas).
+    """
+    if fields is not None:
+        keep = set(fields) | {"ok", "language", "languageTool", "analysisId", "counts"}
+        resp = {k: v for k, v in resp.items() if k in keep}
+    elif compact:
+        resp = {k: v for k, v in resp.items() if k != "text"}   # el cliente ya tiene el texto
+    lt = resp.get("languageTool") or {}
+    matches = lt.get("matches") or []
+    if compact:
+        limit = MAX_REPLACEMENTS if max_replacements is None else max(0, int(max_replacements))
+        cm, rules = compact_matches(matches, DEFAULT_OMIT if omit is None else omit, limit)
+        resp["languageTool"] = {**{k: v for k, v in lt.items() if k != "matches"},
+                                "format": FORMAT, "maxReplacements": limit, "rules": rules, "matches": cm}
+    elif omit:
+        drop = set(omit)
+        resp["languageTool"] = {**lt, "matches": [{k: v for k, v in m.items() if k not in drop} for m in matches]}
+    return resp
@@ -0,0 +1,125 @@
+# backend/compression.py — compresión negociada (br / gzip) de respuestas
+# - Accept-Encoding con q-values; br si el paquete 'brotli' está instalado
+# - Solo respuestas completas (sin more_body) y de tipo texto/JSON por encima
+#   de LIA_COMPRESS_MIN_BYTES; los streams (SSE, NDJSON) pasan tal cual
+# - Cuerpos desde LIA_COMPRESS_THREAD_BYTES se comprimen en el threadpool: un
+#   JSON de varios MB con br/gzip bloquearía el event loop decenas de ms
+# - Bytes antes/después en métricas para medir la reducción real
+from __future__ import annotations
+
+import gzip
+import os
+from typing import Optional
+
+import anyio
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+COMPRESS_MIN_BYTES = int(os.environ.get("LIA_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("LIA_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("LIA_BROTLI_QUALITY", "5"))
+COMPRESS_THREAD_BYTES = int(os.environ.get("LIA_COMPRESS_THREAD_BYTES", str(256 * 1024)))
+_COMPRESSIBLE = (b"application/json", b"text/", b"application/xml")
+
+COMPRESSION_BYTES = metrics.REGISTRY.counter(
+    "lia_compression_bytes_total", "Bytes de respuesta antes (in) y después (out) de comprimir", ("encoding", "kind"))
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """'br' | 'gzip' | None según Accept-Encoding (respeta q=0)."""
+    q = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        q[token] = weight
+    star = q.get("*", 0.0)
+    br = q.get("br", star) if brotli is not None else 0.0
+    gz = q.get("gzip", star)
+    if br > 0 and br >= gz:
+        return "br"
+    if gz > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = b""
+        for k, v in scope.get("headers") or ():
+            if k == b"accept-encoding":
+                accept = v
+                break
+        encoding = negotiate(accept.decode("latin-1")) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+        streaming = False
+
+        async def _send(message):
+            nonlocal start, streaming
+            if message["type"] == "http.response.start":
+                start = message   # se envía con el primer cuerpo
+                return
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+            body = message.get("body") or b""
+            if message.get("more_body", False):
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+            headers = start.get("headers") or []
+            hmap = {k.lower(): v for k, v in headers}
+            ctype = hmap.get(b"content-type", b"")
+            if (len(body) < COMPRESS_MIN_BYTES or b"content-encoding" in hmap
+                    or not ctype.startswith(_COMPRESSIBLE)):
+                await send(start)
+                await send(message)
+                return
+            if len(body) >= COMPRESS_THREAD_BYTES:
+                packed = await anyio.to_thread.run_sync(compress, body, encoding)
+            else:
+                packed = compress(body, encoding)
+            COMPRESSION_BYTES.inc(encoding, "in", amount=len(body))
+            COMPRESSION_BYTES.inc(encoding, "out", amount=len(packed))
+            new_headers = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"vary")]
+            vary = hmap.get(b"vary")
+            new_headers += [(b"content-encoding", encoding.encode()),
+                            (b"content-length", str(len(packed)).encode()),
+                            (b"vary", (vary + b", Accept-Encoding") if vary else b"Accept-Encoding")]
+            await send({**start, "headers": new_headers})
+            await send({"type": "http.response.body", "body": packed})
+
+        await self.app(scope, receive, _send)
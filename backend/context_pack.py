@@ -0,0 +1,111 @@
+# backend/context_pack.py — empaquetado de contexto RAG bajo presupuesto de tokens
+# - Deduplica fragmentos (mismo chunk, casi-duplicados) y fusiona chunks contiguos
+# - Recorta a límites de oración
+# - Llena el presupuesto por score descendente
+from __future__ import annotations
+
+import os
+import re
+from typing import Dict, List, Sequence
+
+RAG_CTX_TOKENS = int(os.environ.get("RAG_CTX_TOKENS", "600"))
+CHARS_PER_TOKEN = 4.0   # aproximación para español/inglés con tokenizadores BPE
+
+_SENT_END = re.compile(r"[.!?…»\"”)](?=\s|$)")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN + 0.999)
+
+
+def trim_to_sentences(text: str, max_chars: int | None = None) -> str:
+    """
+    Quita el trozo de oración inicial/final que dejó el corte fijo del chunk.
+    Si no hay límites de oración utilizables, corta por palabra.
+    """
+    t = text.strip()
+    if max_chars is not None and len(t) > max_chars:
+        t = t[:max_chars]
+    ends = [m.end() for m in _SENT_END.finditer(t)]
+    if not ends:
+        if max_chars is not None and len(text.strip()) > max_chars:
+            cut = t.rfind(" ")
+            return (t[:cut] if cut > 0 else t).rstrip() + "…"
+        return t
+    # inicio: tras el primer fin de oración, salvo que el chunk ya empiece en mayúscula
+    start = 0
+    if t and not (t[0].isupper() or t[0] in "¿¡«\"—–"):
+        first = ends[0]
+        if first < len(t) * 0.5:
+            start = first
+    end = ends[-1]
+    if end <= start:
+        end = len(t)
+    return t[start:end].strip()
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    w = _WORD.findall(text.lower())
+    return {tuple(w[i:i + n]) for i in range(max(0, len(w) - n + 1))}
+
+
+def _near_dup(a: set, b: set, threshold: float = 0.8) -> bool:
+    if not a or not b:
+        return False
+    return len(a & b) / min(len(a), len(b)) >= threshold
+
+
+def pack_context(hits: Sequence[dict], budget_tokens: int = RAG_CTX_TOKENS) -> List[dict]:
+    """
+    hits: [{source, chunk_id, text, score}] (de una o varias consultas).
+    Devuelve extractos [{source, chunk_ids, text, score, tokens}] que caben en el presupuesto.
+    """
+    # 1) mismo chunk: conservar el mejor score
+    best: Dict[tuple, dict] = {}
+    for h in hits:
+        key = (h.get("source"), h.get("chunk_id"))
+        if key not in best or float(h.get("score") or 0) > float(best[key].get("score") or 0):
+            best[key] = h
+
+    # 2) chunks contiguos de la misma fuente -> un solo extracto
+    by_src: Dict[str, List[dict]] = {}
+    for h in best.values():
+        by_src.setdefault(h.get("source"), []).append(h)
+    groups: List[dict] = []
+    for src, hs in by_src.items():
+        hs.sort(key=lambda h: int(h.get("chunk_id") or 0))
+        cur = None
+        for h in hs:
+            cid = int(h.get("chunk_id") or 0)
+            if cur is not None and cid == cur["chunk_ids"][-1] + 1:
+                cur["chunk_ids"].append(cid)
+                cur["text"] += h.get("text") or ""
+                cur["score"] = max(cur["score"], float(h.get("score") or 0))
+                continue
+            cur = {"source": src, "chunk_ids": [cid], "text": h.get("text") or "", "score": float(h.get("score") or 0)}
+            groups.append(cur)
+
+    # 3) por score; descarta casi-duplicados y llena el presupuesto
+    groups.sort(key=lambda g: g["score"], reverse=True)
+    out: List[dict] = []
+    seen: List[set] = []
+    remaining = max(0, int(budget_tokens))
+    for g in groups:
+        if remaining <= 0:
+            break
+        sh = _shingles(g["text"])
+        if any(_near_dup(sh, s) for s in seen):
+            continue
+        text = trim_to_sentences(g["text"])
+        if estimate_tokens(text) > remaining:
+            text = trim_to_sentences(g["text"], max_chars=int(remaining * CHARS_PER_TOKEN))
+        text = text.strip()
+        if not text or estimate_tokens(text) > remaining:
+            continue
+        tokens = estimate_tokens(text)
+        remaining -= tokens
+        seen.append(sh)
+        out.append({"source": g["source"], "chunk_ids": g["chunk_ids"], "text": text,
+                    "score": g["score"], "tokens": tokens})
+    return out
@@ -0,0 +1,172 @@
+# backend/docx_stream.py — escritor DOCX (OOXML) en streaming
+# - Sin python-docx ni archivos temporales: el ZIP se escribe sobre un buffer
+#   que se vacía por bloques, así la respuesta puede enviarse en trozos
+# - Opcional: correcciones como cambios controlados de Word (w:ins / w:del)
+from __future__ import annotations
+
+import re
+import zipfile
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+_DOC_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+)
+_DOC_TAIL = '<w:sectPr/></w:body></w:document>'
+
+# XML 1.0 no admite la mayoría de caracteres de control
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+Edit = Tuple[int, int, str]  # (offset, length, replacement)
+
+
+class _ChunkSink:
+    """Destino no-seekable para zipfile: acumula bytes hasta que se drenan."""
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._pos = 0
+
+    def write(self, b) -> int:
+        self._buf += b
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def pending(self) -> int:
+        return len(self._buf)
+
+    def drain(self) -> bytes:
+        out = bytes(self._buf)
+        self._buf.clear()
+        return out
+
+
+def _t(text: str) -> str:
+    return escape(_XML_INVALID.sub("", text))
+
+
+def _run(text: str, tag: str = "w:t") -> str:
+    return f'<w:r><{tag} xml:space="preserve">{_t(text)}</{tag}></w:r>' if text else ""
+
+
+def _paragraph(text: str, edits: List[Edit], base: int, rev: List[int], author: str, date: str) -> str:
+    """Un párrafo; 'edits' en offsets absolutos, 'base' es el offset del párrafo."""
+    parts = ["<w:p>"]
+    pos = 0
+    attrs = f"w:author={quoteattr(author)} w:date={quoteattr(date)}"
+    for off, ln, repl in edits:
+        local = off - base
+        parts.append(_run(text[pos:local]))
+        old = text[local:local + ln]
+        if old:
+            rev[0] += 1
+            parts.append(f'<w:del w:id="{rev[0]}" {attrs}>{_run(old, "w:delText")}</w:del>')
+        if repl:
+            rev[0] += 1
+            parts.append(f'<w:ins w:id="{rev[0]}" {attrs}>{_run(repl)}</w:ins>')
+        pos = local + ln
+    parts.append(_run(text[pos:]))
+    parts.append("</w:p>")
+    return "".join(parts)
+
+
+def edits_from_matches(text: str, matches: Iterable[dict]) -> List[Edit]:
+    """Primer reemplazo de cada match, ordenado y sin solapes ni saltos de párrafo.
+    Un match de longitud 0 con reemplazo es una inserción pura (solo w:ins)."""
+    cands = []
+    for m in matches or []:
+        reps = m.get("replacements") or []
+        if not reps:
+            continue
+        off = int(m.get("offset") or 0)
+        ln = int(m.get("length") or 0)
+        span = text[off:off + ln]
+        if off < 0 or ln < 0 or off + ln > len(text) or "".join(span.splitlines()) != span:
+            continue
+        first = reps[0]
+        repl = str((first.get("value") if isinstance(first, dict) and "value" in first else first) or "")
+        if not ln and not repl:
+            continue
+        cands.append((off, ln, repl))
+    cands.sort(key=lambda e: (e[0], -e[1]))
+    out: List[Edit] = []
+    last_end = -1
+    for off, ln, repl in cands:
+        if off < last_end:
+            continue
+        out.append((off, ln, repl))
+        last_end = off + ln
+    return out
+
+
+def iter_docx(
+    text: str,
+    edits: Optional[List[Edit]] = None,
+    author: str = "LIA-Staylo",
+    chunk_size: int = 64 * 1024,
+) -> Iterator[bytes]:
+    """
+    Genera el .docx por bloques. Una línea de 'text' = un párrafo (\n, \r\n o \r;
+    los offsets de 'edits' cuentan los saltos tal como vienen).
+    Si hay 'edits' se escriben como cambios controlados sobre el texto original.
+    """
+    sink = _ChunkSink()
+    date = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    rev = [0]
+    pending = list(edits or [])
+    ei = 0
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        with zf.open("word/document.xml", mode="w") as fh:
+            fh.write(_DOC_HEAD.encode("utf-8"))
+            base = 0
+            for raw in text.splitlines(keepends=True) or [""]:
+                line = raw.splitlines()[0] if raw else ""
+                end = base + len(line)
+                para_edits: List[Edit] = []
+                while ei < len(pending) and (pending[ei][0] <= end or pending[ei][0] < base + len(raw)):
+                    if pending[ei][0] >= base and pending[ei][0] + pending[ei][1] <= end:
+                        para_edits.append(pending[ei])
+                    ei += 1
+                fh.write(_paragraph(line, para_edits, base, rev, author, date).encode("utf-8"))
+                base += len(raw)
+                if sink.pending() >= chunk_size:
+                    yield sink.drain()
+            fh.write(_DOC_TAIL.encode("utf-8"))
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+def build_docx(text: str, edits: Optional[List[Edit]] = None, author: str = "LIA-Staylo") -> bytes:
+    return b"".join(iter_docx(text, edits, author))
@@ -0,0 +1,99 @@
+# backend/encoders.py — codificador de consultas para RAG
+# - Backends (EMB_BACKEND): torch | torch-int8 | onnx | onnx-int8
+#   torch-int8 = cuantización dinámica de las capas Linear (CPU)
+#   onnx*      = backend ONNX Runtime de sentence-transformers (>= 3.2, optimum[onnxruntime])
+# - Caché LRU de embeddings de consulta, clave = texto normalizado
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+logger = logging.getLogger("lia-backend")
+
+EMB_BACKEND = os.environ.get("EMB_BACKEND", "torch").lower()
+EMB_ONNX_FILE = os.environ.get("EMB_ONNX_FILE", "onnx/model_qint8_avx2.onnx")
+EMB_QUERY_CACHE = int(os.environ.get("EMB_QUERY_CACHE", "2048"))
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """NFC + espacios colapsados. No se pasa a minúsculas: el modelo distingue mayúsculas."""
+    return _WS.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def load_model(name: str, backend: str = EMB_BACKEND):
+    """(modelo, backend efectivo); si el backend pedido no está disponible, cae a torch."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        logger.warning("EMB_BACKEND=%s desconocido; uso torch", backend)
+        backend = "torch"
+    try:
+        if backend == "onnx":
+            return SentenceTransformer(name, device="cpu", backend="onnx"), backend
+        if backend == "onnx-int8":
+            return SentenceTransformer(name, device="cpu", backend="onnx",
+                                       model_kwargs={"file_name": EMB_ONNX_FILE}), backend
+        if backend == "torch-int8":
+            import torch
+            model = SentenceTransformer(name, device="cpu")
+            return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8), backend
+    except Exception as e:
+        logger.warning("Backend de embeddings %s no disponible (%s); uso torch", backend, e)
+    return SentenceTransformer(name), "torch"
+
+
+class CachedEncoder:
+    """Envuelve un modelo: codifica en lote solo las consultas que no están en caché."""
+
+    def __init__(self, model, max_items: int = EMB_QUERY_CACHE, backend: str = EMB_BACKEND):
+        self.model = model
+        self.backend = backend
+        self.max_items = max_items
+        self._cache: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encode_queries(self, queries: Sequence[str]):
+        """Matriz (n, dim) float32 normalizada, en el orden de 'queries'."""
+        import numpy as np
+
+        keys = [normalize_query(q) for q in queries]
+        vecs: List[Optional[object]] = [None] * len(keys)
+        todo: "OrderedDict[str, List[int]]" = OrderedDict()
+        with self._lock:
+            for i, k in enumerate(keys):
+                v = self._cache.get(k)
+                if v is not None:
+                    self._cache.move_to_end(k)
+                    vecs[i] = v
+                    self.hits += 1
+                else:
+                    todo.setdefault(k, []).append(i)
+                    self.misses += 1
+        if todo:
+            X = self.model.encode(list(todo), convert_to_numpy=True, normalize_embeddings=True)
+            with self._lock:
+                for (k, idxs), v in zip(todo.items(), X):
+                    v = v.astype(np.float32)
+                    for i in idxs:
+                        vecs[i] = v
+                    if self.max_items > 0:
+                        self._cache[k] = v
+                        self._cache.move_to_end(k)
+                while len(self._cache) > self.max_items:
+                    self._cache.popitem(last=False)
+        return np.stack(vecs).astype(np.float32, copy=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"backend": self.backend, "size": len(self._cache), "hits": self.hits, "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0}
@@ -0,0 +1,61 @@
+# backend/fastjson.py — serialización JSON rápida para endpoints calientes
+# - orjson si está instalado, si no msgspec, si no json de la stdlib (compacto)
+# - FastJSONResponse: devolverla desde el endpoint evita el recorrido genérico
+#   de jsonable_encoder; el contenido debe ser ya JSON nativo (dict/list/str/...)
+# - fast_json renderiza en el acto, dentro de la etapa "serialize" (métricas y
+#   perfil): si no, ese tiempo se contaría como parte del endpoint
+# - loads: para las respuestas grandes de LanguageTool
+from __future__ import annotations
+
+import json
+from typing import Any, Callable
+
+from fastapi.responses import Response
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+def _pick() -> tuple[str, Callable[[Any], bytes]]:
+    try:
+        import orjson
+        opts = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        return "orjson", lambda obj: orjson.dumps(obj, option=opts)
+    except ImportError:
+        pass
+    try:
+        import msgspec
+        enc = msgspec.json.Encoder()
+        return "msgspec", enc.encode
+    except ImportError:
+        pass
+    return "json", _stdlib_dumps
+
+
+ENCODER, dumps = _pick()
+
+try:
+    from orjson import loads
+except ImportError:
+    try:
+        from msgspec.json import decode as loads
+    except ImportError:
+        loads = json.loads
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_json(content: Any, status_code: int = 200) -> FastJSONResponse:
+    with metrics.stage("serialize"):
+        return FastJSONResponse(content, status_code=status_code)
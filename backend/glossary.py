@@ -0,0 +1,221 @@
+# backend/glossary.py — motor de glosario (rules/glossary_es_en.yaml)
+# - Todos los términos (también multipalabra: "teléfono móvil") en un solo
+#   autómata Aho-Corasick sin distinguir mayúsculas: una pasada por el texto
+# - Selección leftmost-longest sin solapes; word_boundary como \b de regex
+#   (solo se exige en los bordes del término que son letra/dígito)
+# - case_preserve: ORDENADOR -> COMPUTER, Ordenador -> Computer
+# - Streaming: el estado del autómata cruza los trozos; un candidato se decide
+#   en cuanto ya no puede aparecer otro más largo que empiece antes
+# Transiciones en un único dict {nodo * BASE + ord(c): nodo} y arrays de enteros
+# para fail/salidas: ~50k términos caben en decenas de MB.
+from __future__ import annotations
+
+import heapq
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import yaml
+
+_BASE = 0x110000   # > cualquier code point
+RULE_ID = "CUSTOM_GLOSSARY_ES_EN"
+
+
+def _fold(c: str) -> str:
+    low = c.lower()
+    return low if len(low) == 1 else c   # mantiene 1 carácter = 1 posición
+
+
+def _is_word(c: Optional[str]) -> bool:
+    return c is not None and (c.isalnum() or c == "_")
+
+
+def match_case(source: str, target: str) -> str:
+    letters = [c for c in source if c.isalpha()]
+    if len(letters) > 1 and all(c.isupper() for c in letters):
+        return target.upper()
+    if letters and letters[0].isupper():
+        for i, c in enumerate(target):   # primera letra (saltando '¡', '¿'...)
+            if c.isalpha():
+                return target[:i] + c.upper() + target[i + 1:]
+    return target
+
+
+class Glossary:
+    def __init__(self, pairs: Dict[str, str], case_preserve: bool = True, word_boundary: bool = True):
+        self.case_preserve = case_preserve
+        self.word_boundary = word_boundary
+        self.sources: List[str] = []
+        self.targets: List[str] = []
+        self._goto: Dict[int, int] = {}
+        fail = [0]
+        out = [-1]      # término que termina en el nodo
+        depth = [0]
+        for src, dst in pairs.items():
+            src, dst = str(src), str(dst)
+            if not src:
+                continue
+            node = 0
+            for c in src:
+                k = node * _BASE + ord(_fold(c))
+                nxt = self._goto.get(k)
+                if nxt is None:
+                    nxt = self._goto[k] = len(fail)
+                    fail.append(0); out.append(-1); depth.append(depth[node] + 1)
+                node = nxt
+            if out[node] == -1:   # la primera definición gana
+                out[node] = len(self.sources)
+                self.sources.append(src)
+                self.targets.append(dst)
+        # fail y enlace de salida (el sufijo propio más largo que es término), por BFS
+        children: Dict[int, List[Tuple[int, int]]] = {}
+        for k, child in self._goto.items():
+            children.setdefault(k // _BASE, []).append((k % _BASE, child))
+        olink = [0] * len(fail)
+        queue = deque(child for _, child in children.get(0, []))
+        while queue:
+            node = queue.popleft()
+            for code, child in children.get(node, []):
+                f = fail[node]
+                while f and f * _BASE + code not in self._goto:
+                    f = fail[f]
+                target = self._goto.get(f * _BASE + code, 0)
+                fail[child] = target if target != child else 0
+                olink[child] = fail[child] if out[fail[child]] != -1 else olink[fail[child]]
+                queue.append(child)
+        self._fail = array("i", fail)
+        self._out = array("i", out)
+        self._olink = array("i", olink)
+        self._depth = array("i", depth)
+        self.max_len = max(depth) if depth else 0
+
+    @classmethod
+    def from_yaml(cls, path: Path) -> "Glossary":
+        raw = yaml.safe_load(Path(path).read_text(encoding="utf-8")) or {}
+        opts = raw.get("options") or {}
+        return cls(raw.get("pairs") or {}, bool(opts.get("case_preserve", True)), bool(opts.get("word_boundary", True)))
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    # ---- búsqueda ----
+    def _scan(self, chunks: Iterable[str]) -> Iterator[tuple]:
+        """("hit", inicio, fin, término, texto) en orden y, tras cada trozo, ("safe", pos):
+        ningún hit futuro empieza antes de pos."""
+        goto, fail, out, olink, depth = self._goto, self._fail, self._out, self._olink, self._depth
+        max_len = self.max_len
+        node = 0
+        pos = 0                       # caracteres consumidos
+        tail = ""                     # lo último leído: contexto para bordes y texto del hit
+        tail_start = 0
+        pending: List[Tuple[int, int, int]] = []   # (inicio, -longitud, término)
+        last_end = 0
+
+        def decide(limit: Optional[int]):
+            nonlocal last_end
+            # un candidato que empieza en s es definitivo cuando ya se leyó s + max_len
+            while pending and (limit is None or pending[0][0] + max_len < limit):
+                start, neg_len, idx = heapq.heappop(pending)
+                end = start - neg_len
+                if start < last_end:
+                    continue
+                if self.word_boundary:
+                    src = self.sources[idx]
+                    before = tail[start - tail_start - 1] if start > tail_start else None
+                    after = tail[end - tail_start] if end - tail_start < len(tail) else None
+                    if (_is_word(src[0]) and _is_word(before)) or (_is_word(src[-1]) and _is_word(after)):
+                        continue
+                last_end = end
+                yield "hit", start, end, idx, tail[start - tail_start:end - tail_start]
+
+        for chunk in chunks:
+            if not chunk:
+                continue
+            tail += chunk
+            for c in chunk:
+                code = ord(_fold(c))
+                while node and node * _BASE + code not in goto:
+                    node = fail[node]
+                node = goto.get(node * _BASE + code, 0)
+                pos += 1
+                t = node if out[node] != -1 else olink[node]
+                while t:
+                    heapq.heappush(pending, (pos - depth[t], -depth[t], out[t]))
+                    t = olink[t]
+            yield from decide(pos)
+            yield "safe", max(last_end, pos - max_len)
+            keep = max_len + 2        # contexto para los candidatos aún abiertos
+            if pending:
+                keep = max(keep, pos - pending[0][0] + 2)
+            if len(tail) > 2 * keep:
+                drop = len(tail) - keep
+                tail = tail[drop:]
+                tail_start += drop
+        yield from decide(None)
+
+    def iter_hits(self, chunks: Iterable[str]) -> Iterator[Tuple[int, int, int, str]]:
+        """(inicio, fin, índice del término, texto original) en orden, sin solapes."""
+        for ev in self._scan(chunks):
+            if ev[0] == "hit":
+                yield ev[1:]
+
+    def _target(self, found: str, idx: int) -> str:
+        return match_case(found, self.targets[idx]) if self.case_preserve else self.targets[idx]
+
+    def matches(self, text: str) -> List[dict]:
+        """Hits como matches de LanguageTool (regla CUSTOM_GLOSSARY_ES_EN)."""
+        out = []
+        for start, end, idx, found in self.iter_hits([text]):
+            target = self._target(found, idx)
+            out.append({
+                "message": f"Glosario: «{found}» → «{target}».",
+                "shortMessage": "Glosario",
+                "offset": start,
+                "length": end - start,
+                "replacements": [{"value": target}],
+                "rule": {"id": RULE_ID, "description": "Término del glosario",
+                         "issueType": "style", "category": {"id": "TERMINOLOGY", "name": "Glosario"}},
+                "clientClass": "style",
+                "lt_clientClass": "style",
+            })
+        return out
+
+    # ---- sustitución ----
+    def apply_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Texto sustituido por trozos; en memoria solo lo que aún puede formar parte de un hit."""
+        buf = ""          # texto leído y aún no emitido (empieza en buf_start)
+        buf_start = 0
+
+        def reading():
+            nonlocal buf
+            for chunk in chunks:
+                buf += chunk
+                yield chunk
+
+        for ev in self._scan(reading()):
+            if ev[0] == "hit":
+                _, start, end, idx, found = ev
+                yield buf[:start - buf_start] + self._target(found, idx)
+                buf = buf[end - buf_start:]
+                buf_start = end
+            elif ev[1] > buf_start:
+                cut = ev[1] - buf_start
+                if buf[:cut]:
+                    yield buf[:cut]
+                buf = buf[cut:]
+                buf_start = ev[1]
+        if buf:
+            yield buf
+
+    def apply(self, text: str) -> Tuple[str, int]:
+        parts = []
+        last = 0
+        n = 0
+        for start, end, idx, found in self.iter_hits([text]):
+            parts.append(text[last:start])
+            parts.append(self._target(found, idx))
+            last = end
+            n += 1
+        parts.append(text[last:])
+        return "".join(parts), n
@@ -0,0 +1,233 @@
+# backend/index_registry.py — índices FAISS por idioma, cargados bajo demanda
+# - faiss{sfx}.index + bm25{sfx}.bin + meta{sfx}.json + chunks{sfx}.bin/.idx (tools/build_index.py)
+# - La parte densa (FAISS) y la léxica (BM25) se cargan por separado: el modo
+#   BM25 no necesita FAISS ni el modelo de embeddings
+# - Se abren memory-mapped cuando FAISS lo permite (si no, lectura normal)
+# - Presupuesto de memoria: expulsa los índices menos usados / ociosos
+# - Un registro reemplazado (/refresh_corpus) se cierra cuando lo suelta la
+#   última consulta (acquire/release/retire, como SpellIndex): así sus mmap no
+#   impiden borrar el build viejo en Windows
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:  # paquete (backend.x) o script suelto
+    from .bm25 import BM25Index
+    from .chunk_store import ChunkStore
+except ImportError:
+    from bm25 import BM25Index
+    from chunk_store import ChunkStore
+
+# idioma de UI -> sufijo de archivos; "" es el índice general (data/corpus_txt)
+LANG_SUFFIX = {"es-MX": "_es_mx", "es-419": "_es_419", "en-US": "_en_us"}
+
+INDEX_MEM_BUDGET_MB = float(os.environ.get("INDEX_MEM_BUDGET_MB", "1024"))
+INDEX_IDLE_TTL_S = float(os.environ.get("INDEX_IDLE_TTL_S", "1800"))
+INDEX_NPROBE = int(os.environ.get("INDEX_NPROBE", "16"))
+
+
+# data/ds/CURRENT apunta al build activo (data/ds/builds/<id>); sin él, data/ds mismo
+CURRENT_FILE = "CURRENT"
+
+
+def active_dir(ds_root: Path) -> Path:
+    ds_root = Path(ds_root)
+    try:
+        name = (ds_root / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        return ds_root
+    cand = ds_root / name
+    return cand if name and cand.is_dir() else ds_root
+
+
+def set_active(ds_root: Path, build_dir: Path) -> None:
+    """Cambia el puntero CURRENT de forma atómica (tmp + os.replace)."""
+    ds_root = Path(ds_root)
+    rel = os.path.relpath(build_dir, ds_root).replace(os.sep, "/")
+    tmp = ds_root / (CURRENT_FILE + ".tmp")
+    tmp.write_text(rel, encoding="utf-8")
+    os.replace(tmp, ds_root / CURRENT_FILE)
+
+
+def normalize_lang(lang: Optional[str]) -> str:
+    s = (lang or "").strip().lower()
+    if s.startswith("en"):
+        return "en-US"
+    if s.startswith("es-419"):
+        return "es-419"
+    return "es-MX"
+
+
+@dataclass
+class LoadedIndex:
+    suffix: str
+    meta: List[dict]
+    chunks: Optional[ChunkStore]
+    index: object = None             # FAISS (modo denso)
+    bm25: Optional[BM25Index] = None  # modo léxico
+    size_bytes: int = 0
+    mmapped: bool = False
+    last_used: float = field(default_factory=time.monotonic)
+
+    def close(self) -> None:
+        """Cierra almacén y BM25; FAISS libera su mmap al soltar el objeto."""
+        if self.chunks is not None:
+            self.chunks.close()
+            self.chunks = None
+        if self.bm25 is not None:
+            self.bm25.close()
+            self.bm25 = None
+        self.index = None
+
+
+def _read_index(path: Path):
+    """Intenta abrir en modo mmap/solo lectura; si el tipo no lo soporta, lectura normal."""
+    import faiss
+    flags = getattr(faiss, "IO_FLAG_MMAP", 0) | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+    if flags:
+        try:
+            return faiss.read_index(str(path), flags), True
+        except Exception:
+            pass
+    return faiss.read_index(str(path)), False
+
+
+class IndexRegistry:
+    def __init__(self, ds_dir: Path, budget_mb: float = INDEX_MEM_BUDGET_MB, idle_ttl_s: float = INDEX_IDLE_TTL_S):
+        self.ds_dir = Path(ds_dir)
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.idle_ttl_s = idle_ttl_s
+        self._loaded: "OrderedDict[str, LoadedIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._users = 0
+        self._retired = False
+        self.closed = False
+
+    # ---- rutas ----
+    def _paths(self, sfx: str) -> tuple[Path, Path, Path]:
+        return self.ds_dir / f"faiss{sfx}.index", self.ds_dir / f"meta{sfx}.json", self.ds_dir / f"chunks{sfx}"
+
+    def _bm25_path(self, sfx: str) -> Path:
+        return self.ds_dir / f"bm25{sfx}.bin"
+
+    def _available(self, sfx: str, dense: bool, lexical: bool) -> bool:
+        ip, mp, _ = self._paths(sfx)
+        if not mp.exists():
+            return False
+        return (not dense or ip.exists()) and (not lexical or self._bm25_path(sfx).exists())
+
+    def resolve_suffix(self, lang: Optional[str], dense: bool = True, lexical: bool = False) -> Optional[str]:
+        """Índice del idioma si existe; si no, el general."""
+        sfx = LANG_SUFFIX[normalize_lang(lang)]
+        for cand in (sfx, ""):
+            if self._available(cand, dense, lexical):
+                return cand
+        return None
+
+    # ---- carga / expulsión ----
+    def _load(self, sfx: str) -> LoadedIndex:
+        _, mp, cp = self._paths(sfx)
+        meta = json.loads(mp.read_text(encoding="utf-8"))
+        chunks = ChunkStore.open(cp)
+        if chunks is not None and len(chunks) != len(meta):
+            chunks = None
+        return LoadedIndex(sfx, meta, chunks)
+
+    def _attach(self, li: LoadedIndex, dense: bool, lexical: bool) -> None:
+        ip, _, _ = self._paths(li.suffix)
+        if dense and li.index is None:
+            index, li.mmapped = _read_index(ip)
+            if hasattr(index, "nprobe"):
+                index.nprobe = INDEX_NPROBE
+            li.index = index
+            li.size_bytes += ip.stat().st_size
+        if lexical and li.bm25 is None:
+            bp = self._bm25_path(li.suffix)
+            li.bm25 = BM25Index.open(bp)
+            if li.bm25 is not None:
+                li.size_bytes += bp.stat().st_size
+
+    # Expulsar = soltar referencias; una consulta en curso que aún tenga el
+    # LoadedIndex sigue funcionando y los mmap se cierran al liberarse.
+    def _evict(self, keep: str) -> None:
+        now = time.monotonic()
+        for sfx in list(self._loaded):
+            if sfx != keep and now - self._loaded[sfx].last_used > self.idle_ttl_s:
+                del self._loaded[sfx]
+        total = sum(li.size_bytes for li in self._loaded.values())
+        for sfx in list(self._loaded):  # OrderedDict: primero el menos reciente
+            if total <= self.budget:
+                break
+            if sfx == keep:
+                continue
+            total -= self._loaded.pop(sfx).size_bytes
+
+    def get(self, lang: Optional[str], dense: bool = True, lexical: bool = False) -> Optional[LoadedIndex]:
+        sfx = self.resolve_suffix(lang, dense, lexical)
+        if sfx is None:
+            return None
+        with self._lock:
+            li = self._loaded.get(sfx)
+            if li is None:
+                li = self._load(sfx)
+                self._loaded[sfx] = li
+            self._attach(li, dense, lexical)
+            self._loaded.move_to_end(sfx)
+            li.last_used = time.monotonic()
+            self._evict(keep=sfx)
+            return li
+
+    def clear(self) -> None:
+        with self._lock:
+            self._loaded.clear()
+
+    # ---- ciclo de vida con varios hilos ----
+    def acquire(self) -> bool:
+        """Reserva el registro para una consulta; False si ya se retiró (pide el vigente)."""
+        with self._lock:
+            if self._retired:
+                return False
+            self._users += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._users -= 1
+            last = self._retired and not self._users
+        if last:
+            self.close()
+
+    def retire(self) -> None:
+        """Hay un build nuevo: se cierra ya o al soltarlo la última consulta."""
+        with self._lock:
+            self._retired = True
+            idle = not self._users
+        if idle:
+            self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            loaded = list(self._loaded.values())
+            self._loaded.clear()
+        for li in loaded:
+            li.close()
+
+    def status(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                (sfx or "default"): {
+                    "chunks": len(li.meta), "bytes": li.size_bytes, "mmapped": li.mmapped,
+                    "dense": li.index is not None, "bm25": li.bm25 is not None,
+                }
+                for sfx, li in self._loaded.items()
+            }
@@ -0,0 +1,240 @@
+# backend/llm.py — capa de backends LLM (OpenAI-compatible / Ollama)
+# - Detecta una vez qué protocolo habla cada endpoint y lo recuerda
+#   (se vuelve a sondear tras un fallo)
+# - Un solo httpx.AsyncClient con pool de conexiones
+# - Varios endpoints: se elige el menos ocupado entre los sanos; solo los
+#   errores de conexión y los 5xx lo dan por caído (un 4xx es de la petición)
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+logger = logging.getLogger("lia-backend")
+
+OPENAI = "openai"
+OLLAMA = "ollama"
+
+# ruta de chat y ruta barata de sondeo por protocolo
+_CHAT_PATH = {OPENAI: "/v1/chat/completions", OLLAMA: "/api/chat"}
+_PROBE_PATH = {OPENAI: "/v1/models", OLLAMA: "/api/tags"}
+
+LLM_TIMEOUT_S = float(os.environ.get("LLM_TIMEOUT_S", "120"))
+LLM_PROBE_TIMEOUT_S = float(os.environ.get("LLM_PROBE_TIMEOUT_S", "3"))
+LLM_RETRY_AFTER_S = float(os.environ.get("LLM_RETRY_AFTER_S", "15"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "32"))
+
+
+def _split(url: str) -> Tuple[str, Optional[str]]:
+    """'http://h:p/v1/chat/completions' -> ('http://h:p', 'openai'); sin ruta -> (base, None)."""
+    u = urlsplit(url.strip())
+    base = f"{u.scheme or 'http'}://{u.netloc}"
+    path = (u.path or "").rstrip("/")
+    if path.endswith("/api/chat") or path.endswith("/api/generate"):
+        return base, OLLAMA
+    if path.endswith("/chat/completions") or path.endswith("/v1"):
+        return base, OPENAI
+    return base, None
+
+
+def _endpoint_fault(e: Exception) -> bool:
+    """¿El fallo es del endpoint (conexión, timeout, 5xx) y no de la petición (4xx)?"""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
+
+
+class LLMEndpoint:
+    def __init__(self, base: str, hints: List[str]):
+        self.base = base
+        self.hints = hints or [OPENAI, OLLAMA]
+        self.protocol: Optional[str] = None
+        self.in_flight = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self._probe_lock = asyncio.Lock()
+
+    @property
+    def chat_url(self) -> str:
+        return self.base + _CHAT_PATH[self.protocol or OPENAI]
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def mark_failed(self) -> None:
+        self.failures += 1
+        self.protocol = None  # obliga a re-sondear
+        self.down_until = time.monotonic() + LLM_RETRY_AFTER_S
+
+    def mark_ok(self) -> None:
+        self.failures = 0
+        self.down_until = 0.0
+
+    def status(self) -> dict:
+        return {"base": self.base, "protocol": self.protocol, "in_flight": self.in_flight,
+                "failures": self.failures, "healthy": self.healthy(time.monotonic())}
+
+
+class LLMBackend:
+    def __init__(self, urls: List[str], model: str):
+        self.model = model
+        grouped: Dict[str, List[str]] = {}
+        for url in urls:
+            if not url or not url.strip():
+                continue
+            base, hint = _split(url)
+            hints = grouped.setdefault(base, [])
+            if hint and hint not in hints:
+                hints.append(hint)
+        self.endpoints = [LLMEndpoint(b, h) for b, h in grouped.items()]
+        self._client: Optional[httpx.AsyncClient] = None
+
+    # ---- cliente compartido ----
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(LLM_TIMEOUT_S, connect=LLM_PROBE_TIMEOUT_S),
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ---- detección de protocolo ----
+    async def _probe(self, ep: LLMEndpoint) -> bool:
+        async with ep._probe_lock:
+            if ep.protocol is not None:
+                return True
+            order = ep.hints + [p for p in (OPENAI, OLLAMA) if p not in ep.hints]
+            for proto in order:
+                try:
+                    r = await self.client().get(ep.base + _PROBE_PATH[proto], timeout=LLM_PROBE_TIMEOUT_S)
+                    if r.status_code == 200:
+                        ep.protocol = proto
+                        logger.info("LLM %s habla %s", ep.base, proto)
+                        return True
+                except Exception:
+                    continue
+            ep.mark_failed()
+            return False
+
+    def _candidates(self) -> List[LLMEndpoint]:
+        """Sanos primero, ordenados por carga; los caídos al final como último recurso."""
+        now = time.monotonic()
+        up = sorted((e for e in self.endpoints if e.healthy(now)), key=lambda e: (e.in_flight, e.failures))
+        down = sorted((e for e in self.endpoints if not e.healthy(now)), key=lambda e: e.down_until)
+        return up + down
+
+    # ---- payloads ----
+    def payload(self, protocol: str, messages: List[dict], temperature: float, max_tokens: int, stream: bool = False) -> dict:
+        if protocol == OLLAMA:
+            return {"model": self.model, "messages": messages, "stream": stream,
+                    "options": {"temperature": temperature, "num_predict": max_tokens}}
+        return {"model": self.model, "messages": messages, "temperature": temperature,
+                "max_tokens": max_tokens, "stream": stream}
+
+    @staticmethod
+    def parse(protocol: str, j: dict) -> str:
+        if protocol == OLLAMA:
+            return ((j.get("message") or {}).get("content") or "").strip()
+        choice = (j.get("choices") or [{}])[0]
+        return (choice.get("message", {}).get("content") or choice.get("text") or "").strip()
+
+    async def chat(self, messages: List[dict], temperature: float = 0.4, max_tokens: int = 220) -> Tuple[bool, str, Optional[str]]:
+        last_err = "Sin endpoints LLM configurados"
+        for ep in self._candidates():
+            if ep.protocol is None and not await self._probe(ep):
+                last_err = f"{ep.base}: no responde como OpenAI ni Ollama"
+                continue
+            proto = ep.protocol
+            ep.in_flight += 1
+            try:
+                r = await self.client().post(ep.chat_url, json=self.payload(proto, messages, temperature, max_tokens))
+                r.raise_for_status()
+                ep.mark_ok()
+                return True, self.parse(proto, r.json()), None
+            except Exception as e:
+                last_err = f"{ep.base}: {e}"
+                metrics.upstream_error("llm", e)
+                if _endpoint_fault(e):
+                    ep.mark_failed()
+            finally:
+                ep.in_flight -= 1
+        return False, "", last_err
+
+    @staticmethod
+    def parse_stream_line(protocol: str, line: str) -> Tuple[str, bool]:
+        """(texto del delta, terminado) para una línea SSE (OpenAI) o NDJSON (Ollama)."""
+        line = line.strip()
+        if not line:
+            return "", False
+        if protocol == OLLAMA:
+            j = json.loads(line)
+            return (j.get("message") or {}).get("content") or "", bool(j.get("done"))
+        if not line.startswith("data:"):
+            return "", False
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return "", True
+        j = json.loads(data)
+        choice = (j.get("choices") or [{}])[0]
+        delta = (choice.get("delta") or {}).get("content") or choice.get("text") or ""
+        return delta, choice.get("finish_reason") is not None
+
+    async def stream_chat(self, messages: List[dict], temperature: float = 0.4,
+                          max_tokens: int = 220) -> AsyncIterator[str]:
+        """
+        Genera los tokens según llegan. Si el consumidor deja de iterar (cliente
+        desconectado) la respuesta upstream se cierra y el servidor LLM cancela
+        la generación. Cambia de endpoint solo si falla antes del primer token.
+        """
+        last_err = "Sin endpoints LLM configurados"
+        for ep in self._candidates():
+            if ep.protocol is None and not await self._probe(ep):
+                last_err = f"{ep.base}: no responde como OpenAI ni Ollama"
+                continue
+            proto = ep.protocol
+            started = False
+            ep.in_flight += 1
+            try:
+                payload = self.payload(proto, messages, temperature, max_tokens, stream=True)
+                async with self.client().stream("POST", ep.chat_url, json=payload) as r:
+                    r.raise_for_status()
+                    async for line in r.aiter_lines():
+                        delta, done = self.parse_stream_line(proto, line)
+                        if delta:
+                            started = True
+                            yield delta
+                        if done:
+                            break
+                ep.mark_ok()
+                return
+            except (asyncio.CancelledError, GeneratorExit):
+                raise
+            except Exception as e:
+                last_err = f"{ep.base}: {e}"
+                metrics.upstream_error("llm", e)
+                if _endpoint_fault(e):
+                    ep.mark_failed()
+                if started:
+                    raise RuntimeError(last_err) from e
+            finally:
+                ep.in_flight -= 1
+        raise RuntimeError(last_err)
+
+    def status(self) -> List[dict]:
+        return [e.status() for e in self.endpoints]
@@ -1,23 +1,39 @@
 # backend/main.py
 from __future__ import annotations
 
+import codecs
 import io
 import json
 import logging
 import os
 import re
+import shutil
 import tempfile
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import requests
 import yaml
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile, Request, APIRouter
+from fastapi import FastAPI, File, Form, HTTPException, Query, UploadFile, Request, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
+try:  # paquete (backend.main) o script suelto (main)
+    from . import admission, compact, compression, docx_stream, match_merge, match_store, metrics, normalizer, profiling
+    from .glossary import Glossary
+    from .spell import SpellIndex, pointer_path, read_pointer
+    from .fastjson import FastJSONResponse, fast_json, loads as json_loads
+    from .shared_state import MtimeCache, atomic_write_text, bump_generation, file_lock, file_stamp
+except ImportError:
+    import admission, compact, compression, docx_stream, match_merge, match_store, metrics, normalizer, profiling
+    from glossary import Glossary
+    from spell import SpellIndex, pointer_path, read_pointer
+    from fastjson import FastJSONResponse, fast_json, loads as json_loads
+    from shared_state import MtimeCache, atomic_write_text, bump_generation, file_lock, file_stamp
+
 # =========================
 # Config & Paths
 # =========================
@@ -25,9 +41,15 @@ RULES_DIR = Path(os.environ.get("LIA_RULES_DIR", Path(__file__).parent / "rules"
 print("RULES_DIR =", RULES_DIR.resolve())
 
 BASE_DIR = Path(__file__).resolve().parent
-STORAGE_DIR = BASE_DIR / "storage"
+STORAGE_DIR = Path(os.environ.get("LIA_STORAGE_DIR", str(BASE_DIR / "storage")))
 STORAGE_DIR.mkdir(parents=True, exist_ok=True)
 DICT_PATH = STORAGE_DIR / "dictionaries.json"
+ANALYSES = match_store.AnalysisStore(STORAGE_DIR / "analyses")   # /analysis/{id}/...
+# Glosario ES->EN: se recompila si el YAML cambia (en cualquier worker)
+GLOSSARY_PATH = Path(os.environ.get("LIA_GLOSSARY_PATH", str(RULES_DIR / "glossary_es_en.yaml")))
+# Índice ortográfico local (tools/build_spell.py); sin él no hay ortografía offline.
+# Versionado: se abre el archivo que nombra '<SPELL_PATH>.current'
+SPELL_PATH = Path(os.environ.get("LIA_SPELL_PATH", str(BASE_DIR.parent / "data" / "spell" / "es.spell")))
 
 # LT por defecto en 8010
 LT_BASE = (os.environ.get("LT_URL", "http://127.0.0.1:8010") or "").strip().rstrip("/")
@@ -88,20 +110,29 @@ def to_lt_language(lang_ui: str) -> str:
 # =========================
 # Diccionario persistente
 # =========================
-def _ensure_dict_file() -> Dict[str, List[str]]:
-    if not DICT_PATH.exists():
-        data = {k: [] for k in SUPPORTED_UI_LANGS}
-        DICT_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-        return data
+# Con varios workers: escrituras bajo candado entre procesos + reemplazo atómico;
+# cada worker relee el JSON solo cuando cambia su mtime.
+def _read_dict_file(path: Path) -> Dict[str, List[str]]:
     try:
-        return json.loads(DICT_PATH.read_text(encoding="utf-8"))
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            return data
     except Exception:
-        data = {k: [] for k in SUPPORTED_UI_LANGS}
-        DICT_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-        return data
+        pass
+    return {k: [] for k in SUPPORTED_UI_LANGS}
+
+_DICT_CACHE = MtimeCache(DICT_PATH, _read_dict_file)
+
+def _ensure_dict_file() -> Dict[str, List[str]]:
+    if not DICT_PATH.exists():
+        with file_lock(DICT_PATH):
+            if not DICT_PATH.exists():
+                _save_dict_file({k: [] for k in SUPPORTED_UI_LANGS})
+    return _DICT_CACHE.get()
 
 def _save_dict_file(data: Dict[str, List[str]]) -> None:
-    DICT_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    atomic_write_text(DICT_PATH, json.dumps(data, ensure_ascii=False, indent=2))
+    _DICT_CACHE.invalidate()
 
 def dict_list(lang_ui: str) -> List[str]:
     data = _ensure_dict_file()
@@ -113,20 +144,22 @@ def dict_add(lang_ui: str, token: str) -> None:
         raise ValueError("Token vacío.")
     if " " in token:
         raise ValueError("El diccionario solo acepta UNA palabra (sin espacios).")
-    data = _ensure_dict_file()
-    arr = set(map(str, data.get(lang_ui, [])))
-    arr.add(token)
-    data[lang_ui] = sorted(arr)
-    _save_dict_file(data)
+    with file_lock(DICT_PATH):
+        data = dict(_read_dict_file(DICT_PATH))
+        arr = set(map(str, data.get(lang_ui, [])))
+        arr.add(token)
+        data[lang_ui] = sorted(arr)
+        _save_dict_file(data)
 
 def dict_remove(lang_ui: str, token: str) -> None:
     token = token.strip()
-    data = _ensure_dict_file()
-    arr = set(map(str, data.get(lang_ui, [])))
-    if token in arr:
-        arr.remove(token)
-        data[lang_ui] = sorted(arr)
-        _save_dict_file(data)
+    with file_lock(DICT_PATH):
+        data = dict(_read_dict_file(DICT_PATH))
+        arr = set(map(str, data.get(lang_ui, [])))
+        if token in arr:
+            arr.remove(token)
+            data[lang_ui] = sorted(arr)
+            _save_dict_file(data)
 
 # =========================
 # Reglas personalizadas (YAML sencillo)
@@ -141,6 +174,9 @@ class CustomRule:
     suggestions: Tuple[str, ...] = tuple()
 
 _RULES_CACHE: Dict[str, List[CustomRule]] = {}
+# /admin/reload-rules incrementa este contador; los demás workers lo ven y recargan
+RULES_GEN_PATH = STORAGE_DIR / "rules.gen"
+_RULES_GEN = file_stamp(RULES_GEN_PATH)
 
 def _compile_rule(raw: dict, fallback_prefix: str) -> Optional[CustomRule]:
     rid = str(raw.get("id") or raw.get("rule") or f"{fallback_prefix}_RULE")
@@ -175,7 +211,15 @@ def _load_yaml_rules(path: Path) -> List[dict]:
         return raw
     return []
 
+def _sync_rules_generation() -> None:
+    global _RULES_GEN
+    gen = file_stamp(RULES_GEN_PATH)   # un stat por análisis
+    if gen != _RULES_GEN:
+        _RULES_CACHE.clear()
+        _RULES_GEN = gen
+
 def load_custom_rules(lang_ui: str) -> List[CustomRule]:
+    _sync_rules_generation()
     if lang_ui in _RULES_CACHE:
         return _RULES_CACHE[lang_ui]
     fname = "es_mx.yaml" if lang_ui == "es-MX" else "es_419.yaml" if lang_ui == "es-419" else None
@@ -221,6 +265,59 @@ def run_custom_rules(text: str, lang_ui: str) -> List[dict]:
             )
     return out
 
+# =========================
+# Glosario
+# =========================
+def _load_glossary(path: Path) -> Glossary:
+    if not path.exists():
+        return Glossary({})
+    return Glossary.from_yaml(path)
+
+_GLOSSARY = MtimeCache(GLOSSARY_PATH, _load_glossary)
+
+# =========================
+# Ortografía local (SymSpell, mmap)
+# =========================
+def _open_spell(pointer: Path) -> Optional[SpellIndex]:
+    path = read_pointer(pointer)
+    if path is None or not path.exists():
+        return None
+    try:
+        return SpellIndex(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Índice ortográfico inválido (%s): %s", path, e)
+        return None
+
+# se reabre cuando tools/build_spell.py mueve el puntero; el anterior se cierra
+# en cuanto no lo use ninguna consulta
+_SPELL = MtimeCache(pointer_path(SPELL_PATH), _open_spell, on_replace=SpellIndex.retire)
+
+@contextmanager
+def spell_index():
+    """Índice vigente (o None) reservado durante el bloque."""
+    idx = None
+    for _ in range(3):   # uno retirado entre get() y acquire(): pedir el nuevo
+        cand = _SPELL.get()
+        if cand is None:
+            break
+        if cand.acquire():
+            idx = cand
+            break
+    try:
+        yield idx
+    finally:
+        if idx is not None:
+            idx.release()
+
+def local_spelling(text: str, lang_ui: str) -> List[dict]:
+    if not lang_ui.lower().startswith("es"):
+        return []
+    with spell_index() as idx:
+        if idx is None:
+            return []
+        with metrics.stage("spell"):
+            return idx.check(text, dict_list(lang_ui))
+
 # =========================
 # LT client + clasificación robusta
 # =========================
@@ -239,24 +336,57 @@ def _classify_client(m: dict) -> str:
         return "style"
     return "grammar"
 
-def lt_check(text: str, lang_ui: str, timeout_s: int = 30) -> List[dict]:
+# Huecos hacia LT compartidos por todas las peticiones de este worker: lo
+# interactivo pasa antes que los fragmentos de un archivo grande en cola.
+ADMISSION = admission.AdmissionController()
+
+def _client_id(request: Optional[Request]) -> str:
+    if request is None:
+        return "-"
+    cid = (request.headers.get("x-client-id") or "").strip()
+    if cid:
+        return cid[:64]
+    return request.client.host if request.client else "-"
+
+def lt_check(text: str, lang_ui: str, timeout_s: int = 30, priority: str = admission.INTERACTIVE) -> List[dict]:
+    """LT por fragmentos (LT_SHARD_CHARS); cada fragmento espera su hueco con la prioridad dada."""
     lt_lang = to_lt_language(lang_ui)
     url = lt_ep("/v2/check")
-    try:
-        resp = requests.post(url, data={"language": lt_lang, "text": text}, timeout=timeout_s)
-        resp.raise_for_status()
-    except Exception as e:
-        raise RuntimeError(f"LanguageTool no disponible en {LT_BASE}: {e}") from e
-    data = resp.json()
-    matches = data.get("matches", [])
     out = []
-    for m in matches:
-        cls = _classify_client(m)
-        m["clientClass"] = cls
-        m["lt_clientClass"] = cls
-        out.append(m)
+    for base, shard in admission.shard_text(text):
+        with ADMISSION.slot(priority):   # Overloaded -> 429
+            try:
+                with metrics.stage("lt"):
+                    resp = requests.post(url, data={"language": lt_lang, "text": shard}, timeout=timeout_s)
+                    resp.raise_for_status()
+            except Exception as e:
+                metrics.upstream_error("lt", e)
+                raise RuntimeError(f"LanguageTool no disponible en {LT_BASE}: {e}") from e
+        data = json_loads(resp.content)
+        for m in data.get("matches", []):
+            if base:
+                m["offset"] = int(m.get("offset") or 0) + base
+            cls = _classify_client(m)
+            m["clientClass"] = cls
+            m["lt_clientClass"] = cls
+            out.append(m)
     return out
 
+def lt_or_local(text: str, lang_ui: str, priority: str = admission.INTERACTIVE,
+                lexical: bool = True, spelling: bool = False) -> Tuple[List[dict], bool]:
+    """(matches, local): si LT no responde, los del normalizador local (backend/normalizer.py).
+    lexical=False (rutas que aplican sin revisión): solo espaciado, nada de reescribir palabras.
+    spelling=True añade la ortografía local: solo para marcar (análisis), nunca para aplicar."""
+    try:
+        return lt_check(text, lang_ui, priority=priority), False
+    except RuntimeError as e:
+        logger.warning("LT no disponible, uso el normalizador local: %s", e)
+        with metrics.stage("local_fallback"):
+            local = normalizer.normalize(text, lang_ui, lexical=lexical)[1]
+            if spelling:
+                local += local_spelling(text, lang_ui)
+            return match_merge.merge(local), True
+
 # =========================
 # Stats / Readability (ligero)
 # =========================
@@ -306,13 +436,37 @@ def filter_spelling_by_user_dict(matches: List[dict], text: str, lang_ui: str) -
 # FastAPI app
 # =========================
 app = FastAPI(title="LIA-Staylo API", version="0.8.0")
+app.router.route_class = profiling.ProfiledRoute   # X-Lia-Profile (solo admin)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_headers=["*"], allow_methods=["*"])
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(compression.CompressionMiddleware)   # la más externa: comprime lo que salga
+
+@app.on_event("startup")
+async def _size_threadpool():
+    admission.size_threadpool()   # los límites de admisión cuentan con este tamaño
+
+@app.exception_handler(admission.Overloaded)
+def _overloaded(request: Request, exc: admission.Overloaded):
+    return FastJSONResponse({"detail": str(exc), "retry_after": exc.retry_after},
+                            status_code=429, headers={"Retry-After": str(exc.retry_after)})
 
 # -------- Models --------
 class AnalyzeTextIn(BaseModel):
     text: str
     lang: Optional[str] = "es-MX"
     variant: Optional[str] = None
+    # respuesta compacta (también por query: ?compact=1&fields=stats&omit=context,sentence)
+    compact: bool = False
+    fields: Optional[List[str]] = None   # claves de primer nivel a devolver
+    omit: Optional[List[str]] = None     # claves a quitar de cada match
+    max_replacements: Optional[int] = None   # sugerencias por match en modo compacto (0 = todas)
+    # guardar los matches en el servidor (analysisId + conteos; también ?store=1);
+    # inline=False no manda la lista: se pide por rangos en /analysis/{id}/matches
+    store: bool = False
+    inline: bool = True
+    glossary: bool = False   # añade los términos del glosario como matches (también ?glossary=1)
+    spelling_only: bool = False   # solo ortografía local, sin LT (también ?spelling_only=1)
 
 class ApplyIn(BaseModel):
     text: str
@@ -329,6 +483,14 @@ class SuggestIn(BaseModel):
     lang: Optional[str] = "es-MX"
     variant: Optional[str] = None
 
+class ExportDocxIn(BaseModel):
+    text: str
+    lang: Optional[str] = "es-MX"
+    variant: Optional[str] = None
+    matches: Optional[List[dict]] = None   # correcciones aceptadas (formato LT)
+    track_changes: bool = False            # w:ins / w:del en lugar de texto ya corregido
+    author: str = "LIA-Staylo"
+
 # -------- Health --------
 @app.get("/health")
 def health():
@@ -346,6 +508,10 @@ def health():
         "lt_url": LT_BASE,
         "langs": list(SUPPORTED_UI_LANGS),
         "rules": {lg: len(load_custom_rules(lg)) for lg in SUPPORTED_UI_LANGS},
+        "admission": ADMISSION.status(),
+        "analyses": ANALYSES.status(),
+        "glossary": len(_GLOSSARY.get()),
+        "spell_words": len(_SPELL.get() or ()),
     }
 
 # -------- Brand --------
@@ -354,43 +520,147 @@ def brand():
     return {"brand": BRAND_PALETTE, "version": app.version}
 
 # -------- Analyze: text --------
-@app.post("/analyze_text")
+# Los endpoints de análisis/aplicación devuelven FastJSONResponse: el contenido ya
+# es JSON nativo y así se evita el recorrido de jsonable_encoder (miles de matches).
+# fast_json renderiza dentro de la etapa "serialize" de métricas y perfil.
+@app.post("/analyze_text", response_class=FastJSONResponse)
 def analyze_text(payload: AnalyzeTextIn, request: Request):
+    return fast_json(run_analysis(payload, request))
+
+def run_analysis(payload: AnalyzeTextIn, request: Optional[Request], priority: str = "") -> dict:
     lang_ui = pick_lang_ui(payload.lang, request, payload.variant)
     text = payload.text or ""
+    # prioridad: la del llamador, la cabecera X-Lia-Priority o, si no, por tamaño
+    if not priority and request is not None:
+        priority = (request.headers.get("x-lia-priority") or "").lower()
+    priority = admission.classify(len(text), priority)
+    q = request.query_params if request is not None else {}
+    spelling_only = payload.spelling_only or str(q.get("spelling_only") or "").lower() in ("1", "true", "yes")
+    # sin índice ortográfico, "solo ortografía" pasa por LT y se avisa en la respuesta
+    spelling_fallback = spelling_only and _SPELL.get() is None
     try:
-        lt_matches = lt_check(text, lang_ui)               # LT
-        custom_matches = run_custom_rules(text, lang_ui)   # Reglas
-        matches = lt_matches + custom_matches
-        matches = filter_spelling_by_user_dict(matches, text, lang_ui)
+        if spelling_only and not spelling_fallback:
+            lt_matches, local = local_spelling(text, lang_ui), True   # vía rápida: sin LT ni cola
+        else:
+            with ADMISSION.admit(_client_id(request), priority):
+                lt_matches, local = lt_or_local(text, lang_ui, priority, spelling=True)   # LT (o respaldo local)
+        with metrics.stage("custom_rules"):
+            custom_matches = run_custom_rules(text, lang_ui)   # Reglas
+        if payload.glossary or str(q.get("glossary") or "").lower() in ("1", "true", "yes"):
+            with metrics.stage("glossary"):
+                custom_matches += _GLOSSARY.get().matches(text)
+        with metrics.stage("merge"):
+            matches = match_merge.merge(lt_matches + custom_matches)   # un match por tramo
+        with metrics.stage("user_dict"):
+            matches = filter_spelling_by_user_dict(matches, text, lang_ui)
+    except admission.Overloaded:
+        raise
     except Exception as e:
         logger.exception("Error analizando texto")
         raise HTTPException(status_code=500, detail=str(e))
-    return {
+    fields, omit, compact_mode, max_reps = _response_shape(payload, request)
+    stats = readability = None
+    with metrics.stage("stats"):
+        if fields is None or "stats" in fields:
+            stats = basic_stats(text)
+        if fields is None or "readability" in fields:
+            readability = readability_info(text)
+    resp = {
         "ok": True,
         "text": text,
         "language": lang_ui,
-        "stats": basic_stats(text),
-        "readability": readability_info(text),
+        "stats": stats,
+        "readability": readability,
         "languageTool": {"matches": matches},
     }
+    if local:
+        resp["languageTool"]["source"] = "local"   # LT caído: solo revisión local
+    if spelling_fallback:
+        resp["languageTool"]["spellingOnly"] = "unavailable"   # revisión completa: falta tools/build_spell.py
+    inline = payload.inline and str(q.get("inline") or "1").lower() not in ("0", "false", "no")
+    if payload.store or not inline or str(q.get("store") or "").lower() in ("1", "true", "yes"):
+        analysis_id, idx = ANALYSES.put(matches, {"language": lang_ui, "length": len(text)})
+        resp["analysisId"] = analysis_id
+        resp["counts"] = idx.counts()
+        if not inline:
+            resp["languageTool"].update(matches=[], stored=True)
+    if fields is None and omit is None and not compact_mode:
+        return resp
+    return compact.shape_analysis(resp, fields=fields, omit=omit, compact=compact_mode, max_replacements=max_reps)
+
+def _response_shape(payload: AnalyzeTextIn, request: Optional[Request]) -> Tuple[Optional[List[str]], Optional[List[str]], bool, Optional[int]]:
+    """(fields, omit, compact, max_replacements) del cuerpo o, si no vienen, de la query."""
+    q = request.query_params if request is not None else {}
+    fields = compact.parse_list(payload.fields if payload.fields is not None else q.get("fields"))
+    omit = compact.parse_list(payload.omit if payload.omit is not None else q.get("omit"))
+    flag = payload.compact or str(q.get("compact") or "").lower() in ("1", "true", "yes")
+    max_reps = payload.max_replacements
+    if max_reps is None and q.get("max_replacements"):
+        try:
+            max_reps = int(q.get("max_replacements"))
+        except ValueError:
+            raise HTTPException(status_code=422, detail="max_replacements debe ser un entero")
+    return fields, omit, flag, max_reps
+
+# -------- Analysis guardados: ventana visible, filtros y conteos --------
+def _stored(analysis_id: str) -> match_store.MatchIndex:
+    idx = ANALYSES.get(analysis_id)
+    if idx is None:
+        raise HTTPException(status_code=404, detail="Análisis no encontrado o caducado; vuelve a analizar el texto.")
+    return idx
+
+@app.get("/analysis/{analysis_id}/matches", response_class=FastJSONResponse)
+def analysis_matches(
+    analysis_id: str,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    clientClass: Optional[str] = None,
+    category: Optional[str] = None,
+    rule: Optional[str] = None,
+    limit: int = 200,
+    cursor: int = 0,
+    compact_mode: bool = Query(False, alias="compact"),
+    omit: Optional[str] = None,
+    max_replacements: Optional[int] = None,
+):
+    """Matches que solapan [start, end), ordenados por offset; filtros como listas 'a,b'."""
+    idx = _stored(analysis_id)
+    page = idx.query(start, end, compact.parse_list(clientClass), compact.parse_list(category),
+                     compact.parse_list(rule), limit=limit, cursor=cursor)
+    resp = {"ok": True, "analysisId": analysis_id, "language": idx.meta.get("language"),
+            "range": {"start": start, "end": end}, "nextCursor": page["nextCursor"],
+            "languageTool": {"matches": page["matches"]}}
+    omit_list = compact.parse_list(omit)
+    if compact_mode or omit_list:
+        resp = compact.shape_analysis(resp, omit=omit_list, compact=compact_mode, max_replacements=max_replacements)
+    return fast_json(resp)
+
+@app.get("/analysis/{analysis_id}/counts", response_class=FastJSONResponse)
+def analysis_counts(analysis_id: str, start: Optional[int] = None, end: Optional[int] = None):
+    idx = _stored(analysis_id)
+    return fast_json({"ok": True, "analysisId": analysis_id, "length": idx.meta.get("length"),
+                      "range": {"start": start, "end": end}, "counts": idx.counts(start, end)})
+
+@app.delete("/analysis/{analysis_id}")
+def analysis_delete(analysis_id: str):
+    return {"ok": True, "deleted": ANALYSES.delete(analysis_id)}
 
 # -------- Analyze: compat JSON con Flutter (/analyze) --------
-@app.post("/analyze")
+@app.post("/analyze", response_class=FastJSONResponse)
 def analyze_compat(payload: dict, request: Request):
     text = str(payload.get("text") or "")
     lang = str(payload.get("lang") or "es-MX")
     variant = payload.get("variant")
     lang_ui = pick_lang_ui(lang, request, variant)
     lt_lang = str(payload.get("ltLang") or to_lt_language(lang_ui))
-    res = analyze_text(AnalyzeTextIn(text=text, lang=lang_ui, variant=variant), request)  # type: ignore
-    return {
+    res = run_analysis(AnalyzeTextIn(text=text, lang=lang_ui, variant=variant), request)  # type: ignore
+    return fast_json({
         "input": {"lang": lang_ui, "ltLang": lt_lang, "length": len(text)},
         "ok": True,
-        "stats": res["stats"],
-        "readability": res["readability"],
+        "stats": res.get("stats"),
+        "readability": res.get("readability"),
         "languageTool": res["languageTool"],
-    }
+    })
 
 # -------- Analyze: file (txt/md/docx/pdf) --------
 def _read_upload_text(upload: UploadFile) -> str:
@@ -424,7 +694,7 @@ def _read_upload_text(upload: UploadFile) -> str:
         return "\n".join(pages)
     raise ValueError("Extensión no soportada. Usa .txt, .md, .docx o .pdf")
 
-@app.post("/analyze/file")
+@app.post("/analyze/file", response_class=FastJSONResponse)
 def analyze_file(
     file: UploadFile = File(None),
     manuscript: UploadFile = File(None),
@@ -443,7 +713,8 @@ def analyze_file(
         pass
     lang_ui = pick_lang_ui(lang, request, None)
     try:
-        text = _read_upload_text(upload)
+        with metrics.stage("upload_parse"):
+            text = _read_upload_text(upload)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
@@ -451,15 +722,16 @@ def analyze_file(
         raise HTTPException(status_code=400, detail=f"No se pudo leer el archivo: {e}")
     print(f">> Texto extraído: {len(text)} chars")
     try:
-        return analyze_text(AnalyzeTextIn(text=text, lang=lang_ui), request)
-    except HTTPException:
+        # guardar solo si se pide (?store=1 o ?inline=0), como /analyze_text
+        return fast_json(run_analysis(AnalyzeTextIn(text=text, lang=lang_ui), request, admission.BULK))
+    except (HTTPException, admission.Overloaded):
         raise
     except Exception as e:
         logger.exception("Fallo analizando el archivo")
         raise HTTPException(status_code=500, detail=f"Fallo del analizador: {e}")
 
-@app.post("/upload")
-@app.post("/api/upload")
+@app.post("/upload", response_class=FastJSONResponse)
+@app.post("/api/upload", response_class=FastJSONResponse)
 def upload_legacy(
     file: UploadFile = File(None),
     manuscript: UploadFile = File(None),
@@ -468,7 +740,7 @@ def upload_legacy(
 ):
     return analyze_file(file=file, manuscript=manuscript, lang=lang, request=request)
 
-@app.post("/analyze-file")
+@app.post("/analyze-file", response_class=FastJSONResponse)
 def analyze_file_alias(
     file: UploadFile = File(None),
     manuscript: UploadFile = File(None),
@@ -494,83 +766,110 @@ def _apply_from_matches(text: str, matches: List[dict]) -> str:
         new_text = new_text[:off] + repl + new_text[off + ln:]
     return new_text
 
-@app.post("/apply/safe")
+def _with_source(resp: dict, local: bool) -> dict:
+    """Marca las respuestas hechas sin LT (solo el normalizador local)."""
+    if local:
+        resp["source"] = "local"
+    return resp
+
+@app.post("/apply/safe", response_class=FastJSONResponse)
 def apply_safe(payload: ApplyIn, request: Request):
     lang_ui = pick_lang_ui(payload.lang, request, payload.variant)
     text = payload.text or ""
-    lt_matches = lt_check(text, lang_ui)
+    priority = admission.classify(len(text))
+    with ADMISSION.admit(_client_id(request), priority):
+        lt_matches, local = lt_or_local(text, lang_ui, priority, lexical=False)
     safe = []
     for m in lt_matches:
         rule = m.get("rule") or {}
         rid = str(rule.get("id") or "").upper()
         cid = str(((rule.get("category") or {}).get("id") or "")).upper()
-        if any(k in rid for k in ("COMMA", "WHITESPACE", "PUNCT", "ELLIPSIS", "DASH", "APOS")) or any(k in cid for k in ("PUNCT", "WHITESPACE")):
+        if (any(k in rid for k in ("COMMA", "WHITESPACE", "PUNCT", "ELLIPSIS", "DASH", "APOS"))
+                or any(k in cid for k in ("PUNCT", "WHITESPACE")) or rule.get("issueType") == "whitespace"):
             safe.append(m)
     new_text = _apply_from_matches(text, safe)
-    return {"new_text": new_text}
+    return fast_json(_with_source({"new_text": new_text}, local))
 
-@app.post("/apply/all")
+@app.post("/apply/all", response_class=FastJSONResponse)
 def apply_all(payload: ApplyIn, request: Request):
     lang_ui = pick_lang_ui(payload.lang, request, payload.variant)
     text = payload.text or ""
-    lt_matches = lt_check(text, lang_ui)
+    priority = admission.classify(len(text))
+    with ADMISSION.admit(_client_id(request), priority):
+        lt_matches, local = lt_or_local(text, lang_ui, priority, lexical=False)
     new_text = _apply_from_matches(text, lt_matches)
-    return {"new_text": new_text}
-
-# -------- Fallback helpers (para /suggest)
-_SMS_MAP = [
-    (r"\bxq\b", "porque"),
-    (r"\bq\b", "que"),
-    (r"\bke\b", "que"),
-    (r"\bk\b", "que"),
-    (r"\bpa\b", "para"),
-    (r"\bxa\b", "para"),
-    (r"\bxfa\b", "por favor"),
-    (r"\bxo\b", "pero"),
-    (r"\bd\b", "de"),
-    (r"\bt\b", "te"),
-    (r"\btoi\b", "estoy"),
-    (r"\btoy\b", "estoy"),
-    (r"\bkpasa\b", "qué pasa"),
-    (r"\bna\b", "nada"),
-    (r"\bpk\b", "porque"),
-    (r"\bporq\b", "porque"),
-    (r"\bpor que\b", "porque"),
-    (r"\bqno\b", "que no"),
-    (r"\bq si\b", "que sí"),
-    (r"\bkien(es)?\b", "quien"),
-    (r"\bvaia\b", "vaya"),
-]
-
-_COMMON_FIXES = {
-    "cuanras": "cuantas",
-    "kuantas": "cuantas",
-    "kien": "quien",
-    "kienas": "quienes",
-    "ai": "hay",
-    "ase": "hace",
-    "porsupuesto": "por supuesto",
-    "averca": "acerca",
-    "haver": "haber",
-    "aver": "a ver",
-    "haiga": "haya",
-}
+    return fast_json(_with_source({"new_text": new_text}, local))
+
+# -------- Glosario: marcar o sustituir --------
+class GlossaryIn(BaseModel):
+    text: str
+    mode: str = "flag"   # flag: matches | apply: texto sustituido
+
+@app.post("/glossary", response_class=FastJSONResponse)
+def glossary_ep(payload: GlossaryIn):
+    g = _GLOSSARY.get()
+    text = payload.text or ""
+    mode = (payload.mode or "flag").lower().strip()
+    with metrics.stage("glossary"):
+        if mode == "apply":
+            new_text, n = g.apply(text)
+            return fast_json({"new_text": new_text, "replaced": n, "terms": len(g)})
+        if mode != "flag":
+            raise HTTPException(status_code=400, detail="mode debe ser 'flag' o 'apply'.")
+        matches = g.matches(text)
+    return fast_json({"terms": len(g), "count": len(matches), "matches": matches})
+
+@app.post("/glossary/file")
+def glossary_file(file: UploadFile = File(...)):
+    """Sustituye sobre un .txt/.md grande y devuelve el resultado en streaming (text/plain)."""
+    g = _GLOSSARY.get()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    # FastAPI cierra el UploadFile al volver del endpoint, antes de que empiece el
+    # streaming: copia propia (en memoria hasta 1 MB, luego a disco) que cierra el generador
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    shutil.copyfileobj(file.file, spool, 64 * 1024)
+    spool.seek(0)
+
+    def chunks():
+        try:
+            while True:
+                raw = spool.read(64 * 1024)
+                if not raw:
+                    tail = decoder.decode(b"", final=True)
+                    if tail:
+                        yield tail
+                    return
+                yield decoder.decode(raw)
+        finally:
+            spool.close()
+
+    name = Path(file.filename or "texto.txt").stem + ".glossary.txt"
+    return StreamingResponse(g.apply_stream(chunks()), media_type="text/plain; charset=utf-8",
+                             headers={"Content-Disposition": f'attachment; filename="{name}"'})
+
+# -------- Ortografía local --------
+@app.post("/spell", response_class=FastJSONResponse)
+def spell_check(payload: SuggestIn, request: Request):
+    """Solo ortografía, en proceso (sin LT): matches con sugerencias."""
+    lang_ui = pick_lang_ui(payload.lang, request, payload.variant)
+    with spell_index() as idx:
+        if idx is None:
+            raise HTTPException(status_code=503, detail="Índice ortográfico no disponible: ejecuta tools/build_spell.py")
+        matches = local_spelling(payload.text or "", lang_ui)
+    return fast_json({"language": lang_ui, "count": len(matches), "matches": matches})
+
+@app.get("/spell/suggest")
+def spell_suggest(word: str, lang: str = "es-MX", top: int = 5, request: Request = None):
+    lang_ui = pick_lang_ui(lang, request, None)
+    user = dict_list(lang_ui)
+    with spell_index() as idx:
+        if idx is None:
+            raise HTTPException(status_code=503, detail="Índice ortográfico no disponible: ejecuta tools/build_spell.py")
+        with metrics.stage("spell"):
+            sugg = idx.lookup(word, top=max(1, min(top, 20)), extra=user)
+        known = bool(idx.frequency(word)) or word.lower() in {u.lower() for u in user}
+    return {"word": word, "known": known, "suggestions": [{"value": s, "distance": d} for s, d, _ in sugg]}
 
-def _fallback_sms_normalize(text: str) -> str:
-    s = " " + text + " "
-    for pat, repl in _SMS_MAP:
-        s = re.sub(pat, repl, s, flags=re.IGNORECASE)
-    return s.strip()
-
-def _light_rewrite(text: str) -> str:
-    s = re.sub(r"[ \t]+", " ", text)
-    s = re.sub(r"\s+\n", "\n", s)
-    s = re.sub(r" ,", ",", s)
-    s = re.sub(r" \.", ".", s)
-    s = re.sub(r"\s{2,}", " ", s).strip()
-    return s
-
-# -------- Suggest (reescritura con fallback local)
 # -------- Suggest (reescritura con/fallback) --------
 @app.post("/suggest")
 def suggest(payload: SuggestIn, request: Request):
@@ -587,29 +886,25 @@ def suggest(payload: SuggestIn, request: Request):
     lang_ui = pick_lang_ui(payload.lang, request, payload.variant)
 
     if mode == "clean":
-        s = re.sub(r"[ \t]+", " ", t)
-        s = re.sub(r" ,", ",", s)
-        s = re.sub(r" \.", ".", s)
-        s = re.sub(r"\s+\n", "\n", s)
-        s = re.sub(r"\b(pues|este|o\s+sea)\b", "", s, flags=re.I)
-        s = re.sub(r"\s{2,}", " ", s).strip()
-        return {"suggestion": s}
+        s, _ = normalizer.normalize(t, lang_ui, fillers=True)
+        return {"suggestion": s.strip(), "source": "local"}
 
     # --- modo 'fix' (DEFAULT): usa LanguageTool y aplica replacements ---
     try:
-        matches = lt_check(t, lang_ui)
-        logger.info("[/suggest] mode=fix lang=%s matches=%d", lang_ui, len(matches))
+        priority = admission.classify(len(t))
+        with ADMISSION.admit(_client_id(request), priority):
+            matches, local = lt_or_local(t, lang_ui, priority, lexical=False)
+        logger.info("[/suggest] mode=fix lang=%s matches=%d%s", lang_ui, len(matches), " (local)" if local else "")
         fixed = _apply_from_matches(t, matches)
         if fixed == t:
-            s = re.sub(r"[ \t]+", " ", t)
-            s = re.sub(r"\s{2,}", " ", s).strip()
-            return {"suggestion": s}
-        return {"suggestion": fixed}
+            fixed, _ = normalizer.normalize(t, lang_ui, lexical=False)
+        return _with_source({"suggestion": fixed.strip()}, local)
+    except admission.Overloaded:
+        raise   # 429 con Retry-After, no el respaldo local
     except Exception as e:
         logger.warning("SUGGEST fallback clean por error LT: %s", e)
-        s = re.sub(r"[ \t]+", " ", t)
-        s = re.sub(r"\s{2,}", " ", s).strip()
-        return {"suggestion": s}
+        s, _ = normalizer.normalize(t, lang_ui, lexical=False)
+        return {"suggestion": s.strip(), "source": "local"}
 
 
 # --- Plan B explícito para probar sin querystring ni heurística ---
@@ -625,10 +920,14 @@ def suggest_fix_simple(payload: SuggestIn, request: Request):
 
     lang_ui = pick_lang_ui(payload.lang, request, payload.variant)
     try:
-        matches = lt_check(t, lang_ui)
+        priority = admission.classify(len(t))
+        with ADMISSION.admit(_client_id(request), priority):
+            matches = lt_check(t, lang_ui, priority=priority)
         logger.info("[/suggest_fix_simple] lang=%s matches=%d", lang_ui, len(matches))
         fixed = _apply_from_matches(t, matches)
         return {"suggestion": fixed}
+    except admission.Overloaded:
+        raise
     except Exception as e:
         logger.exception("suggest_fix_simple LT error")
         raise HTTPException(status_code=500, detail=str(e))
@@ -660,19 +959,22 @@ def dictionary_remove(payload: DictIn, request: Request):
 
 # -------- Export: DOCX --------
 @app.post("/export/docx")
-def export_docx(payload: ApplyIn):
-    try:
-        from docx import Document
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Falta dependencia 'python-docx'. Instala con: pip install python-docx") from e
-    doc = Document()
-    for line in (payload.text or "").splitlines():
-        doc.add_paragraph(line)
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-        doc.save(tmp.name); tmp.seek(0); bin_data = tmp.read()
-    return Response(
-        content=bin_data,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+def export_docx(payload: ExportDocxIn):
+    """
+    OOXML escrito directamente en streaming (sin python-docx ni temporales).
+    Con 'matches': track_changes=True los deja como cambios controlados;
+    si no, se exporta el texto ya corregido.
+    """
+    text = payload.text or ""
+    edits = docx_stream.edits_from_matches(text, payload.matches) if payload.matches else None
+    if edits and not payload.track_changes:
+        text = _apply_from_matches(text, [
+            {"offset": off, "length": ln, "replacements": [repl]} for off, ln, repl in edits
+        ])
+        edits = None
+    return StreamingResponse(
+        docx_stream.iter_docx(text, edits, author=payload.author),
+        media_type=docx_stream.DOCX_MEDIA_TYPE,
         headers={"Content-Disposition": 'attachment; filename="LIA-Staylo.docx"'},
     )
 
@@ -681,12 +983,18 @@ admin = APIRouter()
 
 @admin.post("/admin/reload-rules")
 def reload_rules():
+    bump_generation(RULES_GEN_PATH)
     _RULES_CACHE.clear()
     counts = {lg: len(load_custom_rules(lg)) for lg in SUPPORTED_UI_LANGS}
     return {"reloaded": True, "rules": counts}
 
 app.include_router(admin)
 
+# -------- Métricas (Prometheus) --------
+@app.get("/metrics")
+def metrics_ep():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 # -------- Root --------
 @app.get("/")
 def root():
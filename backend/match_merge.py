@@ -0,0 +1,113 @@
+# backend/match_merge.py — fusión de matches de LT y reglas propias por intervalos
+# - Mismo tramo (offset, length) marcado varias veces -> un solo match: gana el
+#   de mayor precedencia y se unen las sugerencias (sin repetir, las suyas primero)
+# - Tramo contenido en otro ya aceptado de la misma clase -> se descarta si el
+#   contenedor tiene igual o mayor precedencia (MATCH_MERGE_NESTED)
+# - Orden + un barrido: O(n log n) (por match, O(nº de fuentes)); admite la forma de backend/main.py (rule y
+#   replacements como dicts de LT) y la de app.py (rule/category como strings)
+from __future__ import annotations
+
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# fuentes por orden de precedencia (la primera gana)
+MATCH_PRECEDENCE = tuple(s.strip() for s in os.environ.get("MATCH_PRECEDENCE", "lt,custom").split(",") if s.strip())
+# same_class: solo entre matches de la misma clase | any: cualquiera | none: no fusionar anidados
+MATCH_MERGE_NESTED = os.environ.get("MATCH_MERGE_NESTED", "same_class").strip().lower()
+_CUSTOM_PREFIXES = ("CUSTOM_", "ES_MX_")
+
+
+def _rule_id(m: dict) -> str:
+    rule = m.get("rule")
+    return str((rule.get("id") if isinstance(rule, dict) else rule) or "")
+
+
+def source(m: dict) -> str:
+    """'lt' o 'custom' (o el campo 'source' si el match ya lo trae)."""
+    src = m.get("source")
+    if src:
+        return str(src)
+    return "custom" if _rule_id(m).upper().startswith(_CUSTOM_PREFIXES) else "lt"
+
+
+def match_class(m: dict) -> str:
+    cls = m.get("clientClass") or m.get("category")
+    if not cls:
+        rule = m.get("rule")
+        cat = (rule.get("category") or {}) if isinstance(rule, dict) else {}
+        cls = cat.get("id") if isinstance(cat, dict) else cat
+    return str(cls or "").lower()
+
+
+def _span(m: dict) -> Tuple[int, int]:
+    start = int(m.get("offset") or 0)
+    return start, start + int(m.get("length") or 0)
+
+
+def _rep_value(r) -> str:
+    return str(r.get("value", "")) if isinstance(r, dict) else str(r)
+
+
+def _union_replacements(winner: dict, others: Sequence[dict]) -> None:
+    reps = list(winner.get("replacements") or [])
+    as_dict = bool(reps) and isinstance(reps[0], dict)
+    if not reps:   # el ganador no traía: adopta el formato del primero que sí
+        for o in others:
+            if o.get("replacements"):
+                as_dict = isinstance(o["replacements"][0], dict)
+                break
+    seen = {_rep_value(r) for r in reps}
+    added = False
+    for o in others:
+        for r in o.get("replacements") or []:
+            v = _rep_value(r)
+            if v in seen:
+                continue
+            seen.add(v)
+            reps.append({"value": v} if as_dict else v)
+            added = True
+    if added:
+        winner["replacements"] = reps
+
+
+def merge(matches: Iterable[dict], precedence: Optional[Sequence[str]] = None,
+          nested: Optional[str] = None) -> List[dict]:
+    """Matches fusionados, ordenados por offset. No modifica los de entrada salvo el ganador."""
+    order = {s: i for i, s in enumerate(precedence or MATCH_PRECEDENCE)}
+    nested = (nested or MATCH_MERGE_NESTED)
+    worst = len(order)
+    # (start, -end, rango, posición): el contenedor llega antes que lo contenido y,
+    # en el mismo tramo, el de mayor precedencia primero (estable por posición)
+    keyed = []
+    for pos, m in enumerate(matches):
+        start, end = _span(m)
+        keyed.append((start, -end, order.get(source(m), worst), pos, m))
+    keyed.sort(key=lambda k: k[:4])
+
+    out: List[dict] = []
+    # por clase y rango, el fin más lejano de los aceptados: todos empiezan antes
+    # (o a la vez), así que un match está contenido si alguno de rango <= el suyo
+    # llega hasta su fin
+    reach: Dict[str, List[int]] = {}
+    i, n = 0, len(keyed)
+    while i < n:
+        start, neg_end, rank, _, winner = keyed[i]
+        end = -neg_end
+        j = i + 1
+        while j < n and keyed[j][0] == start and keyed[j][1] == neg_end:
+            j += 1
+        if j - i > 1:   # duplicados exactos: keyed[i] ya es el de mayor precedencia
+            winner = dict(winner)
+            _union_replacements(winner, [k[4] for k in keyed[i + 1:j]])
+        i = j
+        if nested != "none":
+            ckey = match_class(winner) if nested == "same_class" else "*"
+            ends = reach.get(ckey)
+            if ends is None:
+                ends = reach[ckey] = [-1] * (worst + 1)
+            if end > start and max(ends[:rank + 1]) >= end:
+                continue   # anidado en un match de igual o mayor precedencia
+            if end > ends[rank]:
+                ends[rank] = end
+        out.append(winner)
+    return out
@@ -0,0 +1,243 @@
+# backend/match_store.py — resultados de análisis guardados en el servidor
+# - MatchIndex: matches ordenados por offset; consulta por rango (la ventana
+#   visible) con bisect, filtros clientClass/categoría/regla y conteos
+# - AnalysisStore: LRU en memoria + copia en disco (STORAGE_DIR/analyses) para
+#   que cualquier worker resuelva el analysisId; caduca por TTL. La memoria se
+#   acota por número de análisis y, sobre todo, por matches en total: un
+#   manuscrito puede traer decenas de miles y un párrafo solo unos pocos
+# - La copia en disco la escribe un hilo aparte: put() no serializa ni escribe
+#   en la ruta de la petición; hasta que se escribe, get() la sirve de memoria
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from .fastjson import dumps, loads
+    from .shared_state import atomic_write_text
+except ImportError:
+    from fastjson import dumps, loads
+    from shared_state import atomic_write_text
+
+ANALYSIS_STORE_MAX = int(os.environ.get("ANALYSIS_STORE_MAX", "64"))       # índices en memoria
+ANALYSIS_STORE_MAX_MATCHES = int(os.environ.get("ANALYSIS_STORE_MAX_MATCHES", "200000"))   # matches en memoria
+ANALYSIS_TTL_S = float(os.environ.get("ANALYSIS_TTL_S", str(6 * 3600)))
+PAGE_LIMIT_MAX = 1000
+_ID_CHARS = set("0123456789abcdef")
+
+logger = logging.getLogger("lia-backend")
+
+
+def _category(m: dict) -> str:
+    cat = (m.get("rule") or {}).get("category") or {}
+    if isinstance(cat, dict):
+        return str(cat.get("id") or cat.get("name") or "")
+    return str(cat)
+
+
+def _rule_id(m: dict) -> str:
+    return str((m.get("rule") or {}).get("id") or "")
+
+
+def _upper_set(values: Optional[Sequence[str]]) -> Optional[set]:
+    return {v.upper() for v in values} if values else None
+
+
+class MatchIndex:
+    def __init__(self, matches: Iterable[dict], meta: Optional[dict] = None):
+        self.matches: List[dict] = sorted(matches, key=lambda m: (int(m.get("offset") or 0), int(m.get("length") or 0)))
+        self.offsets: List[int] = [int(m.get("offset") or 0) for m in self.matches]
+        # el match más largo acota cuánto antes de 'start' puede empezar uno que lo solape
+        self.max_len = max((int(m.get("length") or 0) for m in self.matches), default=0)
+        self.meta = meta or {}
+
+    def window(self, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[int, int]:
+        """[i, j) de los matches que solapan [start, end) (los de longitud 0 cuentan si caen dentro)."""
+        i = 0 if start is None else bisect_left(self.offsets, start - self.max_len)
+        j = len(self.matches) if end is None else bisect_left(self.offsets, end)
+        if start is not None:
+            while i < j:
+                m = self.matches[i]
+                if self.offsets[i] + int(m.get("length") or 0) > start or self.offsets[i] >= start:
+                    break
+                i += 1
+        return i, j
+
+    def _select(self, i: int, j: int, start: Optional[int], classes, categories, rules):
+        for k in range(i, j):
+            m = self.matches[k]
+            if start is not None and self.offsets[k] + int(m.get("length") or 0) <= start and self.offsets[k] < start:
+                continue
+            if classes and str(m.get("clientClass") or "").upper() not in classes:
+                continue
+            if categories and _category(m).upper() not in categories:
+                continue
+            if rules and _rule_id(m).upper() not in rules:
+                continue
+            yield k, m
+
+    def query(self, start: Optional[int] = None, end: Optional[int] = None,
+              client_class: Optional[Sequence[str]] = None, category: Optional[Sequence[str]] = None,
+              rule: Optional[Sequence[str]] = None, limit: int = 200, cursor: int = 0) -> dict:
+        """Página de matches; nextCursor es la posición en el índice desde la que seguir."""
+        limit = max(1, min(int(limit), PAGE_LIMIT_MAX))
+        i, j = self.window(start, end)
+        i = max(i, int(cursor or 0))
+        out: List[dict] = []
+        next_cursor = None
+        for k, m in self._select(i, j, start, _upper_set(client_class), _upper_set(category), _upper_set(rule)):
+            if len(out) == limit:
+                next_cursor = k
+                break
+            out.append(m)
+        return {"matches": out, "nextCursor": next_cursor}
+
+    def counts(self, start: Optional[int] = None, end: Optional[int] = None) -> dict:
+        i, j = self.window(start, end)
+        by_class: Counter = Counter()
+        by_cat: Counter = Counter()
+        by_rule: Counter = Counter()
+        for _, m in self._select(i, j, start, None, None, None):
+            by_class[str(m.get("clientClass") or "")] += 1
+            by_cat[_category(m)] += 1
+            by_rule[_rule_id(m)] += 1
+        return {"total": sum(by_class.values()), "byClientClass": dict(by_class),
+                "byCategory": dict(by_cat), "byRule": dict(by_rule.most_common())}
+
+
+class AnalysisStore:
+    def __init__(self, root: Path, max_items: int = ANALYSIS_STORE_MAX, ttl_s: float = ANALYSIS_TTL_S,
+                 max_matches: int = ANALYSIS_STORE_MAX_MATCHES):
+        self.root = Path(root)
+        self.max_items = max(1, max_items)
+        self.max_matches = max(1, max_matches)
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, Tuple[float, MatchIndex]]" = OrderedDict()
+        self._mem_matches = 0
+        self._last_sweep = 0.0
+        # escrituras a disco pendientes: id -> índice (get() las sirve mientras tanto)
+        self._pending: Dict[str, MatchIndex] = {}
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._io_lock = threading.Lock()   # escribir vs. borrar el mismo archivo
+        self._writer: Optional[threading.Thread] = None
+
+    def _path(self, analysis_id: str) -> Path:
+        return self.root / f"{analysis_id}.json"
+
+    def put(self, matches: List[dict], meta: dict) -> Tuple[str, MatchIndex]:
+        analysis_id = secrets.token_hex(12)
+        idx = MatchIndex(matches, meta)
+        with self._lock:
+            self._pending[analysis_id] = idx
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="analysis-store", daemon=True)
+                self._writer.start()
+        self._queue.put(analysis_id)
+        self._remember(analysis_id, idx)
+        return analysis_id, idx
+
+    def flush(self) -> None:
+        """Espera a que las copias en disco pendientes estén escritas."""
+        self._queue.join()
+
+    def _write_loop(self) -> None:
+        while True:
+            analysis_id = self._queue.get()
+            try:
+                with self._io_lock:
+                    with self._lock:
+                        idx = self._pending.get(analysis_id)   # None: borrado antes de escribirse
+                    if idx is not None:
+                        atomic_write_text(self._path(analysis_id),
+                                          dumps({"meta": idx.meta, "matches": idx.matches}).decode("utf-8"))
+                with self._lock:
+                    self._pending.pop(analysis_id, None)
+                self._sweep()
+            except Exception:
+                logger.exception("No se pudo guardar el análisis %s", analysis_id)
+                with self._lock:
+                    self._pending.pop(analysis_id, None)
+            finally:
+                self._queue.task_done()
+
+    def get(self, analysis_id: str) -> Optional[MatchIndex]:
+        if not analysis_id or not set(analysis_id) <= _ID_CHARS:
+            return None
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(analysis_id)
+            if hit is not None and now - hit[0] <= self.ttl_s:
+                self._mem.move_to_end(analysis_id)
+                return hit[1]
+            pending = self._pending.get(analysis_id)   # expulsado antes de llegar a disco
+            if pending is not None:
+                return pending
+        path = self._path(analysis_id)   # otro worker o expulsado de la LRU
+        try:
+            if now - path.stat().st_mtime > self.ttl_s:
+                return None
+            data = loads(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        idx = MatchIndex(data.get("matches") or [], data.get("meta") or {})
+        self._remember(analysis_id, idx, path.stat().st_mtime)
+        return idx
+
+    def delete(self, analysis_id: str) -> bool:
+        if not analysis_id or not set(analysis_id) <= _ID_CHARS:
+            return False
+        with self._io_lock:
+            with self._lock:
+                self._forget(analysis_id)
+                was_pending = self._pending.pop(analysis_id, None) is not None
+            try:
+                self._path(analysis_id).unlink()
+                return True
+            except OSError:
+                return was_pending
+
+    def _remember(self, analysis_id: str, idx: MatchIndex, created: Optional[float] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._forget(analysis_id)
+            # los caducados solo se saltaban al leer: sacarlos aquí libera su memoria
+            for old_id in [k for k, (t, _) in self._mem.items() if now - t > self.ttl_s]:
+                self._forget(old_id)
+            self._mem[analysis_id] = (created or now, idx)
+            self._mem_matches += len(idx.matches)
+            # el recién guardado se queda aunque él solo supere el presupuesto (sigue en disco igualmente)
+            while len(self._mem) > 1 and (len(self._mem) > self.max_items or self._mem_matches > self.max_matches):
+                _, (_, old) = self._mem.popitem(last=False)
+                self._mem_matches -= len(old.matches)
+
+    def _forget(self, analysis_id: str) -> None:
+        hit = self._mem.pop(analysis_id, None)
+        if hit is not None:
+            self._mem_matches -= len(hit[1].matches)
+
+    def _sweep(self) -> None:
+        """Borra del disco los análisis caducados (como mucho una vez por minuto)."""
+        now = time.time()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for p in self.root.glob("*.json"):
+            try:
+                if now - p.stat().st_mtime > self.ttl_s:
+                    p.unlink()
+            except OSError:
+                pass
+
+    def status(self) -> Dict[str, int]:
+        with self._lock:
+            return {"in_memory": len(self._mem), "max": self.max_items, "matches": self._mem_matches,
+                    "max_matches": self.max_matches, "ttl_s": int(self.ttl_s), "pending_writes": len(self._pending)}
@@ -0,0 +1,246 @@
+# backend/metrics.py — métricas en proceso con exposición estilo Prometheus
+# - Counter / Histogram con etiquetas; un lock por métrica, sin dependencias
+# - MetricsMiddleware (ASGI puro): latencia por ruta, tamaños de petición/respuesta
+# - stage(): cronómetro por etapa (parseo, LT, reglas, spaCy, recuperación, LLM…)
+# - Los ratios de caché se leen al exponer (callbacks), no en el camino caliente
+# Con varios workers cada proceso lleva sus propios contadores (ver lia_process_start_time_seconds{pid}).
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from .profiling import span
+except ImportError:
+    from profiling import span
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, v in items:
+            yield f"{self.name}{_fmt_labels(self.labelnames, labels)} {_num(v)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        # por etiqueta: [conteos por cubeta (no acumulados) + desbordamiento, suma, n]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [[0] * (len(self.bounds) + 1), 0.0, 0]
+            row[0][i] += 1
+            row[1] += value
+            row[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        for labels, (counts, total, n) in items:
+            acc = 0
+            for bound, c in zip(self.bounds + (float("inf"),), counts):
+                acc += c
+                le = 'le="%s"' % _num(bound)
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {acc}"
+            yield f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {_num(total)}"
+            yield f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {n}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class GaugeFn:
+    """Gauge evaluado al exponer: fn() -> {tupla de etiquetas: valor}."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], fn: Callable[[], Dict[tuple, float]]):
+        self.name, self.help, self.labelnames, self.fn = name, help, tuple(labelnames), fn
+
+    def samples(self) -> Iterable[str]:
+        try:
+            values = self.fn() or {}
+        except Exception:
+            return
+        for labels, v in values.items():
+            if v is not None:
+                yield f"{self.name}{_fmt_labels(self.labelnames, labels)} {_num(v)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+        self._caches: Dict[str, Callable[[], Optional[dict]]] = {}
+        self.gauge_fn("lia_cache_hits", "Aciertos acumulados por caché", ("cache",),
+                      lambda: self._cache_field("hits"))
+        self.gauge_fn("lia_cache_misses", "Fallos acumulados por caché", ("cache",),
+                      lambda: self._cache_field("misses"))
+        self.gauge_fn("lia_cache_hit_ratio", "Ratio de aciertos por caché", ("cache",),
+                      lambda: self._cache_field("hit_ratio"))
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        m = Counter(name, help, labelnames)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        m = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(m)
+        return m
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        m = Gauge(name, help, labelnames)
+        self._metrics.append(m)
+        return m
+
+    def gauge_fn(self, name: str, help: str, labelnames: Sequence[str], fn) -> GaugeFn:
+        m = GaugeFn(name, help, labelnames, fn)
+        self._metrics.append(m)
+        return m
+
+    def register_cache(self, name: str, stats: Callable[[], Optional[dict]]) -> None:
+        """stats() -> dict con 'hits', 'misses' y opcionalmente 'hit_ratio' (o None)."""
+        self._caches[name] = stats
+
+    def _cache_field(self, field: str) -> Dict[tuple, float]:
+        out = {}
+        for name, fn in list(self._caches.items()):
+            st = fn()
+            if not st:
+                continue
+            if field == "hit_ratio" and "hit_ratio" not in st:
+                total = st.get("hits", 0) + st.get("misses", 0)
+                st = dict(st, hit_ratio=(st.get("hits", 0) / total) if total else 0.0)
+            if field in st:
+                out[(name,)] = float(st[field])
+        return out
+
+    def render(self) -> str:
+        pid = f'pid="{os.getpid()}"'
+        lines = [f"# HELP lia_process_start_time_seconds Inicio del proceso",
+                 f"# TYPE lia_process_start_time_seconds gauge",
+                 f"lia_process_start_time_seconds{{{pid}}} {_START}"]
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.samples())
+        return "\n".join(lines) + "\n"
+
+
+_START = round(time.time(), 3)
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram("lia_request_seconds", "Latencia por ruta", ("route", "method", "status"))
+REQUEST_BYTES = REGISTRY.histogram("lia_request_bytes", "Tamaño del cuerpo de la petición", ("route",), SIZE_BUCKETS)
+RESPONSE_BYTES = REGISTRY.histogram("lia_response_bytes", "Tamaño del cuerpo de la respuesta", ("route",), SIZE_BUCKETS)
+STAGE_SECONDS = REGISTRY.histogram("lia_stage_seconds", "Duración por etapa de análisis/sugerencia", ("stage",))
+UPSTREAM_ERRORS = REGISTRY.counter("lia_upstream_errors_total", "Errores de servicios externos", ("upstream", "kind"))
+IN_FLIGHT = REGISTRY.gauge("lia_requests_in_flight", "Peticiones en curso")
+
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        with span(name):   # no-op salvo en peticiones perfiladas
+            yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, name)
+
+
+def upstream_error(upstream: str, exc: BaseException) -> None:
+    """Cuenta un fallo de LT/LLM distinguiendo timeouts del resto."""
+    timeout = isinstance(exc, TimeoutError) or "Timeout" in type(exc).__name__
+    UPSTREAM_ERRORS.inc(upstream, "timeout" if timeout else "error")
+
+
+class MetricsMiddleware:
+    """ASGI puro (no bufferiza respuestas en streaming)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = {"code": 500, "bytes": 0}
+        req_len = 0
+        for k, v in scope.get("headers") or ():
+            if k == b"content-length":
+                try:
+                    req_len = int(v)
+                except ValueError:
+                    pass
+                break
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                status["bytes"] += len(message.get("body") or b"")
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            IN_FLIGHT.dec()
+            # plantilla de la ruta (p. ej. /analyze/file), no la URL: cardinalidad acotada
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, route, scope.get("method", ""), str(status["code"]))
+            REQUEST_BYTES.observe(req_len, route)
+            RESPONSE_BYTES.observe(status["bytes"], route)
@@ -0,0 +1,133 @@
+# backend/normalizer.py — normalizador local en una sola pasada
+# - Tokeniza una vez (palabra / espacios / salto / otro) y decide token a token:
+#   abreviaturas SMS y faltas comunes por búsqueda en diccionario (también
+#   bigramas: "q si", "por que"), espaciado (dobles, antes de puntuación, al
+#   inicio y final de línea) y, si se pide, muletillas
+# - Una letra suelta seguida de punto es una inicial ("D. Quijote"), no SMS
+# - Cada cambio sale como match con offset/length sobre el texto original, en
+#   la forma de LanguageTool: sirve de respaldo cuando LT no responde
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Tuple
+
+try:
+    from .glossary import match_case
+except ImportError:
+    from glossary import match_case
+
+SMS_MAP: Dict[str, str] = {
+    "xq": "porque", "q": "que", "ke": "que", "k": "que", "pa": "para", "xa": "para",
+    "xfa": "por favor", "xo": "pero", "d": "de", "t": "te", "toi": "estoy", "toy": "estoy",
+    "kpasa": "qué pasa", "na": "nada", "pk": "porque", "porq": "porque", "qno": "que no",
+    "vaia": "vaya",
+}
+SMS_BIGRAMS: Dict[Tuple[str, str], str] = {
+    ("por", "que"): "porque",
+    ("q", "si"): "que sí",
+}
+COMMON_FIXES: Dict[str, str] = {
+    "cuanras": "cuantas", "kuantas": "cuantas", "kien": "quien", "kienes": "quienes",
+    "kienas": "quienes", "ai": "hay", "ase": "hace", "porsupuesto": "por supuesto",
+    "averca": "acerca", "haver": "haber", "aver": "a ver", "haiga": "haya",
+}
+FILLERS = {"pues", "este"}
+FILLER_BIGRAMS = {("o", "sea")}
+
+_TOKEN = re.compile(r"(?P<word>\w+)|(?P<ws>[ \t]+)|(?P<nl>\r?\n)|(?P<other>.)", re.S)
+_PUNCT_AFTER = set(",.;:!?…")
+
+_RULES = {
+    "LOCAL_SMS": ("Abreviatura de mensajería", "misspelling", ("TYPOS", "Errores ortográficos"), "spelling"),
+    "LOCAL_COMMON_FIX": ("Error ortográfico frecuente", "misspelling", ("TYPOS", "Errores ortográficos"), "spelling"),
+    "LOCAL_SPACING": ("Espaciado", "whitespace", ("TYPOGRAPHY", "Tipografía"), "punct"),
+    "LOCAL_FILLER": ("Muletilla", "style", ("STYLE", "Estilo"), "style"),
+}
+
+
+def _match(rule_id: str, message: str, offset: int, length: int, value: str) -> dict:
+    desc, issue, (cat_id, cat_name), cls = _RULES[rule_id]
+    return {
+        "message": message,
+        "shortMessage": desc,
+        "offset": offset,
+        "length": length,
+        "replacements": [{"value": value}],
+        "rule": {"id": rule_id, "description": desc, "issueType": issue,
+                 "category": {"id": cat_id, "name": cat_name}},
+        "clientClass": cls,
+        "lt_clientClass": cls,
+    }
+
+
+def normalize(text: str, lang_ui: str = "es-MX", lexical: bool = True,
+              fillers: bool = False) -> Tuple[str, List[dict]]:
+    """(texto normalizado, matches). lexical/fillers solo aplican a español."""
+    toks = [(m.lastgroup, m.start(), m.group(0)) for m in _TOKEN.finditer(text)]
+    spanish = (lang_ui or "").lower().startswith("es")
+    lexical = lexical and spanish
+    fillers = fillers and spanish
+    out: List[str] = []
+    matches: List[dict] = []
+    n = len(toks)
+    i = 0
+    while i < n:
+        kind, start, tok = toks[i]
+        if kind == "word" and (lexical or fillers):
+            low = tok.lower()
+            # bigrama: palabra + un espacio + palabra
+            if i + 2 < n and toks[i + 1][2] == " " and toks[i + 2][0] == "word":
+                pair = (low, toks[i + 2][2].lower())
+                span = tok + " " + toks[i + 2][2]
+                if lexical and pair in SMS_BIGRAMS:
+                    value = match_case(span, SMS_BIGRAMS[pair])
+                    matches.append(_match("LOCAL_SMS", f"«{span}» → «{value}».", start, len(span), value))
+                    out.append(value)
+                    i += 3
+                    continue
+                if fillers and pair in FILLER_BIGRAMS:
+                    i = _drop_filler(toks, i, i + 3, span, out, matches)
+                    continue
+            if fillers and low in FILLERS:
+                i = _drop_filler(toks, i, i + 1, tok, out, matches)
+                continue
+            fix = (SMS_MAP.get(low), "LOCAL_SMS") if low in SMS_MAP else (COMMON_FIXES.get(low), "LOCAL_COMMON_FIX")
+            initial = len(tok) == 1 and i + 1 < n and toks[i + 1][2] == "."
+            if lexical and fix[0] and not initial:
+                value = match_case(tok, fix[0])
+                matches.append(_match(fix[1], f"«{tok}» → «{value}».", start, len(tok), value))
+                out.append(value)
+                i += 1
+                continue
+        elif kind == "ws":
+            nxt = toks[i + 1] if i + 1 < n else None
+            if nxt is None or nxt[0] == "nl" or i == 0 or toks[i - 1][0] == "nl":
+                value, why = "", "Espacio sobrante al inicio o final de línea."
+            elif nxt[0] == "other" and nxt[2] in _PUNCT_AFTER:
+                value, why = "", f"Sin espacio antes de «{nxt[2]}»."
+            elif tok != " ":
+                value, why = " ", "Espacios repetidos."
+            else:
+                value = None
+            if value is not None:
+                matches.append(_match("LOCAL_SPACING", why, start, len(tok), value))
+                out.append(value)
+                i += 1
+                continue
+        out.append(tok)
+        i += 1
+    return "".join(out), matches
+
+
+def _drop_filler(toks, i: int, j: int, span: str, out: List[str], matches: List[dict]) -> int:
+    """Quita la muletilla y el espacio que la sigue (o el que la precede, al final)."""
+    start = toks[i][1]
+    end = toks[j - 1][1] + len(toks[j - 1][2])
+    if j < len(toks) and toks[j][0] == "ws":
+        end = toks[j][1] + len(toks[j][2])
+        j += 1
+    elif out and toks[i - 1][0] == "ws" and out[-1] == toks[i - 1][2]:
+        out.pop()
+        start = toks[i - 1][1]
+    matches.append(_match("LOCAL_FILLER", f"Muletilla: «{span}».", start, end - start, ""))
+    return j
@@ -0,0 +1,249 @@
+# backend/profiling.py — perfilado bajo demanda de una petición
+# - Se activa con cabecera X-Lia-Profile: 1 | sample (o ?profile=1|sample)
+#   y X-Admin-Token == LIA_ADMIN_TOKEN; sin token configurado no se activa nunca
+# - Devuelve un árbol de tiempos por etapa (las mismas de metrics.stage) en
+#   "_profile" de la respuesta JSON y un resumen en la cabecera Server-Timing
+# - "sample": perfil de muestreo (pyinstrument si está; si no, cProfile) en logs/
+# - Desactivado cuesta una lectura de ContextVar por etapa
+from __future__ import annotations
+
+import functools
+import hmac
+import inspect
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger("lia-backend")
+
+LIA_ADMIN_TOKEN = os.environ.get("LIA_ADMIN_TOKEN", "")
+PROFILE_DIR = Path(os.environ.get("LIA_PROFILE_DIR", "logs"))
+
+
+class Node:
+    __slots__ = ("name", "t0", "ms", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.t0 = time.perf_counter()
+        self.ms: Optional[float] = None
+        self.children: List["Node"] = []
+
+    def close(self) -> None:
+        self.ms = (time.perf_counter() - self.t0) * 1000
+
+    def to_dict(self) -> dict:
+        out = {"name": self.name, "ms": round(self.ms or 0.0, 3)}
+        if self.children:
+            out["children"] = [c.to_dict() for c in self.children]
+            out["self_ms"] = round(max(0.0, (self.ms or 0.0) - sum(c.ms or 0.0 for c in self.children)), 3)
+        return out
+
+
+class Profile:
+    def __init__(self, route: str, sample: bool):
+        self.root = Node(route)
+        self.sample = sample
+        self.endpoint_done: Optional[float] = None
+        self.profile_file: Optional[str] = None
+
+
+_PROFILE: ContextVar[Optional[Profile]] = ContextVar("lia_profile", default=None)
+_NODE: ContextVar[Optional[Node]] = ContextVar("lia_profile_node", default=None)
+
+
+@contextmanager
+def span(name: str):
+    parent = _NODE.get()
+    if parent is None:
+        yield
+        return
+    node = Node(name)
+    parent.children.append(node)
+    token = _NODE.set(node)
+    try:
+        yield
+    finally:
+        node.close()
+        _NODE.reset(token)
+
+
+# ------------------------
+# Perfil de muestreo (opcional)
+# ------------------------
+@contextmanager
+def _sampler(prof: Profile, label: str, is_async: bool):
+    if not prof.sample:
+        yield
+        return
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stem = PROFILE_DIR / f"profile_{time.strftime('%Y%m%d_%H%M%S')}_{re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')}"
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+    if Profiler is not None:
+        p = Profiler(async_mode="enabled" if is_async else "disabled")
+        p.start()
+        try:
+            yield
+        finally:
+            p.stop()
+            path = stem.with_suffix(".html")
+            path.write_text(p.output_html(), encoding="utf-8")
+            prof.profile_file = str(path)
+        return
+    import cProfile
+    p = cProfile.Profile()
+    p.enable()
+    try:
+        yield
+    finally:
+        p.disable()
+        path = stem.with_suffix(".prof")
+        p.dump_stats(str(path))
+        prof.profile_file = str(path)
+
+
+# ------------------------
+# Ruta que marca el fin del endpoint (lo que sigue es la respuesta de FastAPI:
+# jsonable_encoder + render si devolvió un dict; fast_json ya lo midió dentro)
+# ------------------------
+def _wrap_endpoint(fn):
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def _async(*args, **kwargs):
+            prof = _PROFILE.get()
+            if prof is None:
+                return await fn(*args, **kwargs)
+            with span("endpoint"), _sampler(prof, prof.root.name, True):
+                res = await fn(*args, **kwargs)
+            prof.endpoint_done = time.perf_counter()
+            return res
+        return _async
+
+    @functools.wraps(fn)
+    def _sync(*args, **kwargs):
+        prof = _PROFILE.get()
+        if prof is None:
+            return fn(*args, **kwargs)
+        with span("endpoint"), _sampler(prof, prof.root.name, False):
+            res = fn(*args, **kwargs)
+        prof.endpoint_done = time.perf_counter()
+        return res
+    return _sync
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute cuyo endpoint avisa al perfilador; sin perfil activo solo añade un ContextVar.get()."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        # firma y dependencias ya resueltas con el endpoint original; el handler de
+        # FastAPI llama a dependant.call en cada petición. self.app no se toca: su
+        # envoltura de la petición cambia entre versiones de FastAPI
+        self.dependant.call = _wrap_endpoint(endpoint)
+
+
+# ------------------------
+# Middleware
+# ------------------------
+def _requested(scope) -> Optional[str]:
+    if not LIA_ADMIN_TOKEN:
+        return None
+    headers = {k: v for k, v in scope.get("headers") or () if k in (b"x-lia-profile", b"x-admin-token")}
+    mode = headers.get(b"x-lia-profile", b"").decode("latin-1").strip().lower()
+    if not mode and b"profile=" in (scope.get("query_string") or b""):
+        mode = (parse_qs(scope["query_string"].decode("latin-1")).get("profile") or [""])[0].strip().lower()
+    if mode not in ("1", "true", "sample"):
+        return None
+    token = headers.get(b"x-admin-token", b"").decode("latin-1")
+    if not hmac.compare_digest(token, LIA_ADMIN_TOKEN):
+        logger.warning("Perfilado pedido sin token de administrador válido; se ignora")
+        return None
+    return mode
+
+
+def _server_timing(root: Node) -> str:
+    parts = []
+    stack = list(reversed(root.children))
+    while stack:   # todas las etapas, en orden
+        n = stack.pop()
+        parts.append(f'{re.sub(r"[^A-Za-z0-9_]", "_", n.name)};dur={n.ms or 0:.1f}')
+        stack.extend(reversed(n.children))
+    parts.append(f"total;dur={root.ms or 0:.1f}")
+    return ", ".join(parts)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (mode := _requested(scope)) is None:
+            await self.app(scope, receive, send)
+            return
+
+        prof = Profile(f"{scope.get('method', '')} {scope.get('path', '')}", sample=mode == "sample")
+        tok_p, tok_n = _PROFILE.set(prof), _NODE.set(prof.root)
+        start_msg: Optional[dict] = None
+        body: List[bytes] = []
+        passthrough = False
+        t_start: Optional[float] = None
+
+        async def _send(message):
+            nonlocal start_msg, passthrough, t_start
+            if message["type"] == "http.response.start":
+                t_start = time.perf_counter()
+                ctype = dict(message.get("headers") or ()).get(b"content-type", b"")
+                if not ctype.startswith(b"application/json"):
+                    passthrough = True   # streaming/binario: el árbol va solo al log
+                    await send(message)
+                    return
+                start_msg = message
+                return
+            if passthrough:
+                await send(message)
+                return
+            body.append(message.get("body") or b"")
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _PROFILE.reset(tok_p)
+            _NODE.reset(tok_n)
+
+        if prof.endpoint_done is not None and t_start is not None:
+            ser = Node("response")
+            ser.t0, ser.ms = prof.endpoint_done, (t_start - prof.endpoint_done) * 1000
+            prof.root.children.append(ser)
+        prof.root.close()
+        tree = prof.root.to_dict()
+        if prof.profile_file:
+            tree["profile_file"] = prof.profile_file
+        logger.info("Perfil %s: %s", prof.root.name, json.dumps(tree, ensure_ascii=False))
+        if passthrough or start_msg is None:
+            return
+
+        raw = b"".join(body)
+        try:
+            doc = json.loads(raw)
+            if isinstance(doc, dict):
+                doc["_profile"] = tree
+                raw = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+        except ValueError:
+            pass
+        headers = [(k, v) for k, v in start_msg.get("headers") or () if k != b"content-length"]
+        headers.append((b"content-length", str(len(raw)).encode()))
+        headers.append((b"server-timing", _server_timing(prof.root).encode("latin-1")))
+        await send({**start_msg, "headers": headers})
+        await send({"type": "http.response.body", "body": raw})
@@ -2,13 +2,19 @@
 # - Soporta ejecución en venv, código fuente, PyInstaller (onedir/onefile)
 # - Encuentra la app vía LIA_APP_MODULE="modulo:atributo" o por candidatos comunes
 # - Ajusta sys.path y el directorio de trabajo para evitar imports frágiles
+# - Modo producción (LIA_SERVER_MODE=prod o LIA_WORKERS>1): varios procesos,
+#   uvloop/httptools si están, apagado ordenado y reciclado de workers
 
 from __future__ import annotations
 
 import os
+import re
 import sys
+import random
+import signal
 import importlib
 import importlib.util
+import multiprocessing
 from typing import Optional, Tuple, List
 
 # ------------------------
@@ -19,6 +25,17 @@ PORT = int(os.environ.get("UVICORN_PORT", "8000"))
 # Permite definir explícitamente el módulo y atributo de la app: p.ej. "main:app"
 APP_SPEC = os.environ.get("LIA_APP_MODULE", "").strip()
 
+# Producción
+SERVER_MODE = os.environ.get("LIA_SERVER_MODE", "dev").strip().lower()
+WORKERS = int(os.environ.get("LIA_WORKERS", "0") or 0)   # 0 = 1 en dev, nº de CPUs en prod
+GRACEFUL_TIMEOUT_S = int(os.environ.get("LIA_GRACEFUL_TIMEOUT_S", "30"))
+KEEPALIVE_S = int(os.environ.get("LIA_KEEPALIVE_S", "5"))
+# Reciclado: tras N peticiones (+ jitter aleatorio para no reiniciar todos a la vez)
+# o si la memoria residente crece más de X MB sobre la inicial. 0 = desactivado.
+MAX_REQUESTS = int(os.environ.get("LIA_MAX_REQUESTS", "0") or 0)
+MAX_REQUESTS_JITTER = int(os.environ.get("LIA_MAX_REQUESTS_JITTER", "0") or 0)
+MAX_RSS_GROWTH_MB = float(os.environ.get("LIA_MAX_RSS_GROWTH_MB", "0") or 0)
+
 # ------------------------
 # Utilidades de logging simple (stdout)
 # ------------------------
@@ -189,19 +206,139 @@ def resolve_app():
     ] + errors
     raise RuntimeError("\n".join(msg_lines))
 
+_APP_ASSIGN = re.compile(r"^app\s*(?::[^=\n]*)?=", re.MULTILINE)
+
+
+def _defines_app(mod: str) -> bool:
+    """¿El módulo existe y asigna 'app' a nivel de módulo? Sin ejecutarlo."""
+    try:
+        spec = importlib.util.find_spec(mod)
+    except (ImportError, ValueError):
+        return False
+    if spec is None or not spec.origin or not os.path.isfile(spec.origin):
+        return False
+    try:
+        with open(spec.origin, "r", encoding="utf-8", errors="ignore") as fh:
+            return bool(_APP_ASSIGN.search(fh.read()))
+    except OSError:
+        return False
+
+
+def resolve_app_spec() -> Optional[str]:
+    """
+    'modulo:atributo' importable de la app. Los workers la importan por nombre;
+    el proceso maestro no la importa (ni carga modelos o índices antes de
+    arrancarlos): solo localiza el módulo. Si no hay spec, el llamador usa
+    resolve_app() y un solo proceso.
+    """
+    if APP_SPEC and parse_app_spec(APP_SPEC):
+        return APP_SPEC
+    for mod in ("main", "backend.main", "app.main", "src.main"):
+        if _defines_app(mod):
+            return f"{mod}:app"
+    return None
+
+# ------------------------
+# Reciclado de workers
+# ------------------------
+def _rss_mb() -> Optional[float]:
+    """Memoria residente actual del proceso (psutil, /proc o None)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class RecyclingApp:
+    """
+    Envuelve la app ASGI del worker. Al superar el límite de peticiones o de
+    crecimiento de memoria se envía SIGTERM a sí mismo: uvicorn deja de aceptar,
+    termina las peticiones en curso y el supervisor arranca un worker nuevo
+    (uvicorn >= 0.30 re-arranca los workers que terminan).
+    """
+
+    CHECK_EVERY = 64  # peticiones entre mediciones de memoria
+
+    def __init__(self, app, max_requests: int = 0, jitter: int = 0, max_growth_mb: float = 0.0):
+        self.app = app
+        self.limit = max_requests + (random.randint(0, jitter) if max_requests and jitter > 0 else 0)
+        self.max_growth_mb = max_growth_mb
+        self.count = 0
+        self.baseline: Optional[float] = None
+        self.recycling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not self.recycling:
+            self.count += 1
+            if self.limit and self.count >= self.limit:
+                self._recycle(f"{self.count} peticiones")
+            elif self.max_growth_mb and self.count % self.CHECK_EVERY == 0:
+                rss = _rss_mb()
+                if rss is not None:
+                    if self.baseline is None:
+                        self.baseline = rss   # tras calentar cachés y modelos
+                    elif rss - self.baseline > self.max_growth_mb:
+                        self._recycle(f"RSS {rss:.0f} MB (inicial {self.baseline:.0f} MB)")
+        await self.app(scope, receive, send)
+
+    def _recycle(self, why: str) -> None:
+        self.recycling = True
+        log(f"worker {os.getpid()}: reciclando tras {why}")
+        signal.raise_signal(signal.SIGTERM)
+
+
+def create_worker_app():
+    """Fábrica que uvicorn llama en cada worker (spawn): importa la app y la envuelve."""
+    normalize_environment()
+    app = import_from_spec(os.environ["LIA_APP_MODULE"])
+    if MAX_REQUESTS or MAX_RSS_GROWTH_MB:
+        return RecyclingApp(app, MAX_REQUESTS, MAX_REQUESTS_JITTER, MAX_RSS_GROWTH_MB)
+    return app
+
 # ------------------------
 # Punto de entrada
 # ------------------------
+def _fast_impls() -> Tuple[str, str]:
+    """(loop, http) de uvicorn: uvloop y httptools si están instalados."""
+    loop = "asyncio"
+    if sys.platform != "win32" and importlib.util.find_spec("uvloop") is not None:
+        loop = "uvloop"
+    http = "httptools" if importlib.util.find_spec("httptools") is not None else "h11"
+    return loop, http
+
+
+def run_production(uvicorn) -> None:
+    workers = WORKERS or (os.cpu_count() or 1)
+    spec = resolve_app_spec()
+    if spec is None:
+        log("Aviso: la app no es importable como 'modulo:app'; define LIA_APP_MODULE. Sigo con 1 proceso.")
+        workers = 1
+    loop, http = _fast_impls()
+    log(f"Producción: {workers} worker(s), loop={loop}, http={http}, app={spec or 'archivo suelto'}")
+    if MAX_REQUESTS or MAX_RSS_GROWTH_MB:
+        log(f"Reciclado: max_requests={MAX_REQUESTS}(+{MAX_REQUESTS_JITTER}) max_rss_growth={MAX_RSS_GROWTH_MB} MB")
+    kwargs = dict(host=HOST, port=PORT, reload=False, log_level="info", loop=loop, http=http,
+                  timeout_keep_alive=KEEPALIVE_S, timeout_graceful_shutdown=GRACEFUL_TIMEOUT_S,
+                  access_log=False)
+    if spec is None:
+        uvicorn.run(app=resolve_app(), **kwargs)
+        return
+    # los workers (spawn) heredan el entorno: ahí leen qué app importar
+    os.environ["LIA_APP_MODULE"] = spec
+    uvicorn.run("run_server:create_worker_app", factory=True, workers=workers, **kwargs)
+
+
 def main():
+    multiprocessing.freeze_support()  # PyInstaller + workers en Windows
     normalize_environment()
 
-    try:
-        app = resolve_app()
-    except RuntimeError as e:
-        # Mensaje claro y salir con código de error para que el lanzador lo vea en logs
-        log("ERROR:", str(e))
-        sys.exit(2)
-
     # Ejecutar uvicorn
     try:
         import uvicorn
@@ -210,6 +347,18 @@ def main():
         log("Activa el venv correcto y ejecuta:  pip install uvicorn fastapi")
         sys.exit(3)
 
+    try:
+        if SERVER_MODE == "prod" or WORKERS > 1:
+            # el maestro no importa la app: cada worker la carga por su cuenta
+            log(f"Iniciando Uvicorn (producción) en http://{HOST}:{PORT} ...")
+            run_production(uvicorn)
+            return
+        app = resolve_app()
+    except RuntimeError as e:
+        # Mensaje claro y salir con código de error para que el lanzador lo vea en logs
+        log("ERROR:", str(e))
+        sys.exit(2)
+
     log(f"Iniciando Uvicorn en http://{HOST}:{PORT} ...")
     uvicorn.run(app=app, host=HOST, port=PORT, reload=False, log_level="info")
 
@@ -0,0 +1,57 @@
+# backend/scheduler.py — reparto de la capacidad del LLM entre peticiones
+# - Límite global de llamadas concurrentes (LLM_BATCH_CONCURRENCY)
+# - Cola por prioridad: al liberarse un hueco entra la entrada de menor prioridad;
+#   a igual prioridad, orden de llegada
+# - Cancelar una espera no pierde el hueco (se cede al siguiente)
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+from contextlib import asynccontextmanager
+from typing import Any, List
+
+LLM_BATCH_CONCURRENCY = int(os.environ.get("LLM_BATCH_CONCURRENCY", "4"))
+
+
+class PriorityLimiter:
+    def __init__(self, limit: int = LLM_BATCH_CONCURRENCY):
+        self.limit = max(1, int(limit))
+        self.active = 0
+        self._heap: List[list] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: Any = 0) -> None:
+        if self.active < self.limit and not self._heap:
+            self.active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, [priority, next(self._seq), fut])
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # ya se nos había cedido el hueco: devolverlo
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._heap:
+            _, _, fut = heapq.heappop(self._heap)
+            if not fut.done():
+                fut.set_result(None)  # el hueco pasa directamente al siguiente
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: Any = 0):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def status(self) -> dict:
+        waiting = sum(1 for _, _, f in self._heap if not f.done())
+        return {"limit": self.limit, "active": self.active, "waiting": waiting}
@@ -0,0 +1,118 @@
+# backend/shared_state.py — estado en disco compartido entre workers
+# - file_lock: candado entre procesos (fcntl en POSIX, msvcrt en Windows)
+# - atomic_write_text: escribe a temporal y reemplaza (nadie lee a medias)
+# - MtimeCache: relee un archivo solo cuando cambió su mtime/tamaño (on_replace
+#   recibe el valor anterior: para cerrar mmaps/archivos que ya no se usan)
+# - Generación: contador en disco para invalidar cachés de todos los workers
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+try:
+    import fcntl  # POSIX
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Candado exclusivo sobre '<path>.lock' (bloqueante)."""
+    lock_path = Path(str(path) + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK reintenta ~10 s y luego falla
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write_text(path: Path, text: str, encoding: str = "utf-8") -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as fh:
+            fh.write(text)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+# sello de un archivo que no existe: mientras siga sin existir no se recarga
+_MISSING = (-1, -1)
+
+
+class MtimeCache:
+    """Valor derivado de un archivo; se recalcula cuando otro proceso lo reescribe."""
+
+    def __init__(self, path: Path, loader: Callable[[Path], Any],
+                 on_replace: Optional[Callable[[Any], None]] = None):
+        self.path = Path(path)
+        self.loader = loader
+        self.on_replace = on_replace
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._value: Any = None
+
+    def get(self) -> Any:
+        stamp = file_stamp(self.path) or _MISSING
+        with self._lock:
+            if stamp != self._stamp:
+                old, self._value = self._value, self.loader(self.path)
+                self._stamp = file_stamp(self.path) or _MISSING
+                if old is not None and old is not self._value and self.on_replace is not None:
+                    self.on_replace(old)
+            return self._value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stamp = None
+
+
+def read_generation(path: Path) -> int:
+    try:
+        return int(Path(path).read_text(encoding="ascii").strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_generation(path: Path) -> int:
+    """Incrementa el contador; los demás workers lo ven en su siguiente lectura."""
+    with file_lock(path):
+        gen = read_generation(path) + 1
+        atomic_write_text(path, str(gen), encoding="ascii")
+    return gen
@@ -0,0 +1,395 @@
+# backend/spell.py — ortografía local estilo SymSpell (borrado simétrico)
+# - Índice: por cada palabra del vocabulario, sus borrados (hasta MAX_EDIT, sobre
+#   los primeros PREFIX_LEN caracteres) -> ids de palabra. Consultar = generar
+#   los borrados de la palabra, buscarlos y verificar con distancia OSA
+# - Archivo compacto (tools/build_spell.py) abierto con mmap: nada se copia al
+#   arrancar y todos los workers comparten las páginas
+#     cabecera | offsets de palabras (u32) | frecuencias (u32) | palabras utf-8
+#     | hashes crc32 de borrados ordenados (u32) | offsets de postings (u32) | ids (u32)
+#     | hashes crc32 de palabras ordenados (u32) | ids (u32)   (¿palabra conocida? en O(log n))
+#   Una colisión de crc32 solo añade candidatos, que la verificación descarta.
+# - Las palabras del diccionario de usuario se tratan como conocidas y como
+#   candidatas (se comparan directamente: son pocas)
+# - Versiones: publish() escribe '<nombre>-<versión>.spell' y mueve el puntero
+#   '<path>.current' (como data/ds/CURRENT). Nunca se reemplaza un archivo que
+#   otro worker tenga mapeado (en Windows fallaría); el índice retirado se cierra
+#   cuando lo suelta la última consulta (acquire/release/retire)
+from __future__ import annotations
+
+import mmap
+import os
+from functools import lru_cache
+import re
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+try:
+    from .glossary import match_case
+    from .shared_state import atomic_write_text
+except ImportError:
+    from glossary import match_case
+    from shared_state import atomic_write_text
+
+MAGIC = b"LIASPL1\0"
+_HEADER = struct.Struct("<8sBBBxIIII")   # magic, max_edit, prefix_len, little_endian, n_words, n_deletes, n_postings, words_bytes
+MAX_EDIT = 2
+PREFIX_LEN = 7
+RULE_ID = "LOCAL_SPELLING"
+
+_WORD = re.compile(r"[^\W\d_]+", re.UNICODE)
+_HYPHEN_BREAK = re.compile(r"(\w)-\s*\n\s*(\w)")   # "emblemá-\nticas" (PDF)
+_SENT_END = re.compile(r"[.!?¡¿…:\n]\s*$")
+
+
+def _h(s: str) -> int:
+    return zlib.crc32(s.encode("utf-8"))
+
+
+def deletes(word: str, max_edit: int = MAX_EDIT, prefix_len: int = PREFIX_LEN) -> Set[str]:
+    """La palabra (recortada al prefijo) y todos sus borrados hasta max_edit."""
+    key = word[:prefix_len]
+    out = {key}
+    frontier = {key}
+    for _ in range(max_edit):
+        nxt = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                d = w[:i] + w[i + 1:]
+                if d not in out:
+                    nxt.add(d)
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def osa_distance(a: str, b: str, limit: int) -> int:
+    """Damerau-Levenshtein (optimal string alignment); limit + 1 si lo supera."""
+    if a == b:
+        return 0
+    # prefijo y sufijo comunes no cuentan: las erratas suelen dejar casi toda la palabra igual
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    j = 0
+    while j < n - i and a[-1 - j] == b[-1 - j]:
+        j += 1
+    a, b = a[i:len(a) - j], b[i:len(b) - j]
+    la, lb = len(a), len(b)
+    if abs(la - lb) > limit:
+        return limit + 1
+    if not la or not lb:
+        return la or lb
+    prev2 = None
+    prev = list(range(lb + 1))
+    for i in range(1, la + 1):
+        cur = [i] + [0] * lb
+        best = i
+        ca = a[i - 1]
+        for j in range(1, lb + 1):
+            v = prev[j - 1] if ca == b[j - 1] else prev[j - 1] + 1
+            if prev[j] + 1 < v:
+                v = prev[j] + 1
+            if cur[j - 1] + 1 < v:
+                v = cur[j - 1] + 1
+            if prev2 is not None and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1] and prev2[j - 2] + 1 < v:
+                v = prev2[j - 2] + 1
+            cur[j] = v
+            if v < best:
+                best = v
+        if best > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[lb] if prev[lb] <= limit else limit + 1
+
+
+# ---------------- construcción ----------------
+def count_words(paths: Iterable[Path]) -> Counter:
+    freq: Counter = Counter()
+    for p in paths:
+        text = _HYPHEN_BREAK.sub(r"\1\2", Path(p).read_text(encoding="utf-8", errors="ignore"))
+        freq.update(w.lower() for w in _WORD.findall(text))
+    return freq
+
+
+def build(freq: Counter, path: Path, min_count: int = 2, max_edit: int = MAX_EDIT,
+          prefix_len: int = PREFIX_LEN) -> Tuple[int, int]:
+    """Escribe el índice (tmp + replace). Devuelve (palabras, borrados distintos)."""
+    words = sorted(w for w, c in freq.items() if c >= min_count)
+    blob = bytearray()
+    offsets = array("I", [0])
+    freqs = array("I")
+    pairs = []   # (hash << 32) | id: se ordena como enteros, sin tuplas
+    for wid, w in enumerate(words):
+        blob += w.encode("utf-8")
+        offsets.append(len(blob))
+        freqs.append(min(freq[w], 0xFFFFFFFF))
+        for d in deletes(w, max_edit, prefix_len):
+            pairs.append((_h(d) << 32) | wid)
+    pairs.sort()
+    hashes = array("I")
+    post_off = array("I", [0])
+    postings = array("I")
+    last = None
+    for p in pairs:
+        h = p >> 32
+        if h != last:
+            if last is not None:
+                post_off.append(len(postings))
+            hashes.append(h)
+            last = h
+        postings.append(p & 0xFFFFFFFF)
+    post_off.append(len(postings))
+    by_hash = sorted((_h(w), wid) for wid, w in enumerate(words))
+    whash = array("I", (h for h, _ in by_hash))
+    wids = array("I", (wid for _, wid in by_hash))
+    if sys.byteorder != "little":
+        for arr in (offsets, freqs, hashes, post_off, postings, whash, wids):
+            arr.byteswap()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(_HEADER.pack(MAGIC, max_edit, prefix_len, 1, len(words), len(hashes), len(postings), len(blob)))
+        for arr in (offsets, freqs):
+            fh.write(arr.tobytes())
+        fh.write(bytes(blob))
+        fh.write(b"\0" * (-len(blob) % 4))   # alinea las tablas u32
+        for arr in (hashes, post_off, postings, whash, wids):
+            fh.write(arr.tobytes())
+    tmp.replace(path)
+    return len(words), len(hashes)
+
+
+def pointer_path(path: Path) -> Path:
+    return Path(str(path) + ".current")
+
+
+def read_pointer(pointer: Path) -> Optional[Path]:
+    """Versión a la que apunta el puntero (None si no existe o está vacío)."""
+    pointer = Path(pointer)
+    try:
+        name = pointer.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return pointer.parent / name if name else None
+
+
+def current_path(path: Path) -> Optional[Path]:
+    """Versión vigente según el puntero '<path>.current' (None si aún no se publicó)."""
+    return read_pointer(pointer_path(Path(path)))
+
+
+def publish(freq: Counter, path: Path, keep: int = 2, **kwargs) -> Tuple[Path, int, int]:
+    """Construye una versión nueva junto a path, mueve el puntero y borra las viejas
+    (salvo las 'keep' más recientes; las que sigan abiertas se borrarán la próxima vez)."""
+    path = Path(path)
+    stem = path.name[:-len(path.suffix)] if path.suffix else path.name
+    version = path.with_name(f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}{path.suffix}")
+    n_words, n_del = build(freq, version, **kwargs)
+    atomic_write_text(pointer_path(path), version.name)
+    old = sorted((p for p in path.parent.glob(f"{stem}-*{path.suffix}") if p != version),
+                 key=lambda p: p.stat().st_mtime, reverse=True)
+    for p in old[max(0, keep - 1):]:
+        try:
+            p.unlink()
+        except OSError:
+            pass
+    return version, n_words, n_del
+
+
+# ---------------- consulta ----------------
+class SpellIndex:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fh = self._mm = None
+        self._views: List[memoryview] = []
+        # palabras repetidas en un documento: la consulta se resuelve una vez
+        self._lookup_cached = lru_cache(maxsize=20000)(self._lookup)
+        self._state = threading.Lock()
+        self._users = 0
+        self._retired = False
+        self.closed = False
+        try:
+            self._fh = open(self.path, "rb")
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.max_edit, self.prefix_len, little, n_words, n_del, n_post, wbytes = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{self.path}: no es un índice ortográfico")
+            if bool(little) != (sys.byteorder == "little"):
+                raise ValueError(f"{self.path}: orden de bytes distinto al de esta máquina")
+            mv = memoryview(self._mm)
+            self._views.append(mv)
+            pos = _HEADER.size
+
+            def take(nbytes: int, fmt: Optional[str] = None) -> memoryview:
+                nonlocal pos
+                if pos + nbytes > len(self._mm):
+                    raise ValueError(f"{self.path}: índice ortográfico truncado")
+                view = mv[pos:pos + nbytes]
+                pos += nbytes
+                self._views.append(view)
+                if fmt:
+                    view = view.cast(fmt)
+                    self._views.append(view)
+                return view
+
+            self._offsets = take(4 * (n_words + 1), "I")
+            self._freqs = take(4 * n_words, "I")
+            self._blob = take(wbytes)
+            pos += -wbytes % 4
+            self._hashes = take(4 * n_del, "I")
+            self._post_off = take(4 * (n_del + 1), "I")
+            self._postings = take(4 * n_post, "I")
+            self._whash = take(4 * n_words, "I")
+            self._wids = take(4 * n_words, "I")
+            self.n_words = n_words
+        except BaseException:
+            self.close()   # no dejar archivo ni mapa abiertos (en Windows bloquean publish)
+            raise
+
+    def __len__(self) -> int:
+        return self.n_words
+
+    def word(self, wid: int) -> str:
+        return bytes(self._blob[self._offsets[wid]:self._offsets[wid + 1]]).decode("utf-8")
+
+    def _ids(self, key: str) -> Sequence[int]:
+        h = _h(key)
+        i = bisect_left(self._hashes, h)
+        if i == len(self._hashes) or self._hashes[i] != h:
+            return ()
+        return self._postings[self._post_off[i]:self._post_off[i + 1]]
+
+    def frequency(self, word: str) -> int:
+        """0 si no está en el vocabulario."""
+        w = word.lower()
+        h = _h(w)
+        i = bisect_left(self._whash, h)
+        while i < self.n_words and self._whash[i] == h:
+            wid = self._wids[i]
+            if self.word(wid) == w:
+                return self._freqs[wid]
+            i += 1
+        return 0
+
+    def lookup(self, word: str, max_edit: Optional[int] = None, top: int = 5,
+               extra: Iterable[str] = ()) -> List[Tuple[str, int, int]]:
+        """[(sugerencia, distancia, frecuencia)] por distancia y luego frecuencia."""
+        w = word.lower()
+        max_edit = self.max_edit if max_edit is None else min(max_edit, self.max_edit)
+        found = list(self._lookup_cached(w, max_edit, top))
+        if extra:
+            for cand in extra:   # diccionario de usuario
+                dist = osa_distance(w, cand.lower(), max_edit)
+                if dist <= max_edit:
+                    found.append((cand, dist, 0xFFFFFFFF))
+            found.sort(key=lambda t: (t[1], -t[2], t[0]))
+        return found[:top]
+
+    def _lookup(self, w: str, max_edit: int, top: int) -> Tuple[Tuple[str, int, int], ...]:
+        seen: Set[int] = set()
+        found = []
+        per_dist = [0] * (max_edit + 1)
+        limit = max_edit
+        # menos borrados primero: las sugerencias cercanas aparecen antes y
+        # permiten bajar el límite de distancia para el resto de candidatos
+        for d in sorted(deletes(w, max_edit, self.prefix_len), key=len, reverse=True):
+            if min(len(w), self.prefix_len) - len(d) > limit:
+                break
+            for wid in self._ids(d):
+                if wid in seen:
+                    continue
+                seen.add(wid)
+                cand = self.word(wid)
+                dist = osa_distance(w, cand, limit)
+                if dist > limit:
+                    continue
+                found.append((cand, dist, self._freqs[wid]))
+                per_dist[dist] += 1
+                # con 'top' sugerencias a distancia <= k ya no hace falta buscar más lejos
+                acc = 0
+                for k in range(limit + 1):
+                    acc += per_dist[k]
+                    if acc >= top:
+                        limit = k
+                        break
+        found = [f for f in found if f[1] <= limit]
+        found.sort(key=lambda t: (t[1], -t[2], t[0]))
+        return tuple(found[:top])
+
+    def check(self, text: str, user_words: Sequence[str] = (), top: int = 5) -> List[dict]:
+        """Palabras desconocidas como matches de LanguageTool (regla LOCAL_SPELLING)."""
+        user = {u.lower() for u in user_words}
+        out = []
+        for m in _WORD.finditer(text):
+            tok = m.group(0)
+            low = tok.lower()
+            if len(tok) < 2 or low in user or (len(tok) > 1 and tok.isupper()):
+                continue
+            # Mayúscula inicial a mitad de frase: probablemente nombre propio
+            if tok[0].isupper() and m.start() > 0 and not _SENT_END.search(text[max(0, m.start() - 3):m.start()]):
+                continue
+            if self.frequency(low):
+                continue
+            sugg = self.lookup(low, top=top, extra=user_words)
+            out.append({
+                "message": f"Posible error ortográfico: «{tok}».",
+                "shortMessage": "Ortografía",
+                "offset": m.start(),
+                "length": len(tok),
+                "replacements": [{"value": match_case(tok, s)} for s, _, _ in sugg],
+                "rule": {"id": RULE_ID, "description": "Palabra fuera del vocabulario",
+                         "issueType": "misspelling", "category": {"id": "TYPOS", "name": "Errores ortográficos"}},
+                "clientClass": "spelling",
+                "lt_clientClass": "spelling",
+            })
+        return out
+
+    # ---- ciclo de vida con varios hilos ----
+    def acquire(self) -> bool:
+        """Reserva el índice para una consulta; False si ya se retiró (pide el vigente)."""
+        with self._state:
+            if self._retired:
+                return False
+            self._users += 1
+            return True
+
+    def release(self) -> None:
+        with self._state:
+            self._users -= 1
+            last = self._retired and not self._users
+        if last:
+            self.close()
+
+    def retire(self) -> None:
+        """Hay una versión nueva: se cierra ya o al soltarlo la última consulta."""
+        with self._state:
+            self._retired = True
+            idle = not self._users
+        if idle:
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._lookup_cached.cache_clear()
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self._mm is not None:
+            self._mm.close()
+        if self._fh is not None:
+            self._fh.close()
@@ -0,0 +1,137 @@
+# backend/suggest_cache.py — caché persistente de sugerencias del LLM
+# - SQLite (WAL) en disco; sirve a varios procesos/workers a la vez
+# - Clave: párrafo normalizado + versión de plantilla + modelo + temperatura
+#   + ids de contexto recuperado
+# - Expulsión por tamaño total (LRU por último acceso)
+# - Un acierto no escribe: last_used se apunta en memoria y se vuelca en lote
+#   (cada _TOUCH_FLUSH aciertos, en cada inserción y antes de expulsar)
+# - stats() no toca SQLite (se llama desde el event loop en /health y /metrics):
+#   entradas y bytes se llevan en memoria y se recalculan de la tabla en cada
+#   revisión de tamaño, así que las inserciones de otros workers llegan con retraso
+# Las llamadas son bloqueantes: desde código async, vía run_in_threadpool.
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Optional, Sequence
+
+SUGGEST_CACHE_MAX_MB = float(os.environ.get("SUGGEST_CACHE_MAX_MB", "64"))
+_WS = re.compile(r"\s+")
+_CHECK_EVERY = 32   # inserciones entre recálculos del tamaño total
+_TOUCH_FLUSH = 64   # aciertos entre volcados de last_used
+
+
+def normalize_paragraph(text: str) -> str:
+    return _WS.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def cache_key(text: str, template: str, model: str, temperature: float,
+              context_ids: Sequence[str] = ()) -> str:
+    raw = json.dumps([normalize_paragraph(text), template, model, round(float(temperature), 3), list(context_ids)],
+                     ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SuggestionCache:
+    def __init__(self, path: Path, max_mb: float = SUGGEST_CACHE_MAX_MB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS suggestions ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_suggestions_last_used ON suggestions(last_used)")
+        self._db.commit()
+        self._inserts = 0
+        self._entries, self._bytes = self._count()
+        self._touched: dict = {}   # clave -> último acceso aún no escrito
+        self._pending_hits = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM suggestions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._touched[key] = time.time()
+            self._pending_hits += 1
+            if self._pending_hits >= _TOUCH_FLUSH:
+                self._flush_touched()
+                self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._db.executemany("UPDATE suggestions SET last_used = ? WHERE key = ?",
+                                 [(ts, k) for k, ts in self._touched.items()])
+            self._touched.clear()
+        self._pending_hits = 0
+
+    def put(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8")) + len(key)
+        now = time.time()
+        with self._lock:
+            self._touched.pop(key, None)
+            self._flush_touched()
+            old = self._db.execute("SELECT size FROM suggestions WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._entries -= 1
+                self._bytes -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO suggestions (key, value, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._entries += 1
+            self._bytes += size
+            self._inserts += 1
+            if self._inserts % _CHECK_EVERY == 0:
+                self._evict()
+            self._db.commit()
+
+    def _count(self) -> tuple:
+        n, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM suggestions").fetchone()
+        return int(n), int(total)
+
+    def _evict(self) -> None:
+        self._entries, self._bytes = self._count()   # incluye lo escrito por otros workers
+        total = self._bytes
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM suggestions ORDER BY last_used ASC"):
+            if total - freed <= target:
+                break
+            doomed.append((key,))
+            freed += size
+        self._db.executemany("DELETE FROM suggestions WHERE key = ?", doomed)
+        self._entries -= len(doomed)
+        self._bytes -= freed
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+
+    def stats(self) -> dict:
+        n, total = self._entries, self._bytes
+        lookups = self.hits + self.misses
+        return {"entries": n, "bytes": total, "max_bytes": self.max_bytes, "hits": self.hits,
+                "misses": self.misses, "hit_ratio": (self.hits / lookups) if lookups else 0.0}
@@ -0,0 +1,226 @@
+# backend/textdiff.py — diff por palabras/caracteres para prosa
+# - Myers O((N+M)·D) en espacio lineal (bisección por "middle snake")
+# - Sin recursión profunda: pila explícita, emite opcodes en orden (streaming)
+# - Atajo: construir la lista de cambios directamente desde los edits aplicados
+from __future__ import annotations
+
+import re
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+_WORD_TOKEN = re.compile(r"\w+|\s+|[^\w\s]", re.UNICODE)
+
+Opcode = Tuple[str, int, int, int, int]  # (tag, a0, a1, b0, b1) — tag: equal | insert | delete | replace
+
+
+def tokenize(text: str, granularity: str = "word") -> List[str]:
+    """Palabras, corridas de espacio y signos sueltos; 'char' devuelve caracteres."""
+    if granularity == "char":
+        return list(text)
+    return _WORD_TOKEN.findall(text)
+
+
+# =========================
+# Myers (espacio lineal)
+# =========================
+def _bisect(a: Sequence, b: Sequence, a0: int, a1: int, b0: int, b1: int) -> Optional[Tuple[int, int]]:
+    """Punto medio del camino de edición entre a[a0:a1] y b[b0:b1] (relativo a a0/b0)."""
+    n = a1 - a0
+    m = b1 - b0
+    max_d = (n + m + 1) // 2
+    v_offset = max_d
+    v_length = 2 * max_d + 2
+    v1 = [-1] * v_length
+    v2 = [-1] * v_length
+    v1[v_offset + 1] = 0
+    v2[v_offset + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+    for d in range(max_d):
+        # camino hacia adelante
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = v_offset + k1
+            if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                x1 = v1[k1_offset + 1]
+            else:
+                x1 = v1[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a0 + x1] == b[b0 + y1]:
+                x1 += 1
+                y1 += 1
+            v1[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = v_offset + delta - k1
+                if 0 <= k2_offset < v_length and v2[k2_offset] != -1:
+                    if x1 >= n - v2[k2_offset]:
+                        return x1, y1
+        # camino hacia atrás
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = v_offset + k2
+            if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                x2 = v2[k2_offset + 1]
+            else:
+                x2 = v2[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a1 - x2 - 1] == b[b1 - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            v2[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = v_offset + delta - k2
+                if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+                    x1 = v1[k1_offset]
+                    y1 = v_offset + x1 - k1_offset
+                    if x1 >= n - x2:
+                        return x1, y1
+    return None
+
+
+def _raw_opcodes(a: Sequence, b: Sequence) -> Iterator[Opcode]:
+    stack: list = [("range", 0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if item[0] == "op":
+            yield item[1]
+            continue
+        _, a0, a1, b0, b1 = item
+        # prefijo / sufijo común
+        p = 0
+        while a0 + p < a1 and b0 + p < b1 and a[a0 + p] == b[b0 + p]:
+            p += 1
+        if p:
+            yield ("equal", a0, a0 + p, b0, b0 + p)
+            a0 += p
+            b0 += p
+        s = 0
+        while a1 - s > a0 and b1 - s > b0 and a[a1 - s - 1] == b[b1 - s - 1]:
+            s += 1
+        if s:
+            stack.append(("op", ("equal", a1 - s, a1, b1 - s, b1)))
+            a1 -= s
+            b1 -= s
+        if a0 == a1 and b0 == b1:
+            continue
+        if a0 == a1:
+            yield ("insert", a0, a0, b0, b1)
+            continue
+        if b0 == b1:
+            yield ("delete", a0, a1, b0, b0)
+            continue
+        split = _bisect(a, b, a0, a1, b0, b1)
+        if split is None or split in ((0, 0), (a1 - a0, b1 - b0)):
+            yield ("replace", a0, a1, b0, b1)
+            continue
+        x, y = split
+        stack.append(("range", a0 + x, a1, b0 + y, b1))
+        stack.append(("range", a0, a0 + x, b0, b0 + y))
+
+
+def iter_opcodes(a: Sequence, b: Sequence) -> Iterator[Opcode]:
+    """Opcodes estilo difflib, fusionando inserciones/borrados contiguos en 'replace'."""
+    pend: Optional[list] = None  # [a0, a1, b0, b1] del bloque no-igual en curso
+    for tag, a0, a1, b0, b1 in _raw_opcodes(a, b):
+        if tag == "equal":
+            if pend is not None:
+                yield _tag_for(pend), pend[0], pend[1], pend[2], pend[3]
+                pend = None
+            if a1 > a0:
+                yield tag, a0, a1, b0, b1
+            continue
+        if pend is None:
+            pend = [a0, a1, b0, b1]
+        else:
+            pend[1] = a1
+            pend[3] = b1
+    if pend is not None:
+        yield _tag_for(pend), pend[0], pend[1], pend[2], pend[3]
+
+
+def _tag_for(p: list) -> str:
+    if p[0] == p[1]:
+        return "insert"
+    if p[2] == p[3]:
+        return "delete"
+    return "replace"
+
+
+# =========================
+# Listas de cambios
+# =========================
+def _change(op: str, offset: int, original: str, new_offset: int, replacement: str) -> dict:
+    return {
+        "op": op,
+        "offset": offset,
+        "length": len(original),
+        "original": original,
+        "new_offset": new_offset,
+        "replacement": replacement,
+    }
+
+
+def iter_changes(a: str, b: str, granularity: str = "word") -> Iterator[dict]:
+    """Cambios (offsets en caracteres) entre a y b, emitidos en orden."""
+    ta = tokenize(a, granularity)
+    tb = tokenize(b, granularity)
+    # offsets acumulados por token
+    pa = [0]
+    for t in ta:
+        pa.append(pa[-1] + len(t))
+    pb = [0]
+    for t in tb:
+        pb.append(pb[-1] + len(t))
+    for tag, a0, a1, b0, b1 in iter_opcodes(ta, tb):
+        if tag == "equal":
+            continue
+        yield _change(tag, pa[a0], a[pa[a0]:pa[a1]], pb[b0], b[pb[b0]:pb[b1]])
+
+
+def diff_changes(a: str, b: str, granularity: str = "word") -> List[dict]:
+    return list(iter_changes(a, b, granularity))
+
+
+def changes_from_edits(text: str, edits: Iterable[dict]) -> List[dict]:
+    """
+    Lista de cambios a partir de edits ya aplicados ({offset, length, replacement}),
+    sin volver a comparar los dos textos completos. Los edits se asumen sin solapes.
+    """
+    out: List[dict] = []
+    delta = 0
+    for e in sorted(edits, key=lambda e: int(e.get("offset", 0))):
+        off = int(e.get("offset", 0))
+        ln = int(e.get("length", 0))
+        repl = str(e.get("replacement", ""))
+        original = text[off:off + ln]
+        if original == repl:
+            continue
+        op = "insert" if ln == 0 else "delete" if not repl else "replace"
+        out.append(_change(op, off, original, off + delta, repl))
+        delta += len(repl) - ln
+    return out
+
+
+# =========================
+# Render (word-diff legible)
+# =========================
+def iter_render(changes: Iterable[dict], original: str, context: int = 30) -> Iterator[str]:
+    """Una línea por cambio: @@ offset @@ …contexto [-viejo-]{+nuevo+} contexto…"""
+    for c in changes:
+        off = int(c["offset"])
+        end = off + int(c["length"])
+        left = original[max(0, off - context):off].replace("\n", " ")
+        right = original[end:end + context].replace("\n", " ")
+        old = f"[-{c['original']}-]" if c.get("original") else ""
+        new = f"{{+{c['replacement']}+}}" if c.get("replacement") else ""
+        yield f"@@ {off} @@ {left}{old}{new}{right}\n"
+
+
+def render_word_diff(changes: Iterable[dict], original: str, context: int = 30) -> str:
+    return "".join(iter_render(changes, original, context))
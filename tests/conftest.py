@@ -0,0 +1,7 @@
+# tests/conftest.py — permite importar 'backend' desde la raíz del repositorio
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,112 @@
+# tests/test_admission.py — admisión y prioridad hacia LT (backend/admission.py)
+import threading
+import time
+
+import pytest
+
+from backend import admission
+from backend.admission import BULK, INTERACTIVE, AdmissionController, Overloaded
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.005)
+
+
+def test_interactive_overtakes_queued_bulk_under_load():
+    ctrl = AdmissionController(slots=1)
+    order = []
+    holder = ctrl.slot(BULK)
+    holder.__enter__()   # LT ocupado
+
+    def run(name, cls):
+        with ctrl.slot(cls):
+            order.append(name)
+            time.sleep(0.01)
+
+    bulks = [threading.Thread(target=run, args=(f"bulk{i}", BULK)) for i in range(5)]
+    for t in bulks:
+        t.start()
+    _wait_for(lambda: ctrl.status()["waiting"][BULK] == 5)
+    inter = threading.Thread(target=run, args=("inter", INTERACTIVE))
+    inter.start()
+    _wait_for(lambda: ctrl.status()["waiting"][INTERACTIVE] == 1)
+    holder.__exit__(None, None, None)
+    for t in bulks + [inter]:
+        t.join(5)
+    assert order[0] == "inter"
+    assert order[1:] == [f"bulk{i}" for i in range(5)]   # FIFO dentro de la clase
+
+
+def test_inflight_cap_keeps_threads_for_interactive(monkeypatch):
+    monkeypatch.setitem(admission.ADMIT_MAX_INFLIGHT, BULK, 2)
+    ctrl = AdmissionController(slots=1)
+    with ctrl.admit("a", BULK), ctrl.admit("b", BULK):
+        with pytest.raises(Overloaded) as exc:
+            with ctrl.admit("c", BULK):
+                pass
+        assert exc.value.retry_after >= 1
+        with ctrl.admit("c", INTERACTIVE):   # los interactive siguen entrando
+            assert ctrl.status()["inflight"] == {INTERACTIVE: 1, BULK: 2}
+    assert ctrl.status()["inflight"] == {INTERACTIVE: 0, BULK: 0}
+
+
+def test_per_client_limit_and_opt_out(monkeypatch):
+    monkeypatch.setitem(admission.ADMIT_PER_CLIENT, INTERACTIVE, 1)
+    ctrl = AdmissionController()
+    with ctrl.admit("x", INTERACTIVE):
+        with pytest.raises(Overloaded):
+            with ctrl.admit("x", INTERACTIVE):
+                pass
+        with ctrl.admit("y", INTERACTIVE):
+            pass
+    monkeypatch.setitem(admission.ADMIT_PER_CLIENT, INTERACTIVE, 0)   # 0 = sin límite por cliente
+    with ctrl.admit("x", INTERACTIVE), ctrl.admit("x", INTERACTIVE):
+        pass
+
+
+def test_full_queue_and_wait_timeout(monkeypatch):
+    monkeypatch.setitem(admission.ADMIT_MAX_QUEUE, BULK, 0)
+    ctrl = AdmissionController(slots=1)
+    with pytest.raises(Overloaded):
+        with ctrl.slot(BULK):
+            pass
+    monkeypatch.setitem(admission.ADMIT_MAX_QUEUE, BULK, 4)
+    monkeypatch.setitem(admission.ADMIT_MAX_WAIT_S, INTERACTIVE, 0.05)
+    with ctrl.slot(BULK):
+        with pytest.raises(Overloaded):
+            with ctrl.slot(INTERACTIVE):
+                pass
+    assert ctrl.status()["active"] == 0 and ctrl.status()["waiting"][INTERACTIVE] == 0
+
+
+def test_classify_and_shard_text():
+    assert admission.classify(10) == INTERACTIVE
+    assert admission.classify(10, BULK) == BULK
+    assert admission.classify(admission.ADMIT_BULK_CHARS + 1, INTERACTIVE) == BULK
+    text = ("Párrafo de prueba con varias palabras.\n\n" * 200)
+    shards = admission.shard_text(text, max_chars=500)
+    assert "".join(s for _, s in shards) == text
+    assert all(len(s) <= 500 for _, s in shards)
+    assert all(text[off:off + len(s)] == s for off, s in shards)
+    assert all(s.endswith("\n\n") for _, s in shards[:-1])
+
+
+def test_suggest_returns_429_instead_of_local_fallback(monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    def busy(*args, **kwargs):
+        raise Overloaded("Cola interactive llena", 3)
+
+    monkeypatch.setattr(main, "lt_check", busy)
+    with TestClient(main.app) as client:
+        r = client.post("/suggest", json={"text": "q tal  estas"})
+        assert r.status_code == 429
+        assert r.headers["retry-after"] == "3"
+        r = client.post("/apply/all", json={"text": "q tal"})
+        assert r.status_code == 429
@@ -0,0 +1,59 @@
+# tests/test_bm25.py — índice léxico BM25 (backend/bm25.py)
+import pytest
+
+from backend.bm25 import BM25Index, is_current, rrf_fuse, tokenize, write_index
+
+DOCS = [
+    "El pingüino emperador vive en la Antártida.",
+    "La acentuación de las palabras agudas sigue reglas claras.",
+    "Las palabras graves y esdrújulas: reglas de acentuación.",
+    "Receta de pan con masa madre.",
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "bm25.bin"
+    assert write_index(path, DOCS) == len(DOCS)
+    idx = BM25Index.open(path)
+    yield idx
+    idx.close()
+
+
+def test_tokenize_folds_accents_and_drops_stopwords():
+    assert tokenize("La ACENTUACIÓN de él") == ["acentuacion"]
+
+
+def test_search_ranks_matching_docs(index):
+    assert len(index) == len(DOCS)
+    hits = index.search("reglas de acentuación", k=4)
+    assert {d for d, _ in hits} == {1, 2}
+    assert index.search("pinguino")[0][0] == 0   # sin acento también encuentra
+    assert index.search("inexistente") == []
+
+
+def test_vocabulary_lookup_is_exact(index):
+    assert index.lookup("pan") is not None
+    assert index.lookup("pa") is None
+    assert index.lookup("zzz") is None
+    assert index.lookup("") is None
+
+
+def test_invalid_file_is_rejected_and_closed(tmp_path):
+    bad = tmp_path / "bm25.bin"
+    bad.write_bytes(b"LIABM251" + b"\x00" * 64)   # formato anterior
+    assert not is_current(bad)
+    assert BM25Index.open(bad) is None
+    bad.unlink()   # sin handles abiertos (en Windows fallaría)
+
+    trunc = tmp_path / "t.bin"
+    write_index(trunc, DOCS)
+    assert is_current(trunc)
+    trunc.write_bytes(trunc.read_bytes()[:60])
+    assert BM25Index.open(trunc) is None
+    assert BM25Index.open(tmp_path / "no.bin") is None
+
+
+def test_rrf_fuse_prefers_docs_in_both_rankings():
+    fused = rrf_fuse([[1, 2, 3], [3, 1, 4]], k=2)
+    assert [d for d, _ in fused] == [1, 3]
@@ -0,0 +1,108 @@
+# tests/test_compact.py — respuestas compactas (backend/compact.py) y compresión (backend/compression.py)
+import pytest
+
+from backend import compact, compression
+from backend.compact import compact_matches, parse_list, shape_analysis
+
+
+def _m(off, rule_id, reps, **extra):
+    return {"offset": off, "length": 3, "message": "m", "context": {"text": "..."}, "sentence": "s",
+            "clientClass": "grammar", "lt_clientClass": "grammar",
+            "rule": {"id": rule_id, "description": "d", "category": {"id": "GRAMMAR", "name": "Gramática"}},
+            "replacements": [{"value": r} for r in reps], **extra}
+
+
+RESP = {"ok": True, "text": "texto", "language": "es-MX", "stats": {"words": 1}, "readability": {},
+        "languageTool": {"matches": [_m(0, "A", ["x", "y"]), _m(5, "A", list("abcdefg")), _m(9, "B", [])],
+                         "source": "local"},
+        "analysisId": "abc", "counts": {"total": 3}}
+
+
+def test_compact_matches_interns_rules_and_limits_replacements():
+    cm, rules = compact_matches(RESP["languageTool"]["matches"], max_replacements=5)
+    assert [r["id"] for r in rules] == ["A", "B"]
+    assert [m["rule"] for m in cm] == [0, 0, 1]
+    assert cm[1]["replacements"] == list("abcde")
+    assert all("context" not in m and "lt_clientClass" not in m for m in cm)
+    assert compact_matches(RESP["languageTool"]["matches"], max_replacements=0)[0][1]["replacements"] == list("abcdefg")
+
+
+def test_fields_keep_analysis_id_and_counts():
+    out = shape_analysis(dict(RESP), fields=["stats"])
+    assert set(out) == {"ok", "language", "stats", "languageTool", "analysisId", "counts"}
+    assert out["languageTool"]["source"] == "local"
+
+
+def test_compact_mode_drops_text_and_keeps_markers():
+    out = shape_analysis(dict(RESP), compact=True, max_replacements=1)
+    assert "text" not in out
+    lt = out["languageTool"]
+    assert lt["format"] == compact.FORMAT and lt["maxReplacements"] == 1 and lt["source"] == "local"
+    assert lt["matches"][1]["replacements"] == ["a"]
+
+
+def test_parse_list():
+    assert parse_list(None) is None
+    assert parse_list("a, b,,") == ["a", "b"]
+    assert parse_list(["x", " "]) == ["x"]
+
+
+def test_negotiate():
+    assert compression.negotiate("gzip, deflate") == "gzip"
+    assert compression.negotiate("gzip;q=0") is None
+    assert compression.negotiate("identity") is None
+
+
+def test_middleware_compresses_large_json_only():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse, StreamingResponse
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    app.add_middleware(compression.CompressionMiddleware)
+    big = {"matches": [{"offset": i, "message": "posible error"} for i in range(500)]}
+
+    @app.get("/big")
+    def get_big():
+        return big
+
+    @app.get("/small")
+    def get_small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def get_stream():
+        return StreamingResponse(iter([b"a" * 2000, b"b" * 2000]), media_type="text/plain")
+
+    @app.get("/png")
+    def get_png():
+        return PlainTextResponse("x" * 5000, media_type="image/png")
+
+    with TestClient(app) as client:
+        h = {"accept-encoding": "gzip"}
+        r = client.get("/big", headers=h)
+        assert r.headers["content-encoding"] == "gzip" and r.headers["vary"] == "Accept-Encoding"
+        assert r.json() == big
+        assert int(r.headers["content-length"]) < len(r.content)   # httpx ya descomprimió
+        assert "content-encoding" not in client.get("/small", headers=h).headers
+        assert "content-encoding" not in client.get("/png", headers=h).headers
+        r = client.get("/stream", headers=h)
+        assert "content-encoding" not in r.headers and len(r.content) == 4000
+        assert "content-encoding" not in client.get("/big", headers={"accept-encoding": "identity"}).headers
+
+
+def test_analyze_text_store_with_fields_returns_counts(monkeypatch, tmp_path):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from backend import main, match_store
+
+    monkeypatch.setattr(main, "ANALYSES", match_store.AnalysisStore(tmp_path))
+    monkeypatch.setattr(main, "lt_check", lambda *a, **k: [_m(0, "A", ["Hola"])])
+    with TestClient(main.app) as client:
+        r = client.post("/analyze_text?store=1&fields=stats", json={"text": "hola mundo", "lang": "es-MX"})
+        body = r.json()
+        assert body["analysisId"] and body["counts"]["total"] >= 1
+        assert "readability" not in body and "stats" in body
@@ -0,0 +1,74 @@
+# tests/test_docx_stream.py — escritor DOCX en streaming (backend/docx_stream.py)
+import hashlib
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+from backend.docx_stream import build_docx, edits_from_matches, iter_docx
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _paragraphs(data: bytes):
+    """[(texto visible, [(tipo, texto) de cada cambio])] por párrafo."""
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        root = ET.fromstring(zf.read("word/document.xml"))
+    out = []
+    for p in root.iter(f"{W}p"):
+        visible, changes = [], []
+        for child in p:
+            if child.tag == f"{W}r":
+                visible.append("".join(t.text or "" for t in child.iter(f"{W}t")))
+            elif child.tag == f"{W}ins":
+                ins = "".join(t.text or "" for t in child.iter(f"{W}t"))
+                visible.append(ins)
+                changes.append(("ins", ins))
+            elif child.tag == f"{W}del":
+                changes.append(("del", "".join(t.text or "" for t in child.iter(f"{W}delText"))))
+        out.append(("".join(visible), changes))
+    return out
+
+
+def _match(off, ln, value):
+    return {"offset": off, "length": ln, "replacements": [{"value": value}]}
+
+
+def test_plain_paragraphs():
+    assert [t for t, _ in _paragraphs(build_docx("uno\ndos\n\ntres"))] == ["uno", "dos", "", "tres"]
+    assert [t for t, _ in _paragraphs(build_docx(""))] == [""]
+
+
+def test_crlf_input_leaves_no_carriage_returns():
+    text = "hola mundo\r\nsegunda linea\r\n\rfin"
+    edits = edits_from_matches(text, [_match(12, 7, "Segunda"), _match(28, 3, "final")])
+    paras = _paragraphs(build_docx(text, edits))
+    assert [t for t, _ in paras] == ["hola mundo", "Segunda linea", "", "final"]
+    assert paras[1][1] == [("del", "segunda"), ("ins", "Segunda")]
+    assert paras[3][1] == [("del", "fin"), ("ins", "final")]
+
+
+def test_edits_spanning_line_breaks_are_dropped():
+    text = "uno\r\ndos"
+    assert edits_from_matches(text, [_match(2, 3, "x"), _match(3, 1, ""), _match(3, 2, "")]) == []
+
+
+def test_zero_length_match_is_an_insertion():
+    text = "hola mundo"
+    edits = edits_from_matches(text, [_match(4, 0, ","), _match(10, 0, "."), _match(0, 0, "")])
+    assert edits == [(4, 0, ","), (10, 0, ".")]
+    (visible, changes), = _paragraphs(build_docx(text, edits))
+    assert visible == "hola, mundo."
+    assert changes == [("ins", ","), ("ins", ".")]
+
+
+def test_overlapping_matches_keep_the_first():
+    text = "el la casa"
+    edits = edits_from_matches(text, [_match(3, 2, "las"), _match(0, 5, "los"), _match(3, 0, "x")])
+    assert edits == [(0, 5, "los")]
+
+
+def test_streams_in_chunks():
+    text = "\n".join(hashlib.sha1(str(i).encode()).hexdigest() for i in range(3000))   # poco comprimible
+    chunks = list(iter_docx(text, chunk_size=8 * 1024))
+    assert len(chunks) > 1
+    assert len(_paragraphs(b"".join(chunks))) == 3000
@@ -0,0 +1,38 @@
+# tests/test_glossary_upload.py — POST /glossary/file (backend/main.py) en streaming
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.shared_state import MtimeCache
+
+GLOSSARY_YAML = "pairs:\n  ordenador: computer\n  teléfono móvil: cell phone\n"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = tmp_path / "glossary_es_en.yaml"
+    path.write_text(GLOSSARY_YAML, encoding="utf-8")
+    monkeypatch.setattr(main, "_GLOSSARY", MtimeCache(path, main._load_glossary))
+    return TestClient(main.app)
+
+
+def _upload(client, name: str, text: str):
+    return client.post("/glossary/file", files={"file": (name, text.encode("utf-8"), "text/plain")})
+
+
+def test_small_txt_is_substituted(client):
+    r = _upload(client, "capitulo.txt", "El Ordenador y el teléfono móvil.\n")
+    assert r.status_code == 200
+    assert r.text == "El Computer y el cell phone.\n"
+    assert 'filename="capitulo.glossary.txt"' in r.headers["content-disposition"]
+
+
+def test_upload_larger_than_spool_and_chunk(client):
+    # > 1 MB (la copia pasa a disco) y términos partidos entre trozos de 64 KB
+    line = "ORDENADOR, teléfono móvil: ñandú.\n"
+    r = _upload(client, "libro.txt", line * 40000)
+    assert r.status_code == 200
+    assert r.text == "COMPUTER, cell phone: ñandú.\n" * 40000
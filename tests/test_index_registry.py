@@ -0,0 +1,74 @@
+# tests/test_index_registry.py — almacén de fragmentos y registro de índices (modo BM25, sin FAISS)
+import json
+
+import pytest
+
+from backend.bm25 import write_index
+from backend.chunk_store import ChunkStore, chunk_text, store_paths, write_store
+from backend.index_registry import IndexRegistry, active_dir, set_active
+
+CHUNKS = ["Reglas de acentuación en español.", "Uso de la coma vocativa.", "", "ñandú y pingüino"]
+
+
+def _build(ds, sfx=""):
+    ds.mkdir(parents=True, exist_ok=True)
+    (ds / f"meta{sfx}.json").write_text(
+        json.dumps([{"source": "a.txt", "chunk_id": i} for i in range(len(CHUNKS))]), encoding="utf-8")
+    write_store(ds / f"chunks{sfx}", CHUNKS)
+    write_index(ds / f"bm25{sfx}.bin", CHUNKS)
+
+
+def test_chunk_store_roundtrip(tmp_path):
+    assert write_store(tmp_path / "chunks", CHUNKS) == len(CHUNKS)
+    store = ChunkStore.open(tmp_path / "chunks")
+    assert len(store) == len(CHUNKS)
+    assert [store.get(i) for i in range(len(store))] == CHUNKS
+    with pytest.raises(IndexError):
+        store.get(len(CHUNKS))
+    store.close()
+
+
+def test_chunk_store_rejects_invalid_files(tmp_path):
+    bin_path, idx_path = store_paths(tmp_path / "chunks")
+    assert ChunkStore.open(tmp_path / "chunks") is None
+    bin_path.write_bytes(b"texto")
+    idx_path.write_bytes(b"NOTCHUNK" + b"\0" * 24)
+    assert ChunkStore.open(tmp_path / "chunks") is None
+    idx_path.unlink()   # sin handles abiertos (en Windows fallaría)
+    bin_path.unlink()
+
+
+def test_chunk_text_respects_max_chars():
+    parts = chunk_text("Primera frase. " * 200, max_chars=100)
+    assert parts and all(len(p) <= 100 for p in parts)
+
+
+def test_registry_loads_bm25_without_faiss(tmp_path):
+    _build(tmp_path)
+    reg = IndexRegistry(tmp_path)
+    li = reg.get("es-MX", dense=False, lexical=True)
+    assert li is not None and li.index is None
+    doc, _ = li.bm25.search("acentuacion")[0]
+    assert li.chunks.get(doc) == CHUNKS[0]
+    assert reg.status()["default"]["bm25"]
+
+
+def test_retired_registry_closes_after_last_reader(tmp_path):
+    _build(tmp_path)
+    reg = IndexRegistry(tmp_path)
+    assert reg.acquire()
+    li = reg.get("es-MX", dense=False, lexical=True)
+    reg.retire()
+    assert not reg.closed and not reg.acquire()
+    assert li.bm25.search("coma")   # la consulta en curso sigue funcionando
+    reg.release()
+    assert reg.closed and li.bm25 is None and li.chunks is None
+    assert reg.status() == {}
+
+
+def test_current_pointer(tmp_path):
+    assert active_dir(tmp_path) == tmp_path
+    build = tmp_path / "builds" / "b1"
+    build.mkdir(parents=True)
+    set_active(tmp_path, build)
+    assert active_dir(tmp_path) == build
@@ -0,0 +1,65 @@
+# tests/test_llm.py — backends LLM y conmutación por fallo (backend/llm.py)
+import asyncio
+
+import httpx
+
+from backend.llm import LLMBackend
+
+
+def _backend(handler, urls=("http://a:1/v1", "http://b:2/v1")):
+    llm = LLMBackend(list(urls), "modelo")
+    llm._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    for ep in llm.endpoints:
+        ep.protocol = "openai"   # ya sondeado
+    return llm
+
+
+def _ok(text):
+    return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+
+def test_client_error_does_not_mark_endpoint_down():
+    def handler(request):
+        return httpx.Response(400, json={"error": "contexto demasiado largo"})
+
+    llm = _backend(handler)
+    ok, _, err = asyncio.run(llm.chat([{"role": "user", "content": "hola"}]))
+    assert not ok and "400" in err
+    assert all(s["healthy"] and s["failures"] == 0 and s["protocol"] for s in llm.status())
+
+
+def test_server_error_fails_over_and_marks_endpoint_down():
+    def handler(request):
+        if request.url.host == "a":
+            return httpx.Response(503)
+        return _ok("respuesta")
+
+    llm = _backend(handler)
+    ok, content, _ = asyncio.run(llm.chat([{"role": "user", "content": "hola"}]))
+    assert ok and content == "respuesta"
+    a, b = llm.status()
+    assert not a["healthy"] and a["failures"] == 1 and a["protocol"] is None
+    assert b["healthy"] and b["failures"] == 0
+
+
+def test_connection_error_marks_endpoint_down():
+    def handler(request):
+        raise httpx.ConnectError("rechazada", request=request)
+
+    llm = _backend(handler, urls=("http://a:1/v1",))
+    ok, _, _ = asyncio.run(llm.chat([{"role": "user", "content": "hola"}]))
+    assert not ok and not llm.status()[0]["healthy"]
+
+
+def test_stream_chat_yields_deltas():
+    body = "".join(f'data: {{"choices":[{{"delta":{{"content":"{t}"}}}}]}}\n\n' for t in ("Ho", "la")) + "data: [DONE]\n\n"
+
+    def handler(request):
+        return httpx.Response(200, text=body)
+
+    llm = _backend(handler, urls=("http://a:1/v1",))
+
+    async def collect():
+        return [d async for d in llm.stream_chat([{"role": "user", "content": "hola"}])]
+
+    assert asyncio.run(collect()) == ["Ho", "la"]
@@ -0,0 +1,76 @@
+# tests/test_match_merge.py — fusión de matches por intervalos (backend/match_merge.py)
+from backend.match_merge import merge
+
+PRECEDENCE = ("lt", "custom")
+
+
+def lt(offset, length, cls="grammar", reps=(), rule="LT_RULE"):
+    return {"offset": offset, "length": length, "clientClass": cls,
+            "rule": {"id": rule}, "replacements": [{"value": r} for r in reps]}
+
+
+def custom(offset, length, cls="grammar", reps=(), rule="CUSTOM_RULE"):
+    return {"offset": offset, "length": length, "clientClass": cls,
+            "rule": {"id": rule}, "replacements": [{"value": r} for r in reps]}
+
+
+def spans(matches):
+    return [(m["offset"], m["length"], m["rule"]["id"]) for m in matches]
+
+
+def test_exact_duplicates_keep_highest_precedence():
+    out = merge([custom(3, 4, rule="CUSTOM_A"), lt(3, 4, rule="LT_A")], PRECEDENCE, "same_class")
+    assert spans(out) == [(3, 4, "LT_A")]
+
+
+def test_exact_duplicates_union_replacements_winner_first():
+    a = lt(0, 5, reps=("uno", "dos"))
+    b = custom(0, 5, reps=("dos", "tres"))
+    out = merge([b, a], PRECEDENCE, "same_class")
+    assert [r["value"] for r in out[0]["replacements"]] == ["uno", "dos", "tres"]
+    assert [r["value"] for r in a["replacements"]] == ["uno", "dos"]   # la entrada no se toca
+
+
+def test_union_adopts_format_when_winner_has_no_replacements():
+    a = lt(0, 5)
+    b = {"offset": 0, "length": 5, "clientClass": "grammar", "rule": "CUSTOM_X", "replacements": ["x"]}
+    out = merge([a, b], PRECEDENCE, "same_class")
+    assert out[0]["replacements"] == ["x"]
+
+
+def test_nested_dropped_when_container_has_equal_or_higher_precedence():
+    out = merge([lt(0, 10), lt(2, 3), custom(4, 2)], PRECEDENCE, "same_class")
+    assert spans(out) == [(0, 10, "LT_RULE")]
+
+
+def test_nested_kept_when_container_has_lower_precedence():
+    out = merge([custom(0, 10), lt(2, 3)], PRECEDENCE, "same_class")
+    assert spans(out) == [(0, 10, "CUSTOM_RULE"), (2, 3, "LT_RULE")]
+
+
+def test_nested_inside_earlier_container_despite_wider_lower_precedence_match():
+    # LT [0,10), custom [1,20), LT [2,5): el último está dentro del primero
+    out = merge([lt(0, 10), custom(1, 19), lt(2, 3)], PRECEDENCE, "same_class")
+    assert spans(out) == [(0, 10, "LT_RULE"), (1, 19, "CUSTOM_RULE")]
+
+
+def test_nested_only_within_same_class():
+    out = merge([lt(0, 10, cls="grammar"), lt(2, 3, cls="spelling")], PRECEDENCE, "same_class")
+    assert len(out) == 2
+    out = merge([lt(0, 10, cls="grammar"), lt(2, 3, cls="spelling")], PRECEDENCE, "any")
+    assert spans(out) == [(0, 10, "LT_RULE")]
+
+
+def test_nested_none_keeps_everything_but_duplicates():
+    out = merge([lt(0, 10), lt(2, 3), custom(2, 3)], PRECEDENCE, "none")
+    assert spans(out) == [(0, 10, "LT_RULE"), (2, 3, "LT_RULE")]
+
+
+def test_overlapping_not_nested_are_kept_in_offset_order():
+    out = merge([lt(5, 10), lt(0, 8), custom(12, 5)], PRECEDENCE, "same_class")
+    assert spans(out) == [(0, 8, "LT_RULE"), (5, 10, "LT_RULE"), (12, 5, "CUSTOM_RULE")]
+
+
+def test_zero_length_matches_are_not_dropped_as_nested():
+    out = merge([lt(0, 10), lt(4, 0)], PRECEDENCE, "same_class")
+    assert len(out) == 2
@@ -0,0 +1,71 @@
+# tests/test_match_store.py — análisis guardados en el servidor (backend/match_store.py)
+import time
+
+from backend.match_store import AnalysisStore, MatchIndex
+
+
+def _m(off, ln, cls="grammar", rule="R", cat="GRAMMAR"):
+    return {"offset": off, "length": ln, "clientClass": cls, "rule": {"id": rule, "category": {"id": cat}}}
+
+
+MATCHES = [_m(50, 5), _m(0, 3, "spelling", "MORFOLOGIK", "TYPOS"), _m(10, 30), _m(20, 0, "punct", "COMMA", "PUNCTUATION")]
+
+
+def test_window_includes_overlapping_and_zero_length():
+    idx = MatchIndex(MATCHES)
+    assert [m["offset"] for m in idx.query(start=15, end=25)["matches"]] == [10, 20]
+    assert [m["offset"] for m in idx.query(start=40, end=60)["matches"]] == [50]
+    assert idx.query(start=3, end=10)["matches"] == []
+
+
+def test_filters_paging_and_counts():
+    idx = MatchIndex(MATCHES)
+    assert [m["offset"] for m in idx.query(client_class=["SPELLING", "punct"])["matches"]] == [0, 20]
+    page = idx.query(limit=2)
+    assert [m["offset"] for m in page["matches"]] == [0, 10]
+    rest = idx.query(limit=2, cursor=page["nextCursor"])
+    assert [m["offset"] for m in rest["matches"]] == [20, 50] and rest["nextCursor"] is None
+    counts = idx.counts(start=0, end=30)
+    assert counts["total"] == 3
+    assert counts["byClientClass"] == {"spelling": 1, "grammar": 1, "punct": 1}
+
+
+def test_put_writes_in_background_and_other_workers_read_it(tmp_path):
+    store = AnalysisStore(tmp_path)
+    aid, idx = store.put(MATCHES, {"language": "es-MX"})
+    assert store.get(aid) is idx   # de memoria, aunque aún no esté en disco
+    store.flush()
+    assert (tmp_path / f"{aid}.json").exists()
+    other = AnalysisStore(tmp_path)   # otro worker
+    assert [m["offset"] for m in other.get(aid).matches] == [0, 10, 20, 50]
+    assert other.get("../etc") is None and other.get("ffff") is None
+
+
+def test_delete_before_write_leaves_nothing(tmp_path):
+    store = AnalysisStore(tmp_path)
+    aid, _ = store.put(MATCHES, {})
+    assert store.delete(aid)
+    store.flush()
+    assert store.get(aid) is None
+    assert not (tmp_path / f"{aid}.json").exists()
+
+
+def test_put_drops_expired_entries_from_memory(tmp_path, monkeypatch):
+    store = AnalysisStore(tmp_path, ttl_s=60)
+    old, _ = store.put(MATCHES, {})
+    store.flush()
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    store.put([_m(0, 1)], {})
+    assert store.status()["in_memory"] == 1
+    assert store.status()["matches"] == 1
+    assert store.get(old) is None
+
+
+def test_eviction_by_total_matches_keeps_newest(tmp_path):
+    store = AnalysisStore(tmp_path, max_matches=5)
+    a, _ = store.put(MATCHES, {})
+    b, _ = store.put(MATCHES, {})
+    assert store.status()["in_memory"] == 1
+    store.flush()
+    assert store.get(a) is not None   # vuelve desde disco
@@ -0,0 +1,38 @@
+# tests/test_normalizer.py — normalizador local (backend/normalizer.py)
+from backend.normalizer import normalize
+
+
+def _apply(text, matches):
+    for m in sorted(matches, key=lambda m: m["offset"], reverse=True):
+        text = text[:m["offset"]] + m["replacements"][0]["value"] + text[m["offset"] + m["length"]:]
+    return text
+
+
+def test_matches_reproduce_normalized_text():
+    text = "  xq  no vienes , q si\npues  nada  \n"
+    out, matches = normalize(text, fillers=True)
+    assert _apply(text, matches) == out
+
+
+def test_sms_and_common_fixes_keep_case():
+    assert normalize("Xq no, KIEN sabe")[0] == "Porque no, QUIEN sabe"
+
+
+def test_single_letter_initial_is_not_sms():
+    assert normalize("D. Quijote y q tal")[0] == "D. Quijote y que tal"
+
+
+def test_leading_blanks_after_newline_are_removed():
+    out, matches = normalize("hola\n  adiós")
+    assert out == "hola\nadiós"
+    assert [m["rule"]["id"] for m in matches] == ["LOCAL_SPACING"]
+
+
+def test_lexical_off_only_fixes_spacing():
+    out, matches = normalize("xq  no ,vale", lexical=False)
+    assert out == "xq no,vale"
+    assert {m["rule"]["id"] for m in matches} == {"LOCAL_SPACING"}
+
+
+def test_lexical_rules_only_for_spanish():
+    assert normalize("q  tal", "en-US")[0] == "q tal"
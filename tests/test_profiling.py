@@ -0,0 +1,85 @@
+# tests/test_profiling.py — perfilado bajo demanda (backend/profiling.py) con peticiones reales
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import metrics, profiling
+from backend.fastjson import FastJSONResponse, fast_json
+
+TOKEN = "secreto"
+
+
+def _names(node):
+    yield node["name"]
+    for c in node.get("children", []):
+        yield from _names(c)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(profiling, "LIA_ADMIN_TOKEN", TOKEN)
+    app = FastAPI()
+    app.router.route_class = profiling.ProfiledRoute
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+    @app.get("/sync")
+    def sync_ep(n: int = 3):
+        with metrics.stage("trabajo"):
+            total = sum(range(n))
+        return {"total": total}
+
+    @app.get("/async")
+    async def async_ep():
+        with metrics.stage("espera"):
+            pass
+        return {"ok": True}
+
+    @app.get("/fast", response_class=FastJSONResponse)
+    def fast_ep():
+        return fast_json({"items": list(range(100))})
+
+    return TestClient(app)
+
+
+def _profiled(client, path):
+    return client.get(path, headers={"X-Lia-Profile": "1", "X-Admin-Token": TOKEN})
+
+
+def test_without_profile_header_response_is_untouched(client):
+    r = client.get("/sync", params={"n": 4})
+    assert r.json() == {"total": 6}
+    assert "server-timing" not in r.headers
+
+
+def test_wrong_token_is_ignored(client):
+    r = client.get("/sync", headers={"X-Lia-Profile": "1", "X-Admin-Token": "otro"})
+    assert "_profile" not in r.json()
+
+
+def test_sync_endpoint_tree_and_server_timing(client):
+    r = _profiled(client, "/sync?n=4")
+    body = r.json()
+    assert body["total"] == 6   # parámetros resueltos con la firma original
+    tree = body["_profile"]
+    assert tree["name"] == "GET /sync"
+    names = list(_names(tree))
+    assert "endpoint" in names and "trabajo" in names and "response" in names
+    endpoint = next(c for c in tree["children"] if c["name"] == "endpoint")
+    assert [c["name"] for c in endpoint["children"]] == ["trabajo"]
+    assert "endpoint;dur=" in r.headers["server-timing"]
+    assert int(r.headers["content-length"]) == len(r.content)
+
+
+def test_async_endpoint_is_profiled(client):
+    names = list(_names(_profiled(client, "/async").json()["_profile"]))
+    assert "endpoint" in names and "espera" in names
+
+
+def test_fast_json_renders_inside_serialize_stage(client):
+    body = _profiled(client, "/fast").json()
+    assert body["items"][-1] == 99
+    endpoint = next(c for c in body["_profile"]["children"] if c["name"] == "endpoint")
+    assert "serialize" in [c["name"] for c in endpoint["children"]]
@@ -0,0 +1,42 @@
+# tests/test_shared_state.py — estado compartido entre workers (backend/shared_state.py, run_server.py)
+import os
+import sys
+
+from backend import run_server
+from backend.shared_state import MtimeCache, atomic_write_text
+
+
+def test_mtime_cache_does_not_reload_missing_file(tmp_path):
+    calls = []
+
+    def load(path):
+        calls.append(path)
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    path = tmp_path / "dict.txt"
+    cache = MtimeCache(path, load)
+    assert cache.get() is None and cache.get() is None
+    assert len(calls) == 1   # "no existe" también queda en caché
+
+    atomic_write_text(path, "uno")
+    assert cache.get() == "uno" and cache.get() == "uno"
+    assert len(calls) == 2
+
+    atomic_write_text(path, "dos y tres")
+    assert cache.get() == "dos y tres"
+    os.remove(path)
+    assert cache.get() is None and cache.get() is None
+    assert len(calls) == 4
+
+
+def test_app_spec_is_found_without_importing(tmp_path, monkeypatch):
+    (tmp_path / "lia_fake_app.py").write_text("raise RuntimeError('no importar')\napp = None\n", encoding="utf-8")
+    (tmp_path / "lia_no_app.py").write_text("application = None\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    assert run_server._defines_app("lia_fake_app")
+    assert not run_server._defines_app("lia_no_app")
+    assert not run_server._defines_app("lia_inexistente")
+    assert "lia_fake_app" not in sys.modules
+
+    monkeypatch.setattr(run_server, "APP_SPEC", "")
+    assert run_server.resolve_app_spec() in ("main:app", "backend.main:app")
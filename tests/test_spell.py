@@ -0,0 +1,89 @@
+# tests/test_spell.py — ortografía local (backend/spell.py) y su uso en /analyze_text
+from collections import Counter
+
+import pytest
+
+from backend.shared_state import MtimeCache
+from backend.spell import SpellIndex, current_path, osa_distance, pointer_path, publish, read_pointer
+
+FREQ = Counter({"casa": 50, "cosa": 20, "caso": 10, "perro": 30, "rápido": 5, "raro": 1})
+
+
+@pytest.fixture
+def index(tmp_path):
+    version, n_words, _ = publish(FREQ, tmp_path / "es.spell", min_count=2)
+    assert n_words == 5 and current_path(tmp_path / "es.spell") == version
+    idx = SpellIndex(version)
+    yield idx
+    idx.close()
+
+
+def test_osa_distance_counts_transpositions():
+    assert osa_distance("casa", "csaa", 2) == 1
+    assert osa_distance("perro", "pero", 2) == 1
+    assert osa_distance("casa", "perro", 2) == 3   # limit + 1
+
+
+def test_lookup_and_frequency(index):
+    assert index.frequency("Casa") == 50
+    assert index.frequency("raro") == 0   # por debajo de min_count
+    assert [s for s, _, _ in index.lookup("csa", top=3)][:1] == ["casa"]
+    assert index.lookup("perr")[0][:2] == ("perro", 1)
+    assert index.lookup("casota", extra=["casita"])[0] == ("casita", 1, 0xFFFFFFFF)
+
+
+def test_check_flags_unknown_words_only(index):
+    matches = index.check("La csa del perro es rapido. En Madrid", user_words=["la", "del", "es", "en"])
+    flagged = {m["offset"]: m for m in matches}
+    assert set(flagged) == {3, 20}   # "csa", "rapido"; "Madrid" es nombre propio
+    assert flagged[20]["replacements"][0]["value"] == "rápido"
+    assert flagged[3]["rule"]["id"] == "LOCAL_SPELLING"
+
+
+def test_invalid_file_is_closed(tmp_path):
+    bad = tmp_path / "bad.spell"
+    bad.write_bytes(b"NOTSPELL" + b"\0" * 64)
+    with pytest.raises(ValueError):
+        SpellIndex(bad)
+    bad.unlink()   # sin handles abiertos (en Windows fallaría)
+    version, _, _ = publish(FREQ, tmp_path / "es.spell")
+    trunc = tmp_path / "trunc.spell"
+    trunc.write_bytes(version.read_bytes()[:40])
+    with pytest.raises(ValueError):
+        SpellIndex(trunc)
+    trunc.unlink()
+
+
+def test_retired_index_closes_after_last_release(index):
+    assert index.acquire()
+    index.retire()
+    assert not index.closed and not index.acquire()
+    index.release()
+    assert index.closed
+
+
+def test_read_pointer(tmp_path):
+    pointer = pointer_path(tmp_path / "es.spell")
+    assert read_pointer(pointer) is None
+    pointer.write_text("es-1.spell\n", encoding="utf-8")
+    assert read_pointer(pointer) == tmp_path / "es-1.spell"
+
+
+def test_spelling_only_reports_missing_index(tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    monkeypatch.setattr(main, "_SPELL", MtimeCache(pointer_path(tmp_path / "es.spell"), main._open_spell))
+    monkeypatch.setattr(main, "lt_check", lambda *a, **k: [])
+    monkeypatch.setattr(main, "dict_list", lambda lang: [])
+    with TestClient(main.app) as client:
+        body = {"text": "casa csa", "lang": "es-MX", "spelling_only": True}
+        lt = client.post("/analyze_text", json=body).json()["languageTool"]
+        assert lt["spellingOnly"] == "unavailable" and "source" not in lt
+
+        publish(FREQ, tmp_path / "es.spell")
+        lt = client.post("/analyze_text", json=body).json()["languageTool"]
+        assert "spellingOnly" not in lt and lt["source"] == "local"
+        assert [m["offset"] for m in lt["matches"]] == [5]
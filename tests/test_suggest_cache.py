@@ -0,0 +1,37 @@
+# tests/test_suggest_cache.py — caché SQLite de sugerencias (backend/suggest_cache.py)
+from backend import suggest_cache
+from backend.suggest_cache import SuggestionCache, cache_key
+
+
+def test_key_ignores_whitespace_but_not_template():
+    a = cache_key("Hola   mundo\n", "suggest-v1", "m", 0.2)
+    assert a == cache_key(" Hola mundo", "suggest-v1", "m", 0.2)
+    assert a != cache_key("Hola mundo", "suggest-v2", "m", 0.2)
+    assert a != cache_key("Hola mundo", "suggest-v1", "m", 0.2, ["ctx1"])
+
+
+def test_get_put_and_in_memory_stats(tmp_path):
+    c = SuggestionCache(tmp_path / "s.sqlite")
+    assert c.get("k") is None
+    c.put("k", "valor")
+    c.put("k", "otro valor")   # reemplazo: no cuenta dos veces
+    assert c.get("k") == "otro valor"
+    st = c.stats()
+    assert st["entries"] == 1
+    assert st["bytes"] == len("otro valor") + len("k")
+    assert (st["hits"], st["misses"]) == (1, 1)
+    c.flush()
+    assert SuggestionCache(tmp_path / "s.sqlite").stats()["entries"] == 1   # recuento al abrir
+
+
+def test_eviction_by_size_keeps_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(suggest_cache, "_CHECK_EVERY", 1)
+    c = SuggestionCache(tmp_path / "s.sqlite", max_mb=1000 / (1024 * 1024))
+    c.put("viejo", "x" * 300)
+    c.put("usado", "y" * 300)
+    c.get("usado")
+    c.put("nuevo", "z" * 300)
+    c.put("otro", "w" * 300)
+    assert c.get("viejo") is None
+    assert c.get("otro") is not None
+    assert c.stats()["bytes"] <= 1000
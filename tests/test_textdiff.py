@@ -0,0 +1,81 @@
+# tests/test_textdiff.py — diff por palabras/caracteres (backend/textdiff.py)
+import random
+
+from backend.textdiff import (changes_from_edits, diff_changes, iter_opcodes, render_word_diff,
+                              tokenize)
+
+
+def _apply(a: str, changes) -> str:
+    out, pos = [], 0
+    for c in changes:
+        out.append(a[pos:c["offset"]])
+        out.append(c["replacement"])
+        pos = c["offset"] + c["length"]
+    out.append(a[pos:])
+    return "".join(out)
+
+
+def test_tokenize_words_spaces_and_punctuation():
+    assert tokenize("Hola,  mundo!") == ["Hola", ",", "  ", "mundo", "!"]
+    assert tokenize("ab", "char") == ["a", "b"]
+
+
+def test_word_changes():
+    a = "El perro come rapido la comida."
+    b = "El gato come rápido la comida"
+    changes = diff_changes(a, b)
+    assert [(c["original"], c["replacement"]) for c in changes] == [("perro", "gato"), ("rapido", "rápido"), (".", "")]
+    assert [c["op"] for c in changes] == ["replace", "replace", "delete"]
+    assert _apply(a, changes) == b
+    assert changes[1]["new_offset"] == b.index("rápido")
+
+
+def test_opcodes_cover_both_sequences_and_are_minimal_enough():
+    rng = random.Random(7)
+    alphabet = "abcde"
+    for _ in range(200):
+        a = [rng.choice(alphabet) for _ in range(rng.randint(0, 40))]
+        b = [rng.choice(alphabet) for _ in range(rng.randint(0, 40))]
+        ops = list(iter_opcodes(a, b))
+        ia = ib = 0
+        edits = 0
+        for tag, a0, a1, b0, b1 in ops:
+            assert (a0, b0) == (ia, ib)
+            if tag == "equal":
+                assert a[a0:a1] == b[b0:b1]
+            else:
+                edits += (a1 - a0) + (b1 - b0)
+            ia, ib = a1, b1
+        assert (ia, ib) == (len(a), len(b))
+        # Myers: distancia de edición mínima (solo inserciones/borrados)
+        lcs = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+        for i in range(len(a) - 1, -1, -1):
+            for j in range(len(b) - 1, -1, -1):
+                lcs[i][j] = lcs[i + 1][j + 1] + 1 if a[i] == b[j] else max(lcs[i + 1][j], lcs[i][j + 1])
+        assert edits == len(a) + len(b) - 2 * lcs[0][0]
+
+
+def test_random_text_roundtrip():
+    rng = random.Random(11)
+    words = ["casa", "perro", " ", ", ", ".", "él", "niño", "\n"]
+    for _ in range(100):
+        a = "".join(rng.choice(words) for _ in range(rng.randint(0, 30)))
+        b = "".join(rng.choice(words) for _ in range(rng.randint(0, 30)))
+        assert _apply(a, diff_changes(a, b)) == b
+        assert _apply(a, diff_changes(a, b, granularity="char")) == b
+
+
+def test_changes_from_edits_matches_applied_text():
+    text = "q tal  estas"
+    edits = [{"offset": 7, "length": 5, "replacement": "estás"}, {"offset": 0, "length": 1, "replacement": "Qué"},
+             {"offset": 5, "length": 1, "replacement": ""}, {"offset": 2, "length": 0, "replacement": ""}]
+    changes = changes_from_edits(text, edits)
+    assert [c["op"] for c in changes] == ["replace", "delete", "replace"]
+    assert _apply(text, changes) == "Qué tal estás"
+    assert changes[2]["new_offset"] == "Qué tal estás".index("estás")
+
+
+def test_render():
+    a = "hola mundo"
+    out = render_word_diff(diff_changes(a, "hola gente"), a, context=5)
+    assert out == "@@ 5 @@ hola [-mundo-]{+gente+}\n"
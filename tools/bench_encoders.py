@@ -0,0 +1,81 @@
+# tools/bench_encoders.py — compara backends del codificador de consultas
+# Latencia por consulta (p50/p95) y solapamiento top-k contra el backend torch.
+#   python tools/bench_encoders.py --backends torch torch-int8 onnx onnx-int8 --n 200 --k 4
+from pathlib import Path
+import argparse, random, statistics, sys, time
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
+from backend.encoders import BACKENDS, CachedEncoder, load_model
+from backend.index_registry import IndexRegistry, active_dir
+
+DS = active_dir(BASE / "data" / "ds")
+EMB_MODEL = "distiluse-base-multilingual-cased-v2"
+
+def _queries(li, n: int, seed: int, path: str | None) -> list[str]:
+    if path:
+        lines = [l.strip() for l in Path(path).read_text(encoding="utf-8").splitlines() if l.strip()]
+        return lines[:n]
+    if li.chunks is None:
+        raise SystemExit("El índice no tiene almacén de fragmentos; usa --queries archivo.txt")
+    rnd = random.Random(seed)
+    ids = rnd.sample(range(len(li.chunks)), min(n, len(li.chunks)))
+    # fragmento de ~12 palabras de cada chunk, como consulta tipo párrafo corto
+    out = []
+    for i in ids:
+        words = li.chunks.get(i).split()
+        start = rnd.randrange(0, max(1, len(words) - 12))
+        out.append(" ".join(words[start:start + 12]))
+    return out
+
+def _pct(xs: list[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p * (len(xs) - 1))))]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compara backends del codificador de consultas (latencia y solapamiento top-k)")
+    ap.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    ap.add_argument("--lang", default="es-MX")
+    ap.add_argument("--n", type=int, default=200, help="número de consultas")
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--seed", type=int, default=13)
+    ap.add_argument("--queries", help="archivo con una consulta por línea")
+    ap.add_argument("--model", default=EMB_MODEL)
+    args = ap.parse_args(argv)
+
+    li = IndexRegistry(DS).get(args.lang)
+    if li is None:
+        raise SystemExit("No hay índice FAISS en data/ds; ejecuta tools/build_index.py")
+    queries = _queries(li, args.n, args.seed, args.queries)
+
+    baseline: list[set] | None = None
+    rows = []
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        t0 = time.perf_counter()
+        model, effective = load_model(args.model, backend)
+        load_s = time.perf_counter() - t0
+        if effective != backend:
+            print(f"[SKIP] {backend}: no disponible")
+            continue
+        enc = CachedEncoder(model, max_items=0, backend=backend)  # sin caché: latencia real
+        enc.encode_queries(queries[:3])  # calentamiento
+        lat = []
+        tops: list[set] = []
+        for q in queries:
+            t = time.perf_counter()
+            qv = enc.encode_queries([q])
+            lat.append((time.perf_counter() - t) * 1000)
+            _, I = li.index.search(qv, args.k)
+            tops.append({int(i) for i in I[0] if i != -1})
+        if baseline is None:
+            baseline = tops
+        overlap = statistics.mean(len(a & b) / max(1, len(b)) for a, b in zip(tops, baseline))
+        rows.append((backend, load_s, statistics.mean(lat), _pct(lat, 0.5), _pct(lat, 0.95), overlap))
+
+    print(f"\n{len(queries)} consultas, k={args.k}, índice={li.suffix or 'default'}")
+    print(f"{'backend':<12}{'carga s':>9}{'media ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'top-k ∩':>9}")
+    for b, load_s, mean, p50, p95, ov in rows:
+        print(f"{b:<12}{load_s:>9.1f}{mean:>10.2f}{p50:>9.2f}{p95:>9.2f}{ov:>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# tools/bench_json.py — tiempo de serialización de una respuesta de análisis grande
+# Compara la ruta por defecto de FastAPI (jsonable_encoder + json.dumps) con
+# json directo, orjson y msgspec sobre la misma respuesta sintética.
+#   python tools/bench_json.py --matches 20000 --repeat 5
+from pathlib import Path
+import argparse, json, statistics, sys, time
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
+sys.path.insert(0, str(BASE / "tools"))
+from bench_payload import synth
+
+def _stdlib(obj) -> bytes:
+    # lo que hace starlette.responses.JSONResponse.render
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def candidates() -> dict:
+    out = {}
+    try:
+        from fastapi.encoders import jsonable_encoder
+        out["fastapi (jsonable_encoder + json)"] = lambda o: _stdlib(jsonable_encoder(o))
+    except ImportError:
+        pass
+    out["json (stdlib)"] = _stdlib
+    try:
+        import orjson
+        out["orjson"] = orjson.dumps
+    except ImportError:
+        pass
+    try:
+        import msgspec
+        out["msgspec"] = msgspec.json.Encoder().encode
+    except ImportError:
+        pass
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--matches", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    doc = synth(args.matches, 80, 7)
+    print(f"{args.matches} matches")
+    print(f"{'codificador':<36}{'mediana ms':>12}{'mín ms':>10}{'MB':>8}")
+    base = None
+    for name, fn in candidates().items():
+        times = []
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            raw = fn(doc)
+            times.append((time.perf_counter() - t) * 1000)
+        med = statistics.median(times)
+        base = base or med
+        print(f"{name:<36}{med:>12.1f}{min(times):>10.1f}{len(raw) / 1e6:>8.2f}   x{base / med:.1f}")
+    try:
+        from backend.fastjson import ENCODER
+        print(f"\nbackend.fastjson usará: {ENCODER}")
+    except ImportError:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# tools/bench_payload.py — tamaño de la respuesta de /analyze_text por modo
+# Genera matches con la forma de LanguageTool (context, sentence, rule completa)
+# y compara completo vs compacto, sin comprimir / gzip / br.
+#   python tools/bench_payload.py --matches 20000 --rules 80
+from pathlib import Path
+import argparse, gzip, json, random, sys, time
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
+from backend.compact import shape_analysis
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+WORDS = ("sin embargo", "dijo", "solo", "entonces", "mientras", "quizás", "aquella", "noche",
+         "camino", "silencio", "había", "hubieron", "porque", "por qué", "más", "aún")
+
+def _rule(i: int) -> dict:
+    cat = random.choice([("TYPOS", "Errores ortográficos"), ("GRAMMAR", "Gramática"),
+                         ("PUNCTUATION", "Puntuación"), ("STYLE", "Estilo")])
+    return {"id": f"RULE_{i:03d}", "subId": "1", "description": f"Descripción de la regla {i}",
+            "issueType": random.choice(["misspelling", "grammar", "style", "typographical"]),
+            "urls": [{"value": f"https://languagetool.org/rules/{i}"}],
+            "category": {"id": cat[0], "name": cat[1]}, "isPremium": False}
+
+def synth(n_matches: int, n_rules: int, seed: int) -> dict:
+    random.seed(seed)
+    rules = [_rule(i) for i in range(n_rules)]
+    text_len = n_matches * 60
+    matches = []
+    for k in range(n_matches):
+        off = k * 60 + random.randrange(0, 40)
+        w = random.choice(WORDS)
+        sentence = " ".join(random.choice(WORDS) for _ in range(18))
+        matches.append({
+            "message": f"Posible error: «{w}».", "shortMessage": "Revisión",
+            "replacements": [{"value": random.choice(WORDS)} for _ in range(random.randint(1, 8))],
+            "offset": off, "length": len(w),
+            "context": {"text": "…" + sentence[:70] + "…", "offset": 20, "length": len(w)},
+            "sentence": sentence, "type": {"typeName": "Other"},
+            "rule": random.choice(rules), "ignoreForIncompleteSentence": False,
+            "contextForSureMatch": 0, "clientClass": "grammar", "lt_clientClass": "grammar",
+        })
+    return {"ok": True, "text": "x" * text_len, "language": "es-MX",
+            "stats": {"words": text_len // 6, "sentences": n_matches, "long_sentences": 3, "dialog_marks": 10},
+            "readability": {"flesch_en_reference": 61.2, "syllables": text_len // 3},
+            "languageTool": {"matches": matches}}
+
+def _sizes(raw: bytes) -> list[tuple[str, int, float]]:
+    out = [("identity", len(raw), 0.0)]
+    t = time.perf_counter(); gz = gzip.compress(raw, 6); out.append(("gzip", len(gz), time.perf_counter() - t))
+    if brotli is not None:
+        t = time.perf_counter(); br = brotli.compress(raw, quality=5); out.append(("br", len(br), time.perf_counter() - t))
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Tamaño de la respuesta de /analyze_text: completo vs compacto, sin comprimir / gzip / br")
+    ap.add_argument("--matches", type=int, default=20000)
+    ap.add_argument("--rules", type=int, default=80)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    full = synth(args.matches, args.rules, args.seed)
+    modes = {
+        "completo": full,
+        "sin texto/context/sentence": shape_analysis(dict(full), fields=["stats", "readability"],
+                                                     omit=["context", "sentence"]),
+        "compacto": shape_analysis(dict(full), compact=True),
+        "compacto, solo matches": shape_analysis(dict(full), fields=[], compact=True),
+    }
+    base = None
+    print(f"{args.matches} matches, {args.rules} reglas distintas" + ("" if brotli else "  (sin 'brotli': br omitido)"))
+    print(f"{'modo':<30}{'codificación':<14}{'bytes':>12}{'vs completo':>13}{'comprimir ms':>14}")
+    for name, doc in modes.items():
+        raw = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+        for enc, size, secs in _sizes(raw):
+            if base is None:
+                base = size
+            print(f"{name:<30}{enc:<14}{size:>12,}{size / base:>12.1%}{secs * 1000:>14.1f}")
+
+if __name__ == "__main__":
+    main()
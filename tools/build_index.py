@@ -1,54 +1,185 @@
 # tools/build_index.py — construye índices FAISS por idioma
+# Incremental: hash por archivo (manifest), caché de embeddings por hash de
+# fragmento; solo se codifican fragmentos nuevos/cambiados y todo se escribe
+# de forma atómica (tmp + os.replace).
 from pathlib import Path
-import json, re
+import argparse, hashlib, json, os, sys
 import faiss
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
 BASE = Path(__file__).resolve().parents[1]
-DS   = BASE / "data" / "ds"
+sys.path.insert(0, str(BASE))
+from backend.bm25 import is_current as bm25_current, write_index as write_bm25
+from backend.chunk_store import chunk_text, store_paths, write_store
+from backend.index_registry import active_dir
+
+DS   = active_dir(BASE / "data" / "ds")   # --out permite construir en un directorio de staging
 CORPORA = {
     "es-419": BASE / "data" / "corpus_txt_es_419",
     "es-MX":  BASE / "data" / "corpus_txt_es_mx",
     "en-US":  BASE / "data" / "corpus_txt_en_us",
+    "default": BASE / "data" / "corpus_txt",   # faiss.index / meta.json que usa app.py
 }
-EMB_MODEL = "distiluse-base-multilingual-cased-v2"
+# sufijo de archivos por idioma: faiss{sfx}.index, meta{sfx}.json, chunks{sfx}.bin/.idx, bm25{sfx}.bin
+SUFFIX = {"es-419": "_es_419", "es-MX": "_es_mx", "en-US": "_en_us", "default": ""}
+EMB_MODEL = os.environ.get("EMB_MODEL", "distiluse-base-multilingual-cased-v2")
+EMB_BATCH = int(os.environ.get("EMB_BATCH", "64"))
+# flat | ivf | ivf_sq8 | hnsw | auto (flat hasta INDEX_AUTO_THRESHOLD vectores, luego ivf_sq8)
+INDEX_TYPE = os.environ.get("INDEX_TYPE", "auto").lower()
+INDEX_AUTO_THRESHOLD = int(os.environ.get("INDEX_AUTO_THRESHOLD", "50000"))
+
+# -------- escritura atómica --------
+def _tmp(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+def _write_json_atomic(path: Path, obj) -> None:
+    tmp = _tmp(path)
+    tmp.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _write_index_atomic(index, path: Path) -> None:
+    tmp = _tmp(path)
+    faiss.write_index(index, str(tmp))
+    os.replace(tmp, path)
+
+# -------- caché de embeddings (hash de fragmento -> vector) --------
+class EmbeddingCache:
+    def __init__(self, model_name: str):
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in model_name)
+        self.path = DS / f"emb_cache_{safe}.npz"
+        self.vecs: dict[str, np.ndarray] = {}
+        self.used: set[str] = set()
+        self.dirty = False
+        if self.path.exists():
+            try:
+                z = np.load(self.path)
+                for k, v in zip(z["keys"].tolist(), z["vecs"]):
+                    self.vecs[k] = v
+            except Exception as e:
+                print(f"[WARN] caché de embeddings ilegible, se regenera: {e}")
+                self.vecs = {}
 
-def chunk_text(t: str, max_chars=800):
-    t = re.sub(r"\s+", " ", t)
-    out = []
-    for i in range(0, len(t), max_chars):
-        out.append(t[i:i+max_chars])
-    return out
+    def save(self) -> None:
+        # solo se conservan los fragmentos usados en esta construcción
+        if not self.dirty and set(self.vecs) == self.used:
+            return
+        keys = sorted(self.used & set(self.vecs))
+        if not keys:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp.npz")
+        np.savez(tmp, keys=np.array(keys), vecs=np.stack([self.vecs[k] for k in keys]).astype(np.float32))
+        os.replace(tmp, self.path)
 
-def build_for(lang: str, folder: Path):
+_MODEL = None
+
+def _model() -> SentenceTransformer:
+    global _MODEL
+    if _MODEL is None:
+        _MODEL = SentenceTransformer(EMB_MODEL)
+    return _MODEL
+
+def _embed(chunks: list[str], keys: list[str], cache: EmbeddingCache, batch_size: int) -> np.ndarray:
+    cache.used.update(keys)
+    missing = sorted({k: ch for k, ch in zip(keys, chunks) if k not in cache.vecs}.items())
+    if missing:
+        print(f"   codificando {len(missing)} fragmentos nuevos de {len(chunks)} (batch={batch_size})")
+        X = _model().encode([ch for _, ch in missing], batch_size=batch_size,
+                            convert_to_numpy=True, normalize_embeddings=True)
+        for (k, _), v in zip(missing, X):
+            cache.vecs[k] = v.astype(np.float32)
+        cache.dirty = True
+    return np.stack([cache.vecs[k] for k in keys]).astype(np.float32)
+
+def _make_index(X: np.ndarray, kind: str = INDEX_TYPE):
+    """Índice de producto interno (vectores normalizados = coseno)."""
+    n, dim = X.shape
+    if kind == "auto":
+        kind = "flat" if n < INDEX_AUTO_THRESHOLD else "ivf_sq8"
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+    elif kind in ("ivf", "ivf_sq8"):
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))  # FAISS pide ~39 puntos por centroide
+        quantizer = faiss.IndexFlatIP(dim)
+        if kind == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist,
+                                                  faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(X)
+    else:
+        kind = "flat"
+        index = faiss.IndexFlatIP(dim)
+    index.add(X)
+    return index, kind
+
+def _file_hash(p: Path) -> str:
+    h = hashlib.sha1()
+    with open(p, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def build_for(lang: str, folder: Path, cache: EmbeddingCache, batch_size: int = EMB_BATCH, full: bool = False):
     if not folder.exists(): return
     DS.mkdir(parents=True, exist_ok=True)
+    sfx = SUFFIX[lang]
+    index_path = DS / f"faiss{sfx}.index"
+    manifest_path = DS / f"manifest{sfx}.json"
+    files = sorted(folder.glob("*.txt"))
+    hashes = {p.name: _file_hash(p) for p in files}
+    try:
+        old = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except Exception:
+        old = {}
+    bm25_path = DS / f"bm25{sfx}.bin"
+    # saltar solo si están todas las piezas: sin el almacén, los fragmentos se
+    # releerían de las fuentes en cada consulta
+    complete = index_path.exists() and bm25_current(bm25_path) and (DS / f"meta{sfx}.json").exists() \
+        and all(p.exists() for p in store_paths(DS / f"chunks{sfx}"))
+    if not full and complete and old.get("model") == EMB_MODEL and old.get("files") == hashes:
+        cache.used.update(old.get("keys") or [])
+        print(f"[{lang}] sin cambios ({len(files)} archivos)")
+        return
+
     meta = []; chunks = []
-    for p in folder.glob("*.txt"):
+    for p in files:
         txt = p.read_text(encoding="utf-8", errors="ignore")
         for i, ch in enumerate(chunk_text(txt)):
             meta.append({"source": p.name, "chunk_id": i})
             chunks.append(ch)
     if not chunks:
         return
-    model = SentenceTransformer(EMB_MODEL)
-    X = model.encode(chunks, convert_to_numpy=True, normalize_embeddings=True)
-    dim = X.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(X.astype(np.float32))
-    # guardar
-    if lang == "es-MX":
-        faiss.write_index(index, str(DS / "faiss_es_mx.index"))
-        (DS / "meta_es_mx.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
-    elif lang == "en-US":
-        faiss.write_index(index, str(DS / "faiss_en_us.index"))
-        (DS / "meta_en_us.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
-    else:
-        faiss.write_index(index, str(DS / "faiss_es_419.index"))
-        (DS / "meta_es_419.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    print(f"[{lang}] {len(files)} archivos, {len(chunks)} fragmentos")
+    keys = [hashlib.sha1(ch.encode("utf-8")).hexdigest() for ch in chunks]
+    X = _embed(chunks, keys, cache, batch_size)
+    index, kind = _make_index(X)
+    print(f"   índice {kind}")
+    # guardar (los textos van al almacén de fragmentos, alineado con meta);
+    # el manifest va al final: si algo falla, la próxima corrida reconstruye
+    _write_index_atomic(index, index_path)
+    _write_json_atomic(DS / f"meta{sfx}.json", meta)
+    write_store(DS / f"chunks{sfx}", chunks)
+    write_bm25(bm25_path, chunks)
+    _write_json_atomic(manifest_path, {"model": EMB_MODEL, "files": hashes, "keys": sorted(set(keys))})
 
-if __name__ == "__main__":
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Construye/actualiza los índices FAISS del corpus.")
+    ap.add_argument("--batch-size", type=int, default=EMB_BATCH, help="tamaño de lote del codificador")
+    ap.add_argument("--full", action="store_true", help="ignora manifest y reconstruye todo")
+    ap.add_argument("--out", help="directorio de salida (por defecto, el build activo de data/ds)")
+    args = ap.parse_args(argv)
+    if args.out:
+        global DS
+        DS = Path(args.out)
+    cache = EmbeddingCache(EMB_MODEL)
+    if args.full:
+        cache.vecs = {}
     for lg, folder in CORPORA.items():
-        build_for(lg, folder)
+        build_for(lg, folder, cache, batch_size=args.batch_size, full=args.full)
+    if cache.used:
+        cache.save()
     print("Índices FAISS construidos.")
+
+if __name__ == "__main__":
+    main()
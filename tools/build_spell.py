@@ -0,0 +1,56 @@
+# tools/build_spell.py — índice ortográfico local (backend/spell.py)
+# Vocabulario de data/corpus_txt (palabras con al menos --min-count apariciones)
+# más los diccionarios de usuario de backend/storage/dictionaries.json.
+# Cada ejecución publica una versión nueva (es-<versión>.spell) y mueve el
+# puntero es.spell.current; los workers la abren en su siguiente consulta.
+#   python tools/build_spell.py --min-count 2
+#   python tools/build_spell.py --check "ortografia ezpañola"
+from pathlib import Path
+import argparse, json, os, sys, time
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
+from backend.spell import SpellIndex, count_words, current_path, publish
+
+CORPUS = BASE / "data" / "corpus_txt"
+OUT = Path(os.environ.get("LIA_SPELL_PATH", str(BASE / "data" / "spell" / "es.spell")))
+USER_DICTS = Path(os.environ.get("LIA_STORAGE_DIR", str(BASE / "backend" / "storage"))) / "dictionaries.json"
+
+def _user_words() -> list[str]:
+    try:
+        data = json.loads(USER_DICTS.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    return [str(w) for lang, words in data.items() if str(lang).lower().startswith("es") for w in words]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Construye el índice ortográfico local")
+    ap.add_argument("--corpus", type=Path, default=CORPUS)
+    ap.add_argument("--out", type=Path, default=OUT)
+    ap.add_argument("--min-count", type=int, default=2)
+    ap.add_argument("--check", help="solo consulta el índice existente con este texto")
+    args = ap.parse_args(argv)
+
+    if args.check is None:
+        t = time.perf_counter()
+        freq = count_words(sorted(args.corpus.glob("*.txt")))
+        for w in _user_words():
+            freq[w.lower()] += args.min_count   # siempre entran
+        version, n_words, n_del = publish(freq, args.out, min_count=args.min_count)
+        print(f"{n_words:,} palabras, {n_del:,} borrados -> {version} "
+              f"({version.stat().st_size / 1e6:.1f} MB, {time.perf_counter() - t:.1f} s)")
+
+    path = current_path(args.out)
+    if path is None:
+        sys.exit(f"No hay índice publicado en {args.out}: ejecuta sin --check")
+    idx = SpellIndex(path)
+    probe = args.check or "ortografia ezpañola concordansia haber si biene"
+    for word in probe.split():
+        t = time.perf_counter()
+        sugg = idx.lookup(word)
+        ms = (time.perf_counter() - t) * 1000
+        known = "conocida" if idx.frequency(word) else "desconocida"
+        print(f"{word:<20}{known:<13}{ms:>7.2f} ms  " + ", ".join(f"{s}({d})" for s, d, _ in sugg))
+
+if __name__ == "__main__":
+    main()
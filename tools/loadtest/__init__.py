@@ -0,0 +1 @@
+# tools/loadtest — pruebas de carga con un LanguageTool falso (ver run.py)
@@ -0,0 +1,161 @@
+# tools/loadtest/fake_lt.py — sustituto local de LanguageTool para pruebas de carga
+# - POST /v2/check (form: text, language) con la forma de respuesta de LT
+# - GET  /v2/languages
+# - Latencia configurable: fija + por carácter + jitter; densidad de matches
+#   por cada 100 palabras (deterministas por palabra, para respuestas estables)
+#   python -m tools.loadtest.fake_lt --port 8010 --latency-ms 40 --density 3
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_RULES = [
+    ("MORFOLOGIK_RULE_ES", "TYPOS", "Posible error ortográfico", "misspelling"),
+    ("ES_SIMPLE_REPLACE", "TYPOS", "Palabra mal escrita", "misspelling"),
+    ("COMMA_PARENTHESIS_WHITESPACE", "PUNCTUATION", "Espacio antes de la coma", "whitespace"),
+    ("AGREEMENT_DET_NOUN", "GRAMMAR", "Posible falta de concordancia", "grammar"),
+    ("SOLO_SOLO", "STYLE", "«sólo» ya no lleva tilde", "style"),
+    ("WHITESPACE_RULE", "TYPOGRAPHY", "Espacios repetidos", "whitespace"),
+]
+
+
+class FakeLTConfig:
+    def __init__(self, latency_ms: float = 30.0, per_kchar_ms: float = 2.0, jitter_ms: float = 10.0,
+                 density: float = 3.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.per_kchar_ms = per_kchar_ms
+        self.jitter_ms = jitter_ms
+        self.density = density          # matches por cada 100 palabras
+        self.error_rate = error_rate    # fracción de respuestas 500
+
+
+def fake_matches(text: str, density: float) -> list[dict]:
+    """Marca ~density% de las palabras, elegidas por hash (misma entrada, misma salida)."""
+    out = []
+    threshold = int(density / 100.0 * 0xFFFF)
+    for m in _WORD.finditer(text):
+        w = m.group(0)
+        h = int.from_bytes(hashlib.blake2b(w.lower().encode("utf-8"), digest_size=2).digest(), "big")
+        if h >= threshold:
+            continue
+        rid, cat, msg, issue = _RULES[h % len(_RULES)]
+        start = max(0, m.start() - 20)
+        out.append({
+            "message": f"{msg}: «{w}».",
+            "shortMessage": msg,
+            "replacements": [{"value": w.lower()}, {"value": w.capitalize()}],
+            "offset": m.start(),
+            "length": m.end() - m.start(),
+            "context": {"text": text[start:m.end() + 20], "offset": m.start() - start, "length": m.end() - m.start()},
+            "sentence": text[start:m.end() + 40],
+            "type": {"typeName": "Other"},
+            "rule": {"id": rid, "description": msg, "issueType": issue,
+                     "category": {"id": cat, "name": cat.title()}},
+            "ignoreForIncompleteSentence": False,
+            "contextForSureMatch": 0,
+        })
+    return out
+
+
+def make_handler(cfg: FakeLTConfig, counters: dict):
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):  # silencio: miles de peticiones
+            pass
+
+        def _json(self, code: int, obj) -> None:
+            raw = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_GET(self):
+            if self.path.startswith("/v2/languages"):
+                self._json(200, [{"name": "Spanish", "code": "es", "longCode": "es"},
+                                 {"name": "English (US)", "code": "en", "longCode": "en-US"}])
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(n).decode("utf-8", errors="replace")
+            if not self.path.startswith("/v2/check"):
+                self._json(404, {"error": "not found"})
+                return
+            form = parse_qs(body, keep_blank_values=True)
+            text = (form.get("text") or [""])[0]
+            lang = (form.get("language") or ["es"])[0]
+            delay = cfg.latency_ms + cfg.per_kchar_ms * len(text) / 1000.0 + random.uniform(0, cfg.jitter_ms)
+            time.sleep(delay / 1000.0)
+            with lock:
+                counters["requests"] = counters.get("requests", 0) + 1
+                counters["chars"] = counters.get("chars", 0) + len(text)
+            if cfg.error_rate and random.random() < cfg.error_rate:
+                self._json(500, {"error": "fallo simulado"})
+                return
+            self._json(200, {"software": {"name": "FakeLT", "version": "0"},
+                             "language": {"code": lang, "name": lang},
+                             "matches": fake_matches(text, cfg.density)})
+
+    return Handler
+
+
+class FakeLT:
+    """Servidor en un hilo; .url para LT_URL."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, cfg: FakeLTConfig | None = None):
+        self.cfg = cfg or FakeLTConfig()
+        self.counters: dict = {}
+        self.server = ThreadingHTTPServer((host, port), make_handler(self.cfg, self.counters))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLT":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LanguageTool falso para pruebas de carga")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8010)
+    ap.add_argument("--latency-ms", type=float, default=30.0)
+    ap.add_argument("--per-kchar-ms", type=float, default=2.0)
+    ap.add_argument("--jitter-ms", type=float, default=10.0)
+    ap.add_argument("--density", type=float, default=3.0, help="matches por cada 100 palabras")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    args = ap.parse_args(argv)
+    cfg = FakeLTConfig(args.latency_ms, args.per_kchar_ms, args.jitter_ms, args.density, args.error_rate)
+    lt = FakeLT(args.host, args.port, cfg)
+    print(f"[fake_lt] escuchando en {lt.url}", flush=True)
+    try:
+        lt.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
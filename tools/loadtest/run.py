@@ -0,0 +1,271 @@
+# tools/loadtest/run.py — prueba de carga de backend/main.py y app.py
+# Levanta un LanguageTool falso (fake_lt), arranca la app con uvicorn apuntando a
+# él (almacenamiento en un directorio temporal) y la ejercita con N clientes
+# concurrentes: párrafos, archivos completos, apply y ediciones de diccionario.
+# Informa throughput, p50/p95/p99 y tasa de error por endpoint.
+#   python -m tools.loadtest.run --app main --concurrency 16 --duration 30
+#   python -m tools.loadtest.run --app both --lt-latency-ms 80 --density 5 --json out.json
+#   python -m tools.loadtest.run --app main --target http://127.0.0.1:3000   (servidor ya arrancado)
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BASE = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE))
+from tools.loadtest.fake_lt import FakeLT, FakeLTConfig
+
+_SYNTH = ("La noche caía sobre el pueblo y nadie sabia que hacer , sólo esperaban.",
+          "—¿Vienes o no? —pregunto ella , mirando el camino vacio.",
+          "Habian pasado muchos años desde aquella vez en que el rio se desbordó.",
+          "Sin embargo , el viejo insistia en que la culpa era del alcalde.")
+
+
+# ------------------------
+# Corpus de prueba
+# ------------------------
+def load_paragraphs(limit: int = 2000) -> List[str]:
+    """Párrafos de data/corpus_txt si hay; si no, sintéticos."""
+    paras: List[str] = []
+    corpus = BASE / "data" / "corpus_txt"
+    for p in sorted(corpus.glob("*.txt")) if corpus.is_dir() else []:
+        for block in p.read_text(encoding="utf-8", errors="ignore").split("\n\n"):
+            block = " ".join(block.split())
+            if 80 <= len(block) <= 2000:
+                paras.append(block)
+            if len(paras) >= limit:
+                return paras
+    if not paras:
+        rnd = random.Random(3)
+        paras = [" ".join(rnd.choice(_SYNTH) for _ in range(rnd.randint(2, 8))) for _ in range(400)]
+    return paras
+
+
+# ------------------------
+# Escenarios (nombre, peso, constructor de petición)
+# ------------------------
+Request = Tuple[str, str, dict]   # método, ruta, kwargs de httpx
+
+
+def scenarios(app: str, paras: List[str], file_kb: int) -> List[Tuple[str, int, Callable[[random.Random], Request]]]:
+    def chapter(rnd: random.Random) -> bytes:
+        out, size = [], 0
+        while size < file_kb * 1024:
+            p = rnd.choice(paras)
+            out.append(p)
+            size += len(p) + 2
+        return "\n\n".join(out).encode("utf-8")
+
+    def dict_edit(lang: str):
+        def build(rnd: random.Random) -> Request:
+            token = f"zzcarga{rnd.randrange(50)}"
+            op = rnd.choice(("add", "remove"))
+            return "POST", f"/dictionary/{op}", {"json": {"token": token, "lang": lang}}
+        return build
+
+    if app == "main":
+        return [
+            ("POST /analyze_text", 60, lambda r: ("POST", "/analyze_text", {"json": {"text": r.choice(paras), "lang": "es-MX"}})),
+            ("POST /analyze/file", 5, lambda r: ("POST", "/analyze/file", {
+                "files": {"file": ("capitulo.txt", chapter(r), "text/plain")}, "data": {"lang": "es-MX"}})),
+            ("POST /apply/safe", 15, lambda r: ("POST", "/apply/safe", {"json": {"text": r.choice(paras), "lang": "es-MX"}})),
+            ("POST /apply/all", 10, lambda r: ("POST", "/apply/all", {"json": {"text": r.choice(paras), "lang": "es-MX"}})),
+            ("POST /dictionary/*", 10, dict_edit("es-MX")),
+        ]
+    return [
+        ("POST /analyze_text", 60, lambda r: ("POST", "/analyze_text", {"json": {"text": r.choice(paras), "lang": "es"}})),
+        ("POST /analyze_file", 5, lambda r: ("POST", "/analyze_file", {
+            "files": {"file": ("capitulo.txt", chapter(r), "text/plain")}, "params": {"lang": "es"}})),
+        ("POST /apply_lt safe", 15, lambda r: ("POST", "/apply_lt", {"json": {"text": r.choice(paras), "mode": "safe"}})),
+        ("POST /apply_lt all", 10, lambda r: ("POST", "/apply_lt", {"json": {"text": r.choice(paras), "mode": "all"}})),
+        ("POST /dictionary/*", 10, dict_edit("es")),
+    ]
+
+
+# ------------------------
+# Servidor bajo prueba
+# ------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(app: str, lt_url: str, workers: int, tmp: Path) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ, LT_URL=lt_url, LIA_STORAGE_DIR=str(tmp / "storage"),
+               SUGGEST_CACHE_PATH=str(tmp / "suggestions.sqlite"), PYTHONUNBUFFERED="1")
+    target, cwd = ("main:app", BASE / "backend") if app == "main" else ("app:app", BASE)
+    cmd = [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning", "--workers", str(workers)]
+    proc = subprocess.Popen(cmd, cwd=str(cwd), env=env)
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def wait_ready(url: str, proc: Optional[subprocess.Popen], timeout_s: float = 120.0) -> None:
+    t0 = time.time()
+    while time.time() - t0 < timeout_s:
+        if proc is not None and proc.poll() is not None:
+            raise SystemExit(f"La app terminó al arrancar (código {proc.returncode})")
+        try:
+            if httpx.get(url + "/openapi.json", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"La app no respondió en {timeout_s:.0f} s: {url}")
+
+
+# ------------------------
+# Carga
+# ------------------------
+async def drive(url: str, scen, concurrency: int, duration_s: float, warmup_s: float, seed: int) -> Dict[str, dict]:
+    names = [s[0] for s in scen]
+    weights = [s[1] for s in scen]
+    builders = {s[0]: s[2] for s in scen}
+    results: Dict[str, dict] = {n: {"lat": [], "errors": 0, "codes": {}} for n in names}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    t_start = time.perf_counter()
+    t_measure = t_start + warmup_s
+    t_end = t_measure + duration_s
+
+    async def worker(i: int, client: httpx.AsyncClient):
+        rnd = random.Random(seed + i)
+        # cada cliente virtual es un usuario distinto: sin esto todos comparten
+        # IP y el límite por cliente de la admisión rechazaría la mayoría
+        client_id = {"X-Client-Id": f"loadtest-{seed}-{i}"}
+        while time.perf_counter() < t_end:
+            name = rnd.choices(names, weights)[0]
+            method, path, kwargs = builders[name](rnd)
+            kwargs = dict(kwargs, headers={**client_id, **(kwargs.get("headers") or {})})
+            t = time.perf_counter()
+            try:
+                r = await client.request(method, path, **kwargs)
+                code = r.status_code
+            except httpx.HTTPError as e:
+                code = type(e).__name__
+            lat = time.perf_counter() - t
+            if t < t_measure:
+                continue   # calentamiento
+            row = results[name]
+            row["lat"].append(lat)
+            row["codes"][str(code)] = row["codes"].get(str(code), 0) + 1
+            if not (isinstance(code, int) and code < 400):
+                row["errors"] += 1
+
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        await asyncio.gather(*(worker(i, client) for i in range(concurrency)))
+    for row in results.values():
+        row["elapsed_s"] = duration_s
+    return results
+
+
+def _pct(xs: List[float], p: float) -> float:
+    if not xs:
+        return float("nan")
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p * (len(xs) - 1))))]
+
+
+def summarize(results: Dict[str, dict], duration_s: float) -> List[dict]:
+    rows = []
+    all_lat, all_err = [], 0
+    for name, r in results.items():
+        lat = r["lat"]
+        all_lat += lat
+        all_err += r["errors"]
+        rows.append({"endpoint": name, "requests": len(lat), "rps": len(lat) / duration_s,
+                     "error_rate": (r["errors"] / len(lat)) if lat else 0.0,
+                     "p50_ms": _pct(lat, 0.50) * 1000, "p95_ms": _pct(lat, 0.95) * 1000,
+                     "p99_ms": _pct(lat, 0.99) * 1000,
+                     "mean_ms": (statistics.mean(lat) * 1000) if lat else float("nan"), "codes": r["codes"]})
+    rows.append({"endpoint": "TOTAL", "requests": len(all_lat), "rps": len(all_lat) / duration_s,
+                 "error_rate": (all_err / len(all_lat)) if all_lat else 0.0,
+                 "p50_ms": _pct(all_lat, 0.50) * 1000, "p95_ms": _pct(all_lat, 0.95) * 1000,
+                 "p99_ms": _pct(all_lat, 0.99) * 1000,
+                 "mean_ms": (statistics.mean(all_lat) * 1000) if all_lat else float("nan"), "codes": {}})
+    return rows
+
+
+def print_table(app: str, rows: List[dict]) -> None:
+    print(f"\n== {app} ==")
+    print(f"{'endpoint':<24}{'n':>8}{'req/s':>9}{'err %':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for r in rows:
+        print(f"{r['endpoint']:<24}{r['requests']:>8}{r['rps']:>9.1f}{r['error_rate'] * 100:>8.2f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+        bad = {c: n for c, n in r["codes"].items() if not c.isdigit() or int(c) >= 400}
+        if bad:
+            print(f"{'':<24}errores: {bad}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Prueba de carga con LanguageTool falso")
+    ap.add_argument("--app", choices=("main", "app", "both"), default="main")
+    ap.add_argument("--target", help="URL de un servidor ya arrancado (no se lanza uvicorn)")
+    ap.add_argument("--workers", type=int, default=1, help="workers de uvicorn para la app lanzada")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--warmup", type=float, default=3.0)
+    ap.add_argument("--file-kb", type=int, default=200, help="tamaño de los archivos subidos")
+    ap.add_argument("--lt-latency-ms", type=float, default=30.0)
+    ap.add_argument("--lt-per-kchar-ms", type=float, default=2.0)
+    ap.add_argument("--lt-jitter-ms", type=float, default=10.0)
+    ap.add_argument("--density", type=float, default=3.0, help="matches de LT por cada 100 palabras")
+    ap.add_argument("--lt-error-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=11)
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+
+    lt = FakeLT(cfg=FakeLTConfig(args.lt_latency_ms, args.lt_per_kchar_ms, args.lt_jitter_ms,
+                                 args.density, args.lt_error_rate)).start()
+    print(f"[loadtest] LanguageTool falso en {lt.url}")
+    paras = load_paragraphs()
+    report = {"config": vars(args), "apps": {}}
+    apps = ("main", "app") if args.app == "both" else (args.app,)
+    try:
+        for app in apps:
+            with tempfile.TemporaryDirectory(prefix="lia-load-") as tmp:
+                proc = None
+                url = args.target
+                if url is None:
+                    proc, url = start_app(app, lt.url, args.workers, Path(tmp))
+                try:
+                    wait_ready(url, proc)
+                    lt.counters.clear()
+                    print(f"[loadtest] {app}: {args.concurrency} clientes, {args.duration:.0f} s contra {url}")
+                    res = asyncio.run(drive(url, scenarios(app, paras, args.file_kb), args.concurrency,
+                                            args.duration, args.warmup, args.seed))
+                    rows = summarize(res, args.duration)
+                    print_table(app, rows)
+                    print(f"[loadtest] LT recibió {lt.counters.get('requests', 0)} peticiones "
+                          f"({lt.counters.get('chars', 0) / 1e6:.1f} M caracteres)")
+                    report["apps"][app] = {"url": url, "rows": rows, "lt": dict(lt.counters)}
+                finally:
+                    if proc is not None:
+                        proc.terminate()
+                        try:
+                            proc.wait(timeout=15)
+                        except subprocess.TimeoutExpired:
+                            proc.kill()
+    finally:
+        lt.stop()
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+        print(f"[loadtest] resultados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,9 @@ TXT.mkdir(parents=True, exist_ok=True)
 def pdf_to_txt(pdf_path: Path, out_dir: Path):
     name = pdf_path.stem
     out_file = out_dir / f"{name}.txt"
+    if out_file.exists() and out_file.stat().st_mtime >= pdf_path.stat().st_mtime:
+        print(f"[SKIP] {pdf_path.name} (sin cambios)")
+        return
     try:
         reader = PdfReader(str(pdf_path))
         pages = []